@@ -1,4 +1,5 @@
 import os
+import threading
 
 from authlib.integrations.flask_client import OAuth
 from dotenv import load_dotenv
@@ -6,11 +7,13 @@ from flask import Flask
 from flask_migrate import Migrate
 from flask_sqlalchemy import SQLAlchemy
 
+from core.buffers.write_behind_buffer import WriteBehindBuffer
 from core.configuration.configuration import get_app_version
 from core.managers.config_manager import ConfigManager
 from core.managers.error_handler_manager import ErrorHandlerManager
 from core.managers.logging_manager import LoggingManager
 from core.managers.module_manager import ModuleManager
+from core.storage.file_storage import FileStorage
 
 # Load environment variables
 load_dotenv()
@@ -19,6 +22,8 @@ load_dotenv()
 db = SQLAlchemy()
 migrate = Migrate()
 oauth = OAuth()
+record_buffer = WriteBehindBuffer()
+file_storage = FileStorage()
 
 
 def create_app(config_name="development"):
@@ -37,6 +42,8 @@ def create_app(config_name="development"):
     db.init_app(app)
     migrate.init_app(app, db)
     oauth.init_app(app)
+    record_buffer.init_app(app)
+    file_storage.init_app(app)
 
     # Register the ORCID client
     oauth.register(
@@ -58,6 +65,19 @@ def create_app(config_name="development"):
 
     app.register_blueprint(badge_bp)
 
+    # Build the explore autocomplete index when the app starts serving, in each worker. Not at
+    # import time, so CLI commands, migrations and tests never start it
+    if app.config.get("SUGGEST_INDEX_WARMUP"):
+        from app.modules.explore.services import ExploreService
+
+        warmed_up = threading.Event()
+
+        @app.before_request
+        def warm_up_suggestions():
+            if not warmed_up.is_set():
+                warmed_up.set()
+                ExploreService.refresh_suggestions(app)
+
     # Register login manager
     from flask_login import LoginManager
 
@@ -1,4 +1,6 @@
+import logging
 import os
+import shutil
 import tempfile
 import zipfile
 from datetime import datetime
@@ -10,6 +12,9 @@ from app.modules.cart import cart_bp
 from app.modules.cart.forms import CartCreateDatasetForm
 from app.modules.cart.services import CartService
 from app.modules.filemodel.services import FilemodelService
+from app.modules.hubfile.services import HubfileService
+
+logger = logging.getLogger(__name__)
 
 cart_service = CartService()
 fm_service = FilemodelService()
@@ -31,6 +36,7 @@ def view_cart_page():
                     "name": fm_meta.title if fm_meta else "No title",
                     "description": fm_meta.description if fm_meta else "",
                     "authors": fm_meta.authors if fm_meta else [],
+                    "tags": fm_meta.get_tag_labels() if fm_meta else [],
                 }
             )
 
@@ -105,27 +111,20 @@ def download_cart():
     zip_filename = f"cart_download_{datetime.now().strftime('%Y%m%d_%H%M%S')}.zip"
     zip_path = os.path.join(temp_dir, zip_filename)
 
-    working_dir = os.getenv("WORKING_DIR", "")
-    print(f"DEBUG: Working DIR: '{working_dir}'")
-    print(f"DEBUG: Directorio Actual (getcwd): '{os.getcwd()}'")
+    hubfiles = []
+    for item in cart_items:
+        file_model = fm_service.get_by_id(item["file_model_id"])
+        if file_model:
+            filename = file_model.fm_meta_data.filename
+            hubfiles.extend(file for file in file_model.files if file.name == filename)
+    hubfile_service = HubfileService()
 
     with zipfile.ZipFile(zip_path, "w") as zipf:
-        for item in cart_items:
-            file_model = fm_service.get_by_id(item["file_model_id"])
-            if file_model:
-                user_id = file_model.data_set.user_id
-                dateset_id = file_model.data_set_id
-                filename = file_model.fm_meta_data.filename
-
-                file_path = os.path.join(working_dir, "uploads", f"user_{user_id}", f"dataset_{dateset_id}", filename)
-
-                existe = os.path.exists(file_path)
-                print(f"DEBUG: Buscando archivo: {file_path}")
-                print(f"DEBUG: ¿Existe?: {existe}")
-
-                if os.path.exists(file_path):
-                    zipf.write(file_path, arcname=filename)
-                else:
-                    print("DEBUG: ¡ERROR! El archivo no está donde debería.")
+        for hubfile in hubfiles:
+            if not hubfile_service.exists(hubfile):
+                logger.warning(f"Cart download: file {hubfile.id} not found in storage")
+                continue
+            with hubfile_service.open(hubfile) as source, zipf.open(hubfile.name, "w") as dest:
+                shutil.copyfileobj(source, dest)
 
     return send_from_directory(temp_dir, zip_filename, as_attachment=True, mimetype="application/zip")
@@ -66,6 +66,7 @@ class CartService(BaseService):
             )
             db.session.add(new_fm)
 
+            # the clones keep the blob of the original file, so its content is not copied
             for file in orig_fm.files:
                 clone_data = {
                     col.name: getattr(file, col.name)
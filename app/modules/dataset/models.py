@@ -1,9 +1,16 @@
 import os
 from datetime import datetime
 from enum import Enum
+from typing import List
 
 from flask import request
 from sqlalchemy import Enum as SQLAlchemyEnum
+from sqlalchemy import event, inspect, select
+from sqlalchemy.dialects import mysql
+from sqlalchemy.dialects.mysql import insert as mysql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+from sqlalchemy.orm.attributes import set_committed_value
 
 from app import db
 
@@ -30,6 +37,51 @@ class PublicationType(Enum):
     OTHER = "other"
 
 
+def binary_string(length):
+    """
+    A string column compared byte by byte. The default collation of MariaDB ignores case and accents, so
+    the normalized names kept in unique columns would otherwise clash ("café" and "cafe").
+    """
+    return db.String(length).with_variant(mysql.VARCHAR(length, collation="utf8mb4_bin"), "mysql", "mariadb")
+
+
+def insert_missing(connection, table, key_column: str, rows: List[dict]):
+    """
+    Inserts ``rows`` into ``table``, skipping those whose ``key_column`` already exists, including rows
+    another transaction is inserting. Read them back with a locking read: a plain SELECT uses the
+    transaction snapshot and may not see a row committed after it.
+    """
+    if not rows:
+        return
+
+    if connection.dialect.name == "sqlite":
+        stmt = sqlite_insert(table).values(rows).on_conflict_do_nothing(index_elements=[table.c[key_column]])
+    else:
+        stmt = mysql_insert(table).values(rows)
+        # a no-op update rather than INSERT IGNORE, which would also turn other errors into warnings
+        stmt = stmt.on_duplicate_key_update({key_column: stmt.inserted[key_column]})
+    connection.execute(stmt)
+
+
+def person_key(name, orcid):
+    """Identity of the person behind an author row: their ORCID if any, else their normalized name."""
+    if orcid and orcid.strip():
+        return f"orcid:{orcid.strip()}"
+    return f"name:{' '.join((name or '').lower().split())}"
+
+
+class Person(db.Model):
+    """Canonical identity shared by every Author row of the same person."""
+
+    id = db.Column(db.Integer, primary_key=True)
+    key = db.Column(binary_string(130), nullable=False, unique=True, index=True)
+    name = db.Column(db.String(120), nullable=False)
+    orcid = db.Column(db.String(120))
+
+    def __repr__(self):
+        return f"Person<{self.key}>"
+
+
 class Author(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(120), nullable=False)
@@ -37,6 +89,12 @@ class Author(db.Model):
     orcid = db.Column(db.String(120))
     ds_meta_data_id = db.Column(db.Integer, db.ForeignKey("ds_meta_data.id"))
     fm_meta_data_id = db.Column(db.Integer, db.ForeignKey("fm_meta_data.id"))
+    # set on flush from the name and orcid
+    person_id = db.Column(db.Integer, db.ForeignKey("person.id"), nullable=True)
+    person = db.relationship("Person", backref=db.backref("authors", lazy=True))
+
+    # datasets of a person
+    __table_args__ = (db.Index("ix_author_person_id_ds_meta_data_id", "person_id", "ds_meta_data_id"),)
 
     def to_dict(self):
         return {"name": self.name, "affiliation": self.affiliation, "orcid": self.orcid}
@@ -51,6 +109,46 @@ class DSMetrics(db.Model):
         return f"DSMetrics<models={self.number_of_models}, files={self.number_of_files}>"
 
 
+def parse_tags(tags):
+    """Splits a comma-separated tags string into unique normalized tag names, keeping their order."""
+    names = []
+    for tag in (tags or "").split(","):
+        name = " ".join(tag.lower().split())[:120]
+        if name and name not in names:
+            names.append(name)
+    return names
+
+
+def tag_labels(tags):
+    """
+    Splits a comma-separated tags string into the tags as they were typed, keeping their case and order
+    and the first spelling of each normalized name. Only used for display; lookups go by parse_tags.
+    """
+    labels, names = [], set()
+    for tag in (tags or "").split(","):
+        name = " ".join(tag.lower().split())[:120]
+        if name and name not in names:
+            names.add(name)
+            labels.append(" ".join(tag.split()))
+    return labels
+
+
+class Tag(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(binary_string(120), nullable=False, unique=True, index=True)
+
+    def __repr__(self):
+        return f"Tag<{self.name}>"
+
+
+ds_meta_data_tag = db.Table(
+    "ds_meta_data_tag",
+    db.Column("ds_meta_data_id", db.Integer, db.ForeignKey("ds_meta_data.id", ondelete="CASCADE"), primary_key=True),
+    db.Column("tag_id", db.Integer, db.ForeignKey("tag.id", ondelete="CASCADE"), primary_key=True),
+    db.Index("ix_ds_meta_data_tag_tag_id", "tag_id", "ds_meta_data_id"),
+)
+
+
 class DSMetaData(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     deposition_id = db.Column(db.Integer)
@@ -59,11 +157,19 @@ class DSMetaData(db.Model):
     publication_type = db.Column(SQLAlchemyEnum(PublicationType), nullable=False)
     publication_doi = db.Column(db.String(120))
     dataset_doi = db.Column(db.String(120))
+    # comma-separated tags as entered in the forms; tag_list is kept in sync on flush
     tags = db.Column(db.String(120))
+    tag_list = db.relationship("Tag", secondary=ds_meta_data_tag, order_by="Tag.name", lazy=True)
     ds_metrics_id = db.Column(db.Integer, db.ForeignKey("ds_metrics.id"))
     ds_metrics = db.relationship("DSMetrics", uselist=False, backref="ds_meta_data", cascade="all, delete")
     authors = db.relationship("Author", backref="ds_meta_data", lazy=True, cascade="all, delete")
 
+    def get_tag_names(self):
+        return [tag.name for tag in self.tag_list]
+
+    def get_tag_labels(self):
+        return tag_labels(self.tags)
+
 
 class BaseDataSet(db.Model):
     __tablename__ = "data_set"
@@ -82,6 +188,15 @@ class BaseDataSet(db.Model):
 
     next_versions = db.relationship("BaseDataSet", backref=db.backref("previous_version", remote_side=[id]), lazy=True)
 
+    # id of the first version of the lineage, shared by all its versions. It has no foreign key so
+    # the history stays grouped when the first version is deleted.
+    lineage_root_id = db.Column(db.Integer, nullable=True, index=True)
+
+    counter = db.relationship("DSCounter", uselist=False, lazy=True, cascade="all, delete-orphan")
+
+    # keyset pagination of the explore results
+    __table_args__ = (db.Index("ix_data_set_created_at_id", "created_at", "id"),)
+
     __mapper_args__ = {
         "polymorphic_on": type,
         "polymorphic_identity": "base",
@@ -102,7 +217,13 @@ class BaseDataSet(db.Model):
         return 1  # By default, datasets have at least one file
 
     def get_download_count(self):
-        return db.session.query(DSDownloadRecord).filter_by(dataset_id=self.id).count()
+        return self.counter.download_count if self.counter else 0
+
+    def get_unique_download_count(self):
+        return self.counter.unique_download_count if self.counter else 0
+
+    def get_view_count(self):
+        return self.counter.view_count if self.counter else 0
 
     def get_pixelhub_doi(self):
         from app.modules.dataset.services import DataSetService
@@ -120,6 +241,94 @@ class BaseDataSet(db.Model):
         return f"DataSet<{self.id}>"
 
 
+@event.listens_for(BaseDataSet, "after_insert", propagate=True)
+def set_lineage_root_id(mapper, connection, target):
+    if target.lineage_root_id is not None:
+        return
+
+    table = BaseDataSet.__table__
+    root_id = target.id
+    if target.previous_version_id is not None:
+        parent_root_id = connection.execute(
+            select(table.c.lineage_root_id).where(table.c.id == target.previous_version_id)
+        ).scalar()
+        root_id = parent_root_id or target.previous_version_id
+
+    connection.execute(table.update().where(table.c.id == target.id).values(lineage_root_id=root_id))
+    set_committed_value(target, "lineage_root_id", root_id)
+
+
+@event.listens_for(Session, "before_flush")
+def sync_tag_list(session, flush_context, instances):
+    """Points the tag_list of new or retagged metadata at the Tag rows of its tags string."""
+    pending = {}
+    for obj in list(session.new) + list(session.dirty):
+        if not hasattr(obj, "tag_list") or not hasattr(obj, "tags"):
+            continue
+        if obj in session.new or inspect(obj).attrs.tags.history.has_changes():
+            pending[obj] = parse_tags(obj.tags)
+    if not pending:
+        return
+
+    names = {name for obj_names in pending.values() for name in obj_names}
+    tags_by_name = {obj.name: obj for obj in session.new if isinstance(obj, Tag) and obj.name in names}
+    missing = names - tags_by_name.keys()
+    if missing:
+        with session.no_autoflush:
+            tags_by_name.update((tag.name, tag) for tag in session.scalars(select(Tag).where(Tag.name.in_(missing))))
+            missing -= tags_by_name.keys()
+            if missing:
+                # two requests may add the same new tag at once: upsert it and read it back locked
+                insert_missing(
+                    session.connection(), Tag.__table__, "name", [{"name": name} for name in sorted(missing)]
+                )
+                created = select(Tag).where(Tag.name.in_(missing)).with_for_update(read=True)
+                tags_by_name.update((tag.name, tag) for tag in session.scalars(created))
+
+    for obj, obj_names in pending.items():
+        obj.tag_list = [tags_by_name[name] for name in obj_names]
+
+
+@event.listens_for(Session, "before_flush")
+def sync_author_person(session, flush_context, instances):
+    """Links new or renamed authors to the Person of their ORCID or name, creating it if needed."""
+    pending = {}
+    for obj in list(session.new) + list(session.dirty):
+        if not isinstance(obj, Author):
+            continue
+        state = inspect(obj)
+        if obj in session.new or state.attrs.name.history.has_changes() or state.attrs.orcid.history.has_changes():
+            pending[obj] = person_key(obj.name, obj.orcid)
+    if not pending:
+        return
+
+    keys = set(pending.values())
+    people = {obj.key: obj for obj in session.new if isinstance(obj, Person) and obj.key in keys}
+    missing = keys - people.keys()
+    if missing:
+        with session.no_autoflush:
+            people.update(
+                (person.key, person) for person in session.scalars(select(Person).where(Person.key.in_(missing)))
+            )
+            missing -= people.keys()
+            if missing:
+                # two requests may add the same new person at once: upsert it and read it back locked
+                first_authors = {}
+                for author, key in pending.items():
+                    if key in missing:
+                        first_authors.setdefault(key, author)
+                rows = [
+                    {"key": key, "name": author.name, "orcid": (author.orcid or "").strip() or None}
+                    for key, author in sorted(first_authors.items())
+                ]
+                insert_missing(session.connection(), Person.__table__, "key", rows)
+                created = select(Person).where(Person.key.in_(missing)).with_for_update(read=True)
+                people.update((person.key, person) for person in session.scalars(created))
+
+    for author, key in pending.items():
+        author.person = people[key]
+
+
 class PixDataset(BaseDataSet):
     __mapper_args__ = {
         "polymorphic_identity": "pix",
@@ -183,7 +392,7 @@ class PixDataset(BaseDataSet):
         return set(self.ds_meta_data.authors) if self.ds_meta_data.authors else set()
 
     def get_tags_set(self):
-        return set(self.ds_meta_data.tags.split(",")) if self.ds_meta_data.tags else set()
+        return set(self.ds_meta_data.get_tag_names())
 
     def get_publication_type(self):
         return self.ds_meta_data.publication_type
@@ -193,8 +402,8 @@ class PixDataset(BaseDataSet):
         score = 0
 
         # Increment per common author
-        self_authors = {a.id for a in self.get_authors_set()}
-        other_authors = {a.id for a in other_dataset.get_authors_set()}
+        self_authors = {person_key(a.name, a.orcid) for a in self.get_authors_set()}
+        other_authors = {person_key(a.name, a.orcid) for a in other_dataset.get_authors_set()}
         common_authors = self_authors.intersection(other_authors)
 
         score += len(common_authors) * 10
@@ -226,7 +435,7 @@ class PixDataset(BaseDataSet):
             "publication_type": self.get_cleaned_publication_type(),
             "publication_doi": self.ds_meta_data.publication_doi,
             "dataset_doi": self.ds_meta_data.dataset_doi,
-            "tags": self.ds_meta_data.tags.split(",") if self.ds_meta_data.tags else [],
+            "tags": self.ds_meta_data.get_tag_labels(),
             "url": self.get_pixelhub_doi(),
             "download": f"{request.host_url.rstrip('/')}/dataset/download/{self.id}",
             "zenodo": self.get_zenodo_url(),
@@ -275,6 +484,55 @@ class DSViewRecord(db.Model):
         return f"<View id={self.id} dataset_id={self.dataset_id} date={self.view_date} cookie={self.view_cookie}>"
 
 
+class DSCounter(db.Model):
+    """Materialized per-dataset counters, kept up to date as download and view records are written."""
+
+    dataset_id = db.Column(db.Integer, db.ForeignKey("data_set.id", ondelete="CASCADE"), primary_key=True)
+    download_count = db.Column(db.Integer, nullable=False, default=0, server_default="0")
+    unique_download_count = db.Column(db.Integer, nullable=False, default=0, server_default="0")
+    view_count = db.Column(db.Integer, nullable=False, default=0, server_default="0")
+
+    def __repr__(self):
+        return (
+            f"<DSCounter dataset_id={self.dataset_id} "
+            f"downloads={self.download_count} "
+            f"unique_downloads={self.unique_download_count} "
+            f"views={self.view_count}>"
+        )
+
+
+class DSDownloadBucket(db.Model):
+    """Downloads of a dataset within one hour, rolled up from the download records."""
+
+    __tablename__ = "ds_download_bucket"
+
+    dataset_id = db.Column(db.Integer, db.ForeignKey("data_set.id", ondelete="CASCADE"), primary_key=True)
+    bucket_start = db.Column(db.DateTime, primary_key=True, index=True)
+    download_count = db.Column(db.Integer, nullable=False, default=0, server_default="0")
+
+    def __repr__(self):
+        return (
+            f"<DSDownloadBucket dataset_id={self.dataset_id} start={self.bucket_start} "
+            f"downloads={self.download_count}>"
+        )
+
+
+class DSNeighbor(db.Model):
+    """Precomputed related datasets of a dataset, ranked by similarity."""
+
+    __tablename__ = "dataset_neighbors"
+
+    dataset_id = db.Column(db.Integer, db.ForeignKey("data_set.id", ondelete="CASCADE"), primary_key=True)
+    neighbor_id = db.Column(db.Integer, db.ForeignKey("data_set.id", ondelete="CASCADE"), primary_key=True)
+    score = db.Column(db.Integer, nullable=False)
+    rank = db.Column(db.Integer, nullable=False)
+
+    __table_args__ = (db.Index("ix_dataset_neighbors_dataset_rank", "dataset_id", "rank"),)
+
+    def __repr__(self):
+        return f"<DSNeighbor dataset_id={self.dataset_id} neighbor_id={self.neighbor_id} score={self.score}>"
+
+
 class DOIMapping(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     dataset_doi_old = db.Column(db.String(120))
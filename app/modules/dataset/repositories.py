@@ -1,29 +1,103 @@
 import logging
+from collections import Counter, defaultdict
 from datetime import datetime, timedelta, timezone
-from typing import Optional
+from typing import Dict, Iterable, List, Optional
 
 from flask_login import current_user
-from sqlalchemy import desc, func
+from sqlalchemy import and_, desc, func, or_, select
+from sqlalchemy.dialects.mysql import insert as mysql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import contains_eager, selectinload
 
-from app import db
+from app import db, record_buffer
 from app.modules.dataset.models import (
     Author,
+    BaseDataSet,
     DataSet,
     DOIMapping,
+    DSCounter,
+    DSDownloadBucket,
     DSDownloadRecord,
     DSMetaData,
+    DSNeighbor,
     DSViewRecord,
+    Person,
+    Tag,
+    ds_meta_data_tag,
 )
+from app.modules.filemodel.models import FileModel
 from core.repositories.BaseRepository import BaseRepository
 
 logger = logging.getLogger(__name__)
 
+# Leaderboard windows; None means all time
+LEADERBOARD_PERIODS = {
+    "day": timedelta(hours=24),
+    "week": timedelta(days=7),
+    "month": timedelta(days=30),
+    "all": None,
+}
+UNSUPPORTED_PERIOD_MESSAGE = "Periodo no soportado: usa 'day', 'week', 'month' o 'all'"
+
+
+def upsert_increment(connection, table, key_columns, value_columns, rows: List[dict]):
+    """Inserts ``rows`` into ``table``, adding ``value_columns`` to the existing row on a key conflict."""
+    if not rows:
+        return
+
+    if connection.dialect.name == "sqlite":
+        stmt = sqlite_insert(table).values(rows)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[table.c[column] for column in key_columns],
+            set_={column: table.c[column] + stmt.excluded[column] for column in value_columns},
+        )
+    else:
+        stmt = mysql_insert(table).values(rows)
+        stmt = stmt.on_duplicate_key_update(
+            {column: table.c[column] + stmt.inserted[column] for column in value_columns}
+        )
+    connection.execute(stmt)
+
 
 class AuthorRepository(BaseRepository):
     def __init__(self):
         super().__init__(Author)
 
 
+class PersonRepository(BaseRepository):
+    def __init__(self):
+        super().__init__(Person)
+
+    def get_by_key(self, key: str) -> Optional[Person]:
+        return self.model.query.filter_by(key=key).first()
+
+    def get_datasets(self, person_id: int) -> List[DataSet]:
+        """Returns the published datasets authored by a person, newest first."""
+        return (
+            DataSet.query.join(DSMetaData, DataSet.ds_meta_data_id == DSMetaData.id)
+            .filter(
+                DSMetaData.dataset_doi.isnot(None),
+                DSMetaData.id.in_(select(Author.ds_meta_data_id).where(Author.person_id == person_id)),
+            )
+            .order_by(DataSet.created_at.desc(), DataSet.id.desc())
+            .all()
+        )
+
+    def get_coauthors(self, person_id: int, limit: int = 10) -> List[tuple]:
+        """Returns the ``(person, shared datasets)`` of the co-authors of a person, most frequent first."""
+        own = select(Author.ds_meta_data_id).where(Author.person_id == person_id, Author.ds_meta_data_id.isnot(None))
+        shared = func.count(func.distinct(Author.ds_meta_data_id))
+        return (
+            self.session.query(Person, shared)
+            .join(Author, Author.person_id == Person.id)
+            .filter(Author.ds_meta_data_id.in_(own), Person.id != person_id)
+            .group_by(Person.id)
+            .order_by(shared.desc(), Person.name)
+            .limit(limit)
+            .all()
+        )
+
+
 class DSDownloadRecordRepository(BaseRepository):
     def __init__(self):
         super().__init__(DSDownloadRecord)
@@ -31,33 +105,187 @@ class DSDownloadRecordRepository(BaseRepository):
     def total_dataset_downloads(self) -> int:
         return self.model.query.count()
 
+    def enqueue(self, user_id: Optional[int], dataset_id: int, download_date: datetime, download_cookie: str):
+        record_buffer.add(
+            self.model,
+            user_id=user_id,
+            dataset_id=dataset_id,
+            download_date=download_date,
+            download_cookie=download_cookie,
+        )
+
     def top_3_dowloaded_datasets_per_week(self, period="week", limit=3) -> DataSet:
         """
         Devuelve los datasets más descargados en el periodo dado.
-        period: "week" o "month"
+        period: "day", "week", "month" o "all"
         """
-        now = datetime.now()
-        if period == "week":
-            since = now - timedelta(days=7)
-        elif period == "month":
-            since = now - timedelta(days=30)
+        if period not in LEADERBOARD_PERIODS:
+            raise ValueError(UNSUPPORTED_PERIOD_MESSAGE)
+
+        window = LEADERBOARD_PERIODS[period]
+        if window is None:
+            results = (
+                db.session.query(DSCounter.dataset_id, DSCounter.download_count.label("downloads"))
+                .filter(DSCounter.download_count > 0)
+                .order_by(desc("downloads"), DSCounter.dataset_id)
+                .limit(limit)
+                .all()
+            )
         else:
-            raise ValueError("Periodo no soportado: usa 'week' o 'month'")
-        results = (
-            db.session.query(DSDownloadRecord.dataset_id, func.count(DSDownloadRecord.id).label("downloads"))
-            .filter(DSDownloadRecord.download_date >= since)
+            since = DSDownloadBucketRepository.bucket_of(datetime.now(timezone.utc) - window)
+            results = (
+                db.session.query(
+                    DSDownloadBucket.dataset_id, func.sum(DSDownloadBucket.download_count).label("downloads")
+                )
+                .filter(DSDownloadBucket.bucket_start >= since)
+                .group_by(DSDownloadBucket.dataset_id)
+                .order_by(desc("downloads"), DSDownloadBucket.dataset_id)
+                .limit(limit)
+                .all()
+            )
+
+        return DataSetRepository().get_by_ids([r.dataset_id for r in results])
+
+
+class DSDownloadBucketRepository(BaseRepository):
+    def __init__(self):
+        super().__init__(DSDownloadBucket)
+
+    @staticmethod
+    def bucket_of(moment: datetime) -> datetime:
+        """Returns the start of the hour containing ``moment``, as a naive UTC datetime."""
+        if moment.tzinfo is not None:
+            moment = moment.astimezone(timezone.utc).replace(tzinfo=None)
+        return moment.replace(minute=0, second=0, microsecond=0)
+
+    @classmethod
+    def apply_download_records(cls, connection, rows: List[dict]):
+        """Flush listener of DSDownloadRecord."""
+        buckets = Counter((row["dataset_id"], cls.bucket_of(row["download_date"])) for row in rows)
+        upsert_increment(
+            connection,
+            DSDownloadBucket.__table__,
+            ("dataset_id", "bucket_start"),
+            ("download_count",),
+            [
+                {"dataset_id": dataset_id, "bucket_start": bucket_start, "download_count": count}
+                for (dataset_id, bucket_start), count in buckets.items()
+            ],
+        )
+
+    def rebuild(self) -> int:
+        """Recomputes every bucket from the raw download records."""
+        records = self.session.query(DSDownloadRecord.dataset_id, DSDownloadRecord.download_date).filter(
+            DSDownloadRecord.dataset_id.isnot(None)
+        )
+        try:
+            self.model.query.delete()
+            rows = [{"dataset_id": dataset_id, "download_date": date} for dataset_id, date in records]
+            self.apply_download_records(self.session.connection(), rows)
+            self.session.commit()
+        except Exception:
+            self.session.rollback()
+            raise
+        return self.count()
+
+
+class DSCounterRepository(BaseRepository):
+    COUNTER_COLUMNS = ("download_count", "unique_download_count", "view_count")
+
+    def __init__(self):
+        super().__init__(DSCounter)
+
+    def get_counters(self, dataset_ids: Iterable[int]) -> Dict[int, DSCounter]:
+        dataset_ids = list(set(dataset_ids))
+        if not dataset_ids:
+            return {}
+        return {c.dataset_id: c for c in self.model.query.filter(self.model.dataset_id.in_(dataset_ids)).all()}
+
+    def get_download_counts(self, dataset_ids: Iterable[int]) -> Dict[int, int]:
+        return {dataset_id: c.download_count for dataset_id, c in self.get_counters(dataset_ids).items()}
+
+    @classmethod
+    def increment(cls, connection, deltas: Dict[int, Dict[str, int]]):
+        """Adds the given deltas to the counters of each dataset, creating the missing rows."""
+        if not deltas:
+            return
+
+        rows = [
+            {"dataset_id": dataset_id, **{column: delta.get(column, 0) for column in cls.COUNTER_COLUMNS}}
+            for dataset_id, delta in deltas.items()
+        ]
+        upsert_increment(connection, DSCounter.__table__, ("dataset_id",), cls.COUNTER_COLUMNS, rows)
+
+    @classmethod
+    def apply_download_records(cls, connection, rows: List[dict]):
+        """
+        Flush listener of DSDownloadRecord. Runs after the rows are inserted, so a (dataset, cookie)
+        pair is a new unique download when all its stored records belong to this batch.
+        """
+        batch = Counter((row["dataset_id"], row["download_cookie"]) for row in rows)
+
+        table = DSDownloadRecord.__table__
+        stored = connection.execute(
+            select(table.c.dataset_id, table.c.download_cookie, func.count())
+            .where(or_(*[and_(table.c.dataset_id == d, table.c.download_cookie == c) for d, c in batch]))
+            .group_by(table.c.dataset_id, table.c.download_cookie)
+        )
+
+        deltas = defaultdict(lambda: defaultdict(int))
+        for (dataset_id, _), count in batch.items():
+            deltas[dataset_id]["download_count"] += count
+        for dataset_id, cookie, count in stored:
+            if count == batch[(dataset_id, cookie)]:
+                deltas[dataset_id]["unique_download_count"] += 1
+
+        cls.increment(connection, deltas)
+
+    @classmethod
+    def apply_view_records(cls, connection, rows: List[dict]):
+        """Flush listener of DSViewRecord."""
+        deltas = defaultdict(lambda: defaultdict(int))
+        for row in rows:
+            deltas[row["dataset_id"]]["view_count"] += 1
+        cls.increment(connection, deltas)
+
+    def rebuild(self) -> int:
+        """Recomputes every counter from the raw download and view records."""
+        deltas = defaultdict(dict)
+
+        downloads = (
+            self.session.query(
+                DSDownloadRecord.dataset_id,
+                func.count(DSDownloadRecord.id),
+                func.count(func.distinct(DSDownloadRecord.download_cookie)),
+            )
+            .filter(DSDownloadRecord.dataset_id.isnot(None))
             .group_by(DSDownloadRecord.dataset_id)
-            .order_by(desc("downloads"))
-            .limit(limit)
-            .all()
         )
+        for dataset_id, download_count, unique_download_count in downloads:
+            deltas[dataset_id]["download_count"] = download_count
+            deltas[dataset_id]["unique_download_count"] = unique_download_count
+
+        views = (
+            self.session.query(DSViewRecord.dataset_id, func.count(DSViewRecord.id))
+            .filter(DSViewRecord.dataset_id.isnot(None))
+            .group_by(DSViewRecord.dataset_id)
+        )
+        for dataset_id, view_count in views:
+            deltas[dataset_id]["view_count"] = view_count
 
-        top_datasets = []
-        for r in results:
-            dataset = DataSet.query.get(r.dataset_id)
-            top_datasets.append(dataset)
+        try:
+            self.model.query.delete()
+            self.increment(self.session.connection(), deltas)
+            self.session.commit()
+        except Exception:
+            self.session.rollback()
+            raise
+        return len(deltas)
 
-        return top_datasets
+
+record_buffer.on_flush(DSDownloadRecord, DSCounterRepository.apply_download_records)
+record_buffer.on_flush(DSDownloadRecord, DSDownloadBucketRepository.apply_download_records)
+record_buffer.on_flush(DSViewRecord, DSCounterRepository.apply_view_records)
 
 
 class DSMetaDataRepository(BaseRepository):
@@ -68,6 +296,79 @@ class DSMetaDataRepository(BaseRepository):
         return self.model.query.filter_by(dataset_doi=doi).first()
 
 
+class DSNeighborRepository(BaseRepository):
+    def __init__(self):
+        super().__init__(DSNeighbor)
+
+    def get_neighbors(self, dataset_id: int, limit: int) -> List[DataSet]:
+        """Returns the published neighbors of a dataset, best ranked first."""
+        return (
+            DataSet.query.join(DSNeighbor, DSNeighbor.neighbor_id == DataSet.id)
+            .join(DSMetaData, DataSet.ds_meta_data_id == DSMetaData.id)
+            .options(
+                selectinload(DataSet.ds_meta_data).selectinload(DSMetaData.authors),
+                selectinload(DataSet.ds_meta_data).selectinload(DSMetaData.tag_list),
+                selectinload(DataSet.counter),
+            )
+            .filter(DSNeighbor.dataset_id == dataset_id, DSMetaData.dataset_doi.isnot(None))
+            .order_by(DSNeighbor.rank)
+            .limit(limit)
+            .all()
+        )
+
+    def get_thresholds(self, dataset_ids: Iterable[int]) -> Dict[int, tuple]:
+        """
+        Returns, per dataset, how many neighbors with a positive score are stored and the lowest of those
+        scores. Datasets that only hold most downloaded fillers are left out.
+        """
+        dataset_ids = list(set(dataset_ids))
+        if not dataset_ids:
+            return {}
+        rows = (
+            self.session.query(DSNeighbor.dataset_id, func.count(), func.min(DSNeighbor.score))
+            .filter(DSNeighbor.dataset_id.in_(dataset_ids), DSNeighbor.score > 0)
+            .group_by(DSNeighbor.dataset_id)
+        )
+        return {dataset_id: (count, min_score) for dataset_id, count, min_score in rows}
+
+    def get_lists(self, dataset_ids: Iterable[int]) -> Dict[int, List[tuple]]:
+        """Returns the stored ``(neighbor_id, score)`` list of each given dataset, best ranked first."""
+        dataset_ids = list(set(dataset_ids))
+        if not dataset_ids:
+            return {}
+        rows = (
+            self.session.query(DSNeighbor.dataset_id, DSNeighbor.neighbor_id, DSNeighbor.score)
+            .filter(DSNeighbor.dataset_id.in_(dataset_ids))
+            .order_by(DSNeighbor.dataset_id, DSNeighbor.rank)
+        )
+        lists = {dataset_id: [] for dataset_id in dataset_ids}
+        for dataset_id, neighbor_id, score in rows:
+            lists[dataset_id].append((neighbor_id, score))
+        return lists
+
+    def replace(self, neighbors: Dict[int, List[tuple]], commit: bool = True):
+        """Replaces the stored neighbors of each given dataset with its ``(neighbor_id, score)`` list."""
+        if not neighbors:
+            return
+        try:
+            self.model.query.filter(self.model.dataset_id.in_(list(neighbors))).delete(synchronize_session=False)
+            rows = [
+                {"dataset_id": dataset_id, "neighbor_id": neighbor_id, "score": score, "rank": rank}
+                for dataset_id, ranked in neighbors.items()
+                for rank, (neighbor_id, score) in enumerate(ranked)
+            ]
+            if rows:
+                self.session.execute(DSNeighbor.__table__.insert(), rows)
+            if commit:
+                self.session.commit()
+        except Exception:
+            self.session.rollback()
+            raise
+
+    def clear(self):
+        self.model.query.delete()
+
+
 class DSViewRecordRepository(BaseRepository):
     def __init__(self):
         super().__init__(DSViewRecord)
@@ -91,6 +392,17 @@ class DSViewRecordRepository(BaseRepository):
             view_cookie=user_cookie,
         )
 
+    def enqueue_new_record(self, dataset: DataSet, user_cookie: str):
+        """Buffers a view record; it is skipped at flush time if the same user and cookie already viewed it."""
+        record_buffer.add(
+            self.model,
+            dedup_on=("user_id", "dataset_id", "view_cookie"),
+            user_id=current_user.id if current_user.is_authenticated else None,
+            dataset_id=dataset.id,
+            view_date=datetime.now(timezone.utc),
+            view_cookie=user_cookie,
+        )
+
 
 class DataSetRepository(BaseRepository):
     def __init__(self):
@@ -99,6 +411,7 @@ class DataSetRepository(BaseRepository):
     def get_synchronized(self, current_user_id: int) -> DataSet:
         return (
             self.model.query.join(DSMetaData)
+            .options(selectinload(DataSet.counter))
             .filter(DataSet.user_id == current_user_id, DSMetaData.dataset_doi.isnot(None))
             .order_by(self.model.created_at.desc())
             .all()
@@ -107,6 +420,7 @@ class DataSetRepository(BaseRepository):
     def get_unsynchronized(self, current_user_id: int) -> DataSet:
         return (
             self.model.query.join(DSMetaData)
+            .options(selectinload(DataSet.counter))
             .filter(DataSet.user_id == current_user_id, DSMetaData.dataset_doi.is_(None))
             .order_by(self.model.created_at.desc())
             .all()
@@ -128,12 +442,76 @@ class DataSetRepository(BaseRepository):
     def latest_synchronized(self):
         return (
             self.model.query.join(DSMetaData)
+            .options(
+                selectinload(DataSet.ds_meta_data).selectinload(DSMetaData.tag_list), selectinload(DataSet.counter)
+            )
             .filter(DSMetaData.dataset_doi.isnot(None))
             .order_by(desc(self.model.id))
             .limit(5)
             .all()
         )
 
+    def get_published_features(self):
+        """
+        Returns the lightweight rows the recommendation index is built from: one row per published
+        dataset with its ranking data, and one row per author and per tag of a published dataset.
+        """
+        datasets = (
+            self.session.query(
+                DataSet.id,
+                DataSet.created_at,
+                DSMetaData.publication_type,
+                func.coalesce(DSCounter.download_count, 0),
+            )
+            .join(DSMetaData, DataSet.ds_meta_data_id == DSMetaData.id)
+            .outerjoin(DSCounter, DSCounter.dataset_id == DataSet.id)
+            .filter(DSMetaData.dataset_doi.isnot(None))
+            .all()
+        )
+        authors = (
+            self.session.query(DataSet.id, Author.name, Author.orcid)
+            .join(DSMetaData, DataSet.ds_meta_data_id == DSMetaData.id)
+            .join(Author, Author.ds_meta_data_id == DSMetaData.id)
+            .filter(DSMetaData.dataset_doi.isnot(None))
+            .all()
+        )
+        tags = (
+            self.session.query(DataSet.id, Tag.name)
+            .join(DSMetaData, DataSet.ds_meta_data_id == DSMetaData.id)
+            .join(ds_meta_data_tag, ds_meta_data_tag.c.ds_meta_data_id == DSMetaData.id)
+            .join(Tag, Tag.id == ds_meta_data_tag.c.tag_id)
+            .filter(DSMetaData.dataset_doi.isnot(None))
+            .all()
+        )
+        return datasets, authors, tags
+
+    def get_lineage(self, dataset_id: int) -> List[DataSet]:
+        """Returns every version sharing the lineage of the given dataset, ordered by version."""
+        current = BaseDataSet.__table__.alias("current_version")
+        root_id = select(current.c.lineage_root_id).where(current.c.id == dataset_id).scalar_subquery()
+        return (
+            self.model.query.join(DSMetaData, DataSet.ds_meta_data_id == DSMetaData.id)
+            .options(contains_eager(DataSet.ds_meta_data))
+            .filter(DataSet.lineage_root_id == root_id)
+            .order_by(DataSet.version, DataSet.id)
+            .all()
+        )
+
+    def get_by_ids(self, ids: List[int], with_files: bool = False) -> List[DataSet]:
+        """Loads the given datasets, keeping the order of ``ids``."""
+        if not ids:
+            return []
+        options = [
+            selectinload(DataSet.ds_meta_data).selectinload(DSMetaData.authors),
+            selectinload(DataSet.ds_meta_data).selectinload(DSMetaData.tag_list),
+            selectinload(DataSet.counter),
+        ]
+        if with_files:
+            options.append(selectinload(DataSet.file_models).selectinload(FileModel.files))
+        datasets = self.model.query.options(*options).filter(DataSet.id.in_(ids)).all()
+        by_id = {dataset.id: dataset for dataset in datasets}
+        return [by_id[i] for i in ids if i in by_id]
+
 
 class DOIMappingRepository(BaseRepository):
     def __init__(self):
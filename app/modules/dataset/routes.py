@@ -2,19 +2,18 @@ import json
 import logging
 import os
 import shutil
-import tempfile
 import uuid
 from datetime import datetime, timezone
-from zipfile import ZipFile
 
 from flask import (
+    Response,
     abort,
     jsonify,
     make_response,
     redirect,
     render_template,
     request,
-    send_from_directory,
+    send_file,
     url_for,
 )
 from flask_login import current_user, login_required
@@ -23,12 +22,19 @@ from app.modules.dataset import dataset_bp
 from app.modules.dataset.forms import DataSetForm
 from app.modules.dataset.services import (
     AuthorService,
+    ChunkedUploadError,
+    ChunkedUploadService,
+    DataSetArchiveCache,
+    DataSetArchiveService,
     DataSetComparisonService,
     DataSetService,
     DOIMappingService,
     DSDownloadRecordService,
     DSMetaDataService,
     DSViewRecordService,
+    save_upload,
+    unique_upload_path,
+    upload_meta_path,
 )
 from app.modules.zenodo.services import ZenodoService
 
@@ -41,6 +47,8 @@ dsmetadata_service = DSMetaDataService()
 zenodo_service = ZenodoService()
 doi_mapping_service = DOIMappingService()
 ds_view_record_service = DSViewRecordService()
+dataset_archive_service = DataSetArchiveService()
+dataset_archive_cache = DataSetArchiveCache()
 
 
 @dataset_bp.route("/dataset/upload", methods=["GET", "POST"])
@@ -135,21 +143,10 @@ def upload():
     if not os.path.exists(temp_folder):
         os.makedirs(temp_folder)
 
-    file_path = os.path.join(temp_folder, file.filename)
-
-    if os.path.exists(file_path):
-        # Generate unique filename (by recursion)
-        base_name, extension = os.path.splitext(file.filename)
-        i = 1
-        while os.path.exists(os.path.join(temp_folder, f"{base_name} ({i}){extension}")):
-            i += 1
-        new_filename = f"{base_name} ({i}){extension}"
-        file_path = os.path.join(temp_folder, new_filename)
-    else:
-        new_filename = file.filename
+    new_filename, file_path = unique_upload_path(temp_folder, file.filename)
 
     try:
-        file.save(file_path)
+        save_upload(file.stream, file_path)
     except Exception as e:
         return jsonify({"message": str(e)}), 500
 
@@ -164,6 +161,62 @@ def upload():
     )
 
 
+@dataset_bp.route("/dataset/file/upload/chunked", methods=["POST"])
+@login_required
+def create_chunked_upload():
+    """Starts a resumable upload of ``{"filename", "size"}``; its bytes are then sent with PATCH."""
+    data = request.get_json(silent=True) or {}
+    try:
+        upload = ChunkedUploadService(current_user.temp_folder()).create(data.get("filename"), data.get("size"))
+    except ChunkedUploadError as e:
+        return jsonify({"message": str(e)}), e.status
+
+    response = jsonify(upload)
+    response.headers["Location"] = url_for("dataset.chunked_upload", upload_id=upload["upload_id"])
+    return response, 201
+
+
+@dataset_bp.route("/dataset/file/upload/chunked/<upload_id>", methods=["GET", "PATCH"])
+@login_required
+def chunked_upload(upload_id):
+    """
+    GET returns the offset the upload continues from. PATCH appends the raw request body at the
+    ``Upload-Offset`` header, checked against an optional ``Upload-Checksum: sha256 <hex digest>`` header.
+    """
+    service = ChunkedUploadService(current_user.temp_folder())
+    try:
+        if request.method == "GET":
+            return jsonify(service.status(upload_id))
+
+        offset = request.headers.get("Upload-Offset", type=int)
+        if offset is None:
+            return jsonify({"message": "Upload-Offset header required"}), 400
+        algorithm, _, digest = request.headers.get("Upload-Checksum", "").partition(" ")
+        if algorithm and algorithm.lower() != "sha256":
+            return jsonify({"message": "Unsupported checksum algorithm"}), 400
+
+        upload = service.append(upload_id, offset, request.stream, request.content_length, sha256=digest or None)
+    except ChunkedUploadError as e:
+        return jsonify({"message": str(e)}), e.status
+
+    response = jsonify(upload)
+    response.headers["Upload-Offset"] = str(upload["offset"])
+    return response
+
+
+@dataset_bp.route("/dataset/file/upload/chunked/<upload_id>/finalize", methods=["POST"])
+@login_required
+def finalize_chunked_upload(upload_id):
+    """Completes the upload into the temp folder, as ``/dataset/file/upload`` does for a single request."""
+    data = request.get_json(silent=True) or {}
+    try:
+        upload = ChunkedUploadService(current_user.temp_folder()).finalize(upload_id, sha256=data.get("sha256"))
+    except ChunkedUploadError as e:
+        return jsonify({"message": str(e)}), e.status
+
+    return jsonify({"message": "UVL uploaded and validated successfully", "filename": upload["filename"]}), 200
+
+
 @dataset_bp.route("/dataset/file/delete", methods=["POST"])
 def delete():
     data = request.get_json()
@@ -173,6 +226,8 @@ def delete():
 
     if os.path.exists(filepath):
         os.remove(filepath)
+        if os.path.exists(upload_meta_path(filepath)):
+            os.remove(upload_meta_path(filepath))
         return jsonify({"message": "File deleted successfully"})
 
     return jsonify({"error": "Error: File not found"})
@@ -182,46 +237,28 @@ def delete():
 def download_dataset(dataset_id):
     dataset = dataset_service.get_or_404(dataset_id)
 
-    file_path = f"uploads/user_{dataset.user_id}/dataset_{dataset.id}/"
-
-    temp_dir = tempfile.mkdtemp()
-    zip_path = os.path.join(temp_dir, f"dataset_{dataset_id}.zip")
-
-    with ZipFile(zip_path, "w") as zipf:
-        for subdir, dirs, files in os.walk(file_path):
-            for file in files:
-                full_path = os.path.join(subdir, file)
+    archive_name = dataset_archive_service.get_archive_name(dataset)
+    cache_key = dataset_archive_cache.get_key(dataset)
+    cached_path = dataset_archive_cache.get(cache_key)
 
-                relative_path = os.path.relpath(full_path, file_path)
-
-                zipf.write(
-                    full_path,
-                    arcname=os.path.join(os.path.basename(zip_path[:-4]), relative_path),
-                )
+    if cached_path:
+        resp = send_file(
+            cached_path, mimetype="application/zip", as_attachment=True, download_name=f"{archive_name}.zip"
+        )
+    else:
+        entries = dataset_archive_service.get_archive_entries(dataset)
+        archive = dataset_archive_cache.stream_and_store(cache_key, dataset_archive_service.stream_archive(entries))
+        resp = Response(archive, mimetype="application/zip")
+        resp.headers["Content-Disposition"] = f'attachment; filename="{archive_name}.zip"'
 
     user_cookie = request.cookies.get("download_cookie")
     if not user_cookie:
         user_cookie = str(uuid.uuid4())  # Generate a new unique identifier if it does not exist
         # Save the cookie to the user's browser
-        resp = make_response(
-            send_from_directory(
-                temp_dir,
-                f"dataset_{dataset_id}.zip",
-                as_attachment=True,
-                mimetype="application/zip",
-            )
-        )
         resp.set_cookie("download_cookie", user_cookie)
-    else:
-        resp = send_from_directory(
-            temp_dir,
-            f"dataset_{dataset_id}.zip",
-            as_attachment=True,
-            mimetype="application/zip",
-        )
 
-    # Record the download in your database
-    DSDownloadRecordService().create(
+    # Record the download in your database (written in batches, off the request path)
+    DSDownloadRecordService().enqueue(
         user_id=current_user.id if current_user.is_authenticated else None,
         dataset_id=dataset_id,
         download_date=datetime.now(timezone.utc),
@@ -1,5 +1,4 @@
 import os
-import shutil
 from datetime import datetime, timezone
 
 from dotenv import load_dotenv
@@ -14,6 +13,7 @@ from app.modules.dataset.models import (
 )
 from app.modules.filemodel.models import FileModel, FMMetaData
 from app.modules.hubfile.models import Hubfile
+from app.modules.hubfile.services import BlobService
 from core.seeders.BaseSeeder import BaseSeeder
 
 
@@ -107,22 +107,22 @@ class DataSetSeeder(BaseSeeder):
         load_dotenv()
         working_dir = os.getenv("WORKING_DIR", "")
         src_folder = os.path.join(working_dir, "app", "modules", "dataset", "pix_examples")
+        blob_service = BlobService()
         for i in range(11):
             file_name = f"file{i+1}.pix"
             file_model = seeded_file_models[i]
-            dataset = next(ds for ds in seeded_datasets if ds.id == file_model.data_set_id)
-            user_id = dataset.user_id
 
-            dest_folder = os.path.join(working_dir, "uploads", f"user_{user_id}", f"dataset_{dataset.id}")
-            os.makedirs(dest_folder, exist_ok=True)
-            shutil.copy(os.path.join(src_folder, file_name), dest_folder)
-
-            file_path = os.path.join(dest_folder, file_name)
+            # seeded datasets share the example files, so each distinct content is stored once
+            src_path = os.path.join(src_folder, file_name)
+            blob = blob_service.get_or_create(*BlobService.hash_file(src_path))
+            blob_service.ingest(src_path, blob, move=False)
 
             pix_file = Hubfile(
                 name=file_name,
                 checksum=f"checksum{i+1}",
-                size=os.path.getsize(file_path),
+                size=blob.size,
                 file_model_id=file_model.id,
+                storage_path=blob.get_storage_path(),
+                blob=blob,
             )
             self.seed([pix_file])
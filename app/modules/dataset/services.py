@@ -1,43 +1,315 @@
 import difflib
+import fcntl
 import hashlib
+import heapq
+import io
+import json
 import logging
 import os
-import shutil
+import re
+import threading
+import time
 import uuid
-from typing import Optional
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from typing import BinaryIO, Dict, Iterator, List, Optional, Tuple
+from zipfile import ZIP_DEFLATED, ZipFile, ZipInfo
 
 from flask import request
 
+from app import file_storage
 from app.modules.auth.services import AuthenticationService
-from app.modules.dataset.models import DataSet, DSMetaData, DSViewRecord
+from app.modules.dataset.models import DataSet, DSMetaData, DSViewRecord, person_key
 from app.modules.dataset.repositories import (
+    LEADERBOARD_PERIODS,
+    UNSUPPORTED_PERIOD_MESSAGE,
     AuthorRepository,
     DataSetRepository,
     DOIMappingRepository,
+    DSCounterRepository,
+    DSDownloadBucketRepository,
     DSDownloadRecordRepository,
     DSMetaDataRepository,
+    DSNeighborRepository,
     DSViewRecordRepository,
+    PersonRepository,
 )
+from app.modules.explore.services import DatasetSearchService
 from app.modules.filemodel.repositories import FileModelRepository, FMMetaDataRepository
+from app.modules.hubfile.models import Hubfile
 from app.modules.hubfile.repositories import (
     HubfileDownloadRecordRepository,
     HubfileRepository,
     HubfileViewRecordRepository,
 )
+from app.modules.hubfile.services import BlobService, HubfileService
+from core.configuration.configuration import archive_cache_folder_name, archive_cache_max_bytes
 from core.services.BaseService import BaseService
 
 logger = logging.getLogger(__name__)
 
 
+UPLOAD_BLOCK_SIZE = 1024 * 1024
+
+
+def upload_meta_path(file_path: str) -> str:
+    """Sidecar holding the checksums and size of an uploaded file, next to it in the temp folder."""
+    return f"{file_path}.meta.json"
+
+
+def save_upload(stream, file_path: str) -> dict:
+    """
+    Writes ``stream`` to ``file_path`` one block at a time, computing its md5, sha256 and size in the same
+    pass, and records them in the sidecar of the file so they are not computed again.
+    """
+    md5, sha256, size = hashlib.md5(), hashlib.sha256(), 0
+    temp_path = f"{file_path}.part"
+    try:
+        with open(temp_path, "wb") as fh:
+            for block in iter(lambda: stream.read(UPLOAD_BLOCK_SIZE), b""):
+                fh.write(block)
+                md5.update(block)
+                sha256.update(block)
+                size += len(block)
+        os.replace(temp_path, file_path)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+    checksums = {"md5": md5.hexdigest(), "sha256": sha256.hexdigest(), "size": size}
+    write_upload_meta(file_path, checksums)
+    return checksums
+
+
+def write_upload_meta(file_path: str, checksums: dict):
+    with open(upload_meta_path(file_path), "w") as fh:
+        json.dump({**checksums, "mtime_ns": os.stat(file_path).st_mtime_ns}, fh)
+
+
+def read_upload_meta(file_path: str) -> Optional[dict]:
+    """Returns the checksums of the sidecar of ``file_path``, or None if it is missing or the file changed."""
+    try:
+        with open(upload_meta_path(file_path)) as fh:
+            meta = json.load(fh)
+        stat = os.stat(file_path)
+    except (OSError, ValueError):
+        return None
+    if meta.get("size") != stat.st_size or meta.get("mtime_ns") != stat.st_mtime_ns:
+        return None
+    return {key: meta[key] for key in ("md5", "sha256", "size")}
+
+
+def calculate_checksums(file_path: str) -> dict:
+    """Computes the md5, sha256 and size of the file in one pass, reading it one block at a time."""
+    md5, sha256, size = hashlib.md5(), hashlib.sha256(), 0
+    with open(file_path, "rb") as fh:
+        for block in iter(lambda: fh.read(UPLOAD_BLOCK_SIZE), b""):
+            md5.update(block)
+            sha256.update(block)
+            size += len(block)
+    return {"md5": md5.hexdigest(), "sha256": sha256.hexdigest(), "size": size}
+
+
+def upload_checksums(file_path: str) -> dict:
+    return read_upload_meta(file_path) or calculate_checksums(file_path)
+
+
 def calculate_checksum_and_size(file_path):
-    file_size = os.path.getsize(file_path)
-    with open(file_path, "rb") as file:
-        content = file.read()
-        hash_md5 = hashlib.md5(content).hexdigest()
-        return hash_md5, file_size
+    checksums = calculate_checksums(file_path)
+    return checksums["md5"], checksums["size"]
+
+
+def unique_upload_path(temp_folder: str, filename: str) -> Tuple[str, str]:
+    """Returns the name and path ``filename`` is saved as in the temp folder, numbered if it is taken."""
+    file_path = os.path.join(temp_folder, filename)
+    if not os.path.exists(file_path):
+        return filename, file_path
+
+    base_name, extension = os.path.splitext(filename)
+    i = 1
+    while os.path.exists(os.path.join(temp_folder, f"{base_name} ({i}){extension}")):
+        i += 1
+    new_filename = f"{base_name} ({i}){extension}"
+    return new_filename, os.path.join(temp_folder, new_filename)
+
+
+class ChunkedUploadError(Exception):
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+class ChunkedUploadService:
+    """
+    Resumable uploads to a user's temp folder. An upload is created with its name and size, its bytes are
+    appended in chunks at the offset the server reports, each chunk optionally checked against its sha256,
+    and it is finalized into a regular temp upload (with its checksums sidecar) once complete. A dropped
+    chunk is resent from the last offset instead of restarting the upload. Uploads left untouched for
+    UPLOAD_TTL are removed.
+    """
+
+    MAX_UPLOAD_SIZE = 1024 * 1024 * 1024
+    MAX_CHUNK_SIZE = 16 * 1024 * 1024
+    UPLOAD_TTL = timedelta(days=1)
+    ID_PATTERN = re.compile(r"^[0-9a-f]{32}$")
+
+    def __init__(self, temp_folder: str):
+        self.temp_folder = temp_folder
+        self.directory = os.path.join(temp_folder, ".chunked")
+
+    def _paths(self, upload_id: str) -> Tuple[str, str]:
+        if not self.ID_PATTERN.match(upload_id or ""):
+            raise ChunkedUploadError("Upload not found", 404)
+        base = os.path.join(self.directory, upload_id)
+        return f"{base}.json", f"{base}.part"
+
+    def _load(self, upload_id: str) -> Tuple[dict, str, str]:
+        state_path, part_path = self._paths(upload_id)
+        try:
+            with open(state_path) as fh:
+                state = json.load(fh)
+        except (OSError, ValueError):
+            raise ChunkedUploadError("Upload not found", 404)
+        return state, state_path, part_path
+
+    @contextmanager
+    def _locked(self, upload_id: str) -> Iterator[Tuple[dict, str, str, BinaryIO]]:
+        """
+        Opens the part file of an upload holding an exclusive lock on it, so two requests on the same upload
+        (a chunk and its retry after a timeout) never write, truncate or finalize it at the same time.
+        """
+        state, state_path, part_path = self._load(upload_id)
+        try:
+            fh = open(part_path, "r+b")
+        except OSError:
+            raise ChunkedUploadError("Upload not found", 404)
+        with fh:
+            try:
+                fcntl.flock(fh, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                raise ChunkedUploadError("Another request is writing this upload", 409)
+            # finalized or expired between loading its state and taking the lock
+            if not os.path.exists(state_path):
+                raise ChunkedUploadError("Upload not found", 404)
+            yield state, state_path, part_path, fh
+
+    @staticmethod
+    def _status(upload_id: str, state: dict, part_path: str) -> dict:
+        offset = os.path.getsize(part_path)
+        return {"upload_id": upload_id, "filename": state["filename"], "size": state["size"], "offset": offset}
+
+    def create(self, filename: str, size: int) -> dict:
+        filename = os.path.basename(filename or "")
+        if not filename.endswith(".pix"):
+            raise ChunkedUploadError("No valid file")
+        if not isinstance(size, int) or isinstance(size, bool) or size < 0:
+            raise ChunkedUploadError("Invalid upload size")
+        if size > self.MAX_UPLOAD_SIZE:
+            raise ChunkedUploadError("Upload too large", 413)
+
+        self.expire()
+        upload_id = uuid.uuid4().hex
+        state_path, part_path = self._paths(upload_id)
+        os.makedirs(self.directory, exist_ok=True)
+        open(part_path, "wb").close()
+        with open(state_path, "w") as fh:
+            json.dump({"filename": filename, "size": size}, fh)
+        return self._status(upload_id, {"filename": filename, "size": size}, part_path)
+
+    def status(self, upload_id: str) -> dict:
+        state, _, part_path = self._load(upload_id)
+        return self._status(upload_id, state, part_path)
+
+    def append(self, upload_id: str, offset: int, stream, length: int, sha256: str = None) -> dict:
+        """
+        Writes the ``length`` bytes of ``stream`` at ``offset``, which must be the current end of the upload.
+        A chunk that arrives short or does not match ``sha256`` is discarded, leaving the offset unchanged.
+        """
+        with self._locked(upload_id) as (state, _, part_path, fh):
+            current = fh.seek(0, io.SEEK_END)
+            if offset != current:
+                raise ChunkedUploadError(f"Upload is at offset {current}", 409)
+            if length is None or length < 0:
+                raise ChunkedUploadError("Chunk length required", 411)
+            if length > self.MAX_CHUNK_SIZE or current + length > state["size"]:
+                raise ChunkedUploadError("Chunk too large", 413)
+
+            digest, received = hashlib.sha256(), 0
+            while received < length:
+                block = stream.read(min(UPLOAD_BLOCK_SIZE, length - received))
+                if not block:
+                    break
+                fh.write(block)
+                digest.update(block)
+                received += len(block)
+
+            error = None
+            if received != length:
+                error = "Incomplete chunk"
+            elif sha256 and digest.hexdigest() != sha256.lower():
+                error = "Chunk checksum mismatch"
+            if error:
+                fh.truncate(current)
+                raise ChunkedUploadError(error)
+
+            fh.flush()
+            return self._status(upload_id, state, part_path)
+
+    def finalize(self, upload_id: str, sha256: str = None) -> dict:
+        """Moves a complete upload into the temp folder and records its checksums in its sidecar."""
+        with self._locked(upload_id) as (state, state_path, part_path, fh):
+            offset = fh.seek(0, io.SEEK_END)
+            if offset != state["size"]:
+                raise ChunkedUploadError(f"Upload is at offset {offset} of {state['size']}", 409)
+
+            checksums = calculate_checksums(part_path)
+            if sha256 and checksums["sha256"] != sha256.lower():
+                raise ChunkedUploadError("Upload checksum mismatch")
+
+            filename, file_path = unique_upload_path(self.temp_folder, state["filename"])
+            os.replace(part_path, file_path)
+            os.remove(state_path)
+        write_upload_meta(file_path, checksums)
+        return {"filename": filename, **checksums}
+
+    def expire(self, max_age: timedelta = None) -> int:
+        """Removes the uploads nothing was written to for ``max_age`` (UPLOAD_TTL). Returns how many."""
+        if not os.path.isdir(self.directory):
+            return 0
+        max_age = self.UPLOAD_TTL if max_age is None else max_age
+        cutoff = time.time() - max_age.total_seconds()
+
+        expired = 0
+        for upload_id in {os.path.splitext(name)[0] for name in os.listdir(self.directory)}:
+            if not self.ID_PATTERN.match(upload_id):
+                continue
+            paths = [path for path in self._paths(upload_id) if os.path.exists(path)]
+            try:
+                if max(os.path.getmtime(path) for path in paths) > cutoff:
+                    continue
+            except (OSError, ValueError):
+                continue
+            try:
+                with self._locked(upload_id) as (_, state_path, part_path, _fh):
+                    os.remove(state_path)
+                    os.remove(part_path)
+            except ChunkedUploadError as e:
+                if e.status != 404:
+                    # being written right now
+                    continue
+                # left half-created: no state or no part file
+                for path in paths:
+                    if os.path.exists(path):
+                        os.remove(path)
+            expired += 1
+        return expired
 
 
 class DataSetService(BaseService):
+    HASH_WORKERS = 4
+
     def __init__(self):
         super().__init__(DataSetRepository())
         self.file_model_repository = FileModelRepository()
@@ -49,37 +321,45 @@ class DataSetService(BaseService):
         self.hubfilerepository = HubfileRepository()
         self.dsviewrecord_repostory = DSViewRecordRepository()
         self.hubfileviewrecord_repository = HubfileViewRecordRepository()
+        self.blob_service = BlobService()
+
+    def calculate_upload_checksums(self, file_paths: List[str]) -> Dict[str, dict]:
+        """
+        Checksums of the uploaded files by path, computed in a bounded pool of threads since hashlib
+        releases the GIL while hashing; a dataset takes about as long as its largest file.
+        """
+        file_paths = list(dict.fromkeys(file_paths))
+        if len(file_paths) <= 1:
+            return {file_path: upload_checksums(file_path) for file_path in file_paths}
+        with ThreadPoolExecutor(
+            max_workers=min(self.HASH_WORKERS, len(file_paths)), thread_name_prefix="upload-checksums"
+        ) as pool:
+            return dict(zip(file_paths, pool.map(upload_checksums, file_paths)))
 
     def move_file_models(self, dataset: DataSet):
+        """Moves the uploaded files into the blob store; files whose content is already stored are dropped."""
         current_user = AuthenticationService().get_authenticated_user()
         source_dir = current_user.temp_folder()
 
-        working_dir = os.getenv("WORKING_DIR", "")
-        dest_dir = os.path.join(working_dir, "uploads", f"user_{current_user.id}", f"dataset_{dataset.id}")
-
-        os.makedirs(dest_dir, exist_ok=True)
-
-        for file_model in dataset.file_models:
-            filename = file_model.fm_meta_data.filename
-            shutil.move(os.path.join(source_dir, filename), dest_dir)
+        for hubfile in dataset.files():
+            source_path = os.path.join(source_dir, hubfile.name)
+            if hubfile.blob and os.path.exists(source_path):
+                self.blob_service.ingest(source_path, hubfile.blob)
+            if os.path.exists(upload_meta_path(source_path)):
+                os.remove(upload_meta_path(source_path))
 
     def get_synchronized(self, current_user_id: int) -> DataSet:
         return self.repository.get_synchronized(current_user_id)
 
-    # ordenamos por descargas y si hay empate por reciente
+    # ordenamos por similitud, por descargas y si hay empate por reciente
     def get_dataset_recommendations(self, dataset, limit=5) -> DataSet:
-        other_datasets = DataSet.query.filter(DataSet.id != dataset.id).all()
-        scored_datasets = []
-        for ds in other_datasets:
-            score = dataset.calculate_similarity_score(ds)
-            scored_datasets.append((ds, score))
-        scored_datasets_sorted = sorted(
-            scored_datasets,
-            key=lambda x: (x[1], x[0].get_download_count(), x[0].created_at),
-            reverse=True
-        )
-        datasets_with_doi = [d for d, _ in scored_datasets_sorted if d.ds_meta_data and d.ds_meta_data.dataset_doi]
-        return [ds for ds in datasets_with_doi[:limit]]
+        return DSNeighborService().get_neighbors(dataset, limit=limit)
+
+    def refresh_neighbors(self, dataset):
+        try:
+            DSNeighborService().refresh(dataset)
+        except Exception as exc:
+            logger.exception(f"Exception refreshing the neighbors of dataset {dataset.id}: {exc}")
 
     def get_unsynchronized(self, current_user_id: int) -> DataSet:
         return self.repository.get_unsynchronized(current_user_id)
@@ -110,8 +390,8 @@ class DataSetService(BaseService):
 
     def get_dataset_leaderboard(self, period="week") -> DataSet:
         period = "".join(e for e in period if e.isalnum())
-        if period not in ["week", "month"]:
-            raise ValueError("Periodo no soportado: usa 'week' o 'month'")
+        if period not in LEADERBOARD_PERIODS:
+            raise ValueError(UNSUPPORTED_PERIOD_MESSAGE)
         datasets = self.dsdownloadrecord_repository.top_3_dowloaded_datasets_per_week(period=period)
         if not datasets:  # Manejar None o lista vacía
             return []
@@ -124,6 +404,11 @@ class DataSetService(BaseService):
             "affiliation": current_user.profile.affiliation,
             "orcid": current_user.profile.orcid,
         }
+        # hashed before the first write, so the transaction below only waits on the database
+        temp_folder = current_user.temp_folder()
+        checksums_by_path = self.calculate_upload_checksums(
+            [os.path.join(temp_folder, file_model.filename.data) for file_model in form.file_models]
+        )
         try:
 
             logger.info(f"Creating dsmetadata...: {form.get_dsmetadata()}")
@@ -151,6 +436,10 @@ class DataSetService(BaseService):
             dataset.version = target_version
             dataset.previous_version_id = target_prev_id
 
+            blobs = self.blob_service.get_or_create_many(
+                {checksums["sha256"]: checksums["size"] for checksums in checksums_by_path.values()}
+            )
+            hubfiles = []
             for file_model in form.file_models:
                 filename = file_model.filename.data
                 fmmetadata = self.fmmetadata_repository.create(commit=False, **file_model.get_fmmetadata())
@@ -162,18 +451,19 @@ class DataSetService(BaseService):
                     commit=False, data_set_id=dataset.id, fm_meta_data_id=fmmetadata.id
                 )
 
-                file_path = os.path.join(current_user.temp_folder(), filename)
-                checksum, size = calculate_checksum_and_size(file_path)
-
-                file = self.hubfilerepository.create(
-                    commit=False,
+                checksums = checksums_by_path[os.path.join(temp_folder, filename)]
+                blob = blobs[checksums["sha256"]]
+                file = Hubfile(
                     name=filename,
-                    checksum=checksum,
-                    size=size,
-                    file_model_id=fm.id,
+                    checksum=checksums["md5"],
+                    size=checksums["size"],
+                    storage_path=blob.get_storage_path(),
+                    blob=blob,
                 )
                 fm.files.append(file)
+                hubfiles.append(file)
 
+            self.repository.session.add_all(hubfiles)
             self.repository.session.commit()
 
         except Exception as exc:
@@ -181,12 +471,19 @@ class DataSetService(BaseService):
             self.repository.session.rollback()
             raise exc
 
+        self.refresh_neighbors(dataset)
         return dataset
 
     def update_dsmetadata(self, id, **kwargs):
-        return self.dsmetadata_repository.update(id, **kwargs)
-
-    def get_pixelhub_doi(self, dataset: DataSet) -> str:
+        dsmetadata = self.dsmetadata_repository.update(id, **kwargs)
+        if dsmetadata and kwargs.get("dataset_doi") and dsmetadata.data_set:
+            dataset_recommendation_index.add(dsmetadata.data_set)
+            DatasetSearchService().publish(dsmetadata.data_set)
+            self.refresh_neighbors(dsmetadata.data_set)
+        return dsmetadata
+
+    @staticmethod
+    def get_pixelhub_doi_base_url() -> str:
         env = os.getenv("FLASK_ENV", "production")
         domain = os.getenv("DOMAIN", "localhost")
 
@@ -195,50 +492,45 @@ class DataSetService(BaseService):
         else:
             protocol = "https"
 
-        # 4. Construye la URL
-        return f"{protocol}://{domain}/doi/{dataset.ds_meta_data.dataset_doi}"
+        return f"{protocol}://{domain}/doi"
+
+    def get_pixelhub_doi(self, dataset: DataSet) -> str:
+        return f"{self.get_pixelhub_doi_base_url()}/{dataset.ds_meta_data.dataset_doi}"
 
     def get_dataset_history(self, dataset_id: int) -> list:
         """
-        Recupera toda la línea temporal de versiones de un dataset.
-        1. Encuentra el dataset raíz (Versión 1).
-        2. Recorre descendientemente para encontrar todas las versiones posteriores.
+        Recupera toda la línea temporal de versiones de un dataset, ordenada por versión,
+        en una sola consulta sobre su lineage_root_id.
         """
-        current = self.repository.get_by_id(dataset_id)
-        if not current:
-            return []
-
-        root = current
-        while root.previous_version_id is not None:
-            parent = self.repository.get_by_id(root.previous_version_id)
-            if not parent:
-                break
-            root = parent
+        return self.repository.get_lineage(dataset_id)
 
-        history = [root]
 
-        queue = [root]
+class AuthorService(BaseService):
+    def __init__(self):
+        super().__init__(AuthorRepository())
 
-        while queue:
-            node = queue.pop(0)
-            children = sorted(node.next_versions, key=lambda x: x.version)
 
-            for child in children:
-                history.append(child)
-                queue.append(child)
+class PersonService(BaseService):
+    def __init__(self):
+        super().__init__(PersonRepository())
 
-        return sorted(history, key=lambda x: x.version)
+    def get_by_author(self, author):
+        return self.repository.get_by_key(person_key(author.name, author.orcid))
 
+    def get_datasets(self, person_id: int):
+        return self.repository.get_datasets(person_id)
 
-class AuthorService(BaseService):
-    def __init__(self):
-        super().__init__(AuthorRepository())
+    def get_coauthors(self, person_id: int, limit: int = 10):
+        return self.repository.get_coauthors(person_id, limit)
 
 
 class DSDownloadRecordService(BaseService):
     def __init__(self):
         super().__init__(DSDownloadRecordRepository())
 
+    def enqueue(self, **kwargs):
+        return self.repository.enqueue(**kwargs)
+
 
 class DSMetaDataService(BaseService):
     def __init__(self):
@@ -251,6 +543,19 @@ class DSMetaDataService(BaseService):
         return self.repository.filter_by_doi(doi)
 
 
+class DSCounterService(BaseService):
+    def __init__(self):
+        super().__init__(DSCounterRepository())
+
+    def get_download_counts(self, dataset_ids) -> dict:
+        return self.repository.get_download_counts(dataset_ids)
+
+    def rebuild(self) -> int:
+        rebuilt = self.repository.rebuild()
+        DSDownloadBucketRepository().rebuild()
+        return rebuilt
+
+
 class DSViewRecordService(BaseService):
     def __init__(self):
         super().__init__(DSViewRecordRepository())
@@ -266,10 +571,7 @@ class DSViewRecordService(BaseService):
         if not user_cookie:
             user_cookie = str(uuid.uuid4())
 
-        existing_record = self.the_record_exists(dataset=dataset, user_cookie=user_cookie)
-
-        if not existing_record:
-            self.create_new_record(dataset=dataset, user_cookie=user_cookie)
+        self.repository.enqueue_new_record(dataset=dataset, user_cookie=user_cookie)
 
         return user_cookie
 
@@ -301,6 +603,463 @@ class SizeService:
             return f"{round(size / (1024**3), 2)} GB"
 
 
+class DataSetSerializer:
+    """
+    Serializes a list of datasets into the same dicts as ``PixDataset.to_dict``, loading the related
+    rows with a fixed number of queries and computing the derived fields in a single pass.
+    """
+
+    def __init__(self, repository=None):
+        self.repository = repository or DataSetRepository()
+
+    def serialize(self, datasets) -> List[dict]:
+        datasets = list(datasets)
+        if not datasets:
+            return []
+
+        # populates the relationships of the given instances
+        self.repository.get_by_ids([dataset.id for dataset in datasets], with_files=True)
+
+        host_url = request.host_url.rstrip("/")
+        doi_base_url = DataSetService.get_pixelhub_doi_base_url()
+        zenodo_base_url = os.getenv("FAKENODO_URL", "https://zenodo.org")
+        size_service = SizeService()
+
+        return [self._serialize(dataset, host_url, doi_base_url, zenodo_base_url, size_service) for dataset in datasets]
+
+    @staticmethod
+    def _serialize(dataset, host_url, doi_base_url, zenodo_base_url, size_service) -> dict:
+        meta = dataset.ds_meta_data
+
+        files = []
+        total_size = 0
+        for file_model in dataset.file_models:
+            for file in file_model.files:
+                total_size += file.size
+                files.append(
+                    {
+                        "id": file.id,
+                        "name": file.name,
+                        "checksum": file.checksum,
+                        "size_in_bytes": file.size,
+                        "size_in_human_format": size_service.get_human_readable_size(file.size),
+                        "url": f"{host_url}/file/download/{file.id}",
+                    }
+                )
+
+        return {
+            "title": meta.title,
+            "id": dataset.id,
+            "created_at": dataset.created_at,
+            "created_at_timestamp": int(dataset.created_at.timestamp()),
+            "description": meta.description,
+            "authors": [author.to_dict() for author in meta.authors],
+            "publication_type": meta.publication_type.name.replace("_", " ").title(),
+            "publication_doi": meta.publication_doi,
+            "dataset_doi": meta.dataset_doi,
+            "tags": meta.get_tag_labels(),
+            "url": f"{doi_base_url}/{meta.dataset_doi}",
+            "download": f"{host_url}/dataset/download/{dataset.id}",
+            "zenodo": f"{zenodo_base_url}/api/depositions/{meta.deposition_id}" if meta.dataset_doi else None,
+            "files": files,
+            "files_count": len(files),
+            "total_size_in_bytes": total_size,
+            "total_size_in_human_format": size_service.get_human_readable_size(total_size),
+            "download_count": dataset.counter.download_count if dataset.counter else 0,
+        }
+
+
+class _ZipStreamBuffer:
+    """Write-only sink that hands ZipFile output back to the caller chunk by chunk.
+
+    It has no ``tell``/``seek``, so ZipFile treats it as unseekable and writes data
+    descriptors after each entry instead of patching local headers afterwards.
+    """
+
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+
+class DataSetArchiveService:
+    CHUNK_SIZE = 64 * 1024
+
+    def __init__(self, storage=None):
+        self.storage = storage or file_storage
+
+    def get_archive_name(self, dataset: DataSet) -> str:
+        return f"dataset_{dataset.id}"
+
+    def get_archive_entries(self, dataset: DataSet) -> List[Tuple[str, str]]:
+        """
+        Builds the (storage key, name inside the archive) pairs of a dataset from its Hubfile rows.
+        Files missing from the storage backend are skipped.
+        """
+        archive_name = self.get_archive_name(dataset)
+        hubfiles = dataset.files()
+        keys = HubfileService().get_storage_keys(hubfiles)
+
+        entries = []
+        for hubfile in hubfiles:
+            key = keys[hubfile.id]
+            if not self.storage.exists(key):
+                logger.warning(f"File {key} of dataset {dataset.id} not found, skipping it in the archive")
+                continue
+            entries.append((key, os.path.join(archive_name, hubfile.name)))
+        return entries
+
+    def stream_archive(self, entries: List[Tuple[str, str]]) -> Iterator[bytes]:
+        """
+        Yields a ZIP64-compatible archive of the given entries without touching the disk,
+        so memory use is bounded by CHUNK_SIZE whatever the size of the dataset.
+        """
+        buffer = _ZipStreamBuffer()
+        with ZipFile(buffer, "w", compression=ZIP_DEFLATED) as zipf:
+            for key, arcname in entries:
+                zinfo = ZipInfo(arcname, date_time=time.localtime()[:6])
+                zinfo.compress_type = ZIP_DEFLATED
+                with self.storage.open(key) as source, zipf.open(zinfo, "w", force_zip64=True) as dest:
+                    while True:
+                        chunk = source.read(self.CHUNK_SIZE)
+                        if not chunk:
+                            break
+                        dest.write(chunk)
+                        data = buffer.drain()
+                        if data:
+                            yield data
+                data = buffer.drain()
+                if data:
+                    yield data
+        # Closing the ZipFile writes the central directory
+        yield buffer.drain()
+
+
+class DataSetArchiveCache:
+    """
+    Persistent cache of dataset archives keyed by their content, bounded in size with LRU eviction.
+    The modification time of each archive is used as its last access time.
+    """
+
+    def __init__(self, directory: Optional[str] = None, max_bytes: Optional[int] = None):
+        self._directory = directory
+        self._max_bytes = max_bytes
+
+    @property
+    def directory(self) -> str:
+        if self._directory:
+            return self._directory
+        return os.path.join(os.getenv("WORKING_DIR", ""), archive_cache_folder_name())
+
+    @property
+    def max_bytes(self) -> int:
+        return self._max_bytes if self._max_bytes is not None else archive_cache_max_bytes()
+
+    def get_key(self, dataset: DataSet) -> str:
+        """
+        Identifies an archive by the dataset id and the sorted (name, checksum) list of its Hubfile rows,
+        so any new, removed or changed file yields a different key.
+        """
+        digest = hashlib.sha256(f"dataset:{dataset.id}".encode())
+        for name, checksum in sorted((hubfile.name, hubfile.checksum) for hubfile in dataset.files()):
+            digest.update(f"\n{name}\0{checksum}".encode())
+        return digest.hexdigest()
+
+    def get_path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.zip")
+
+    def get(self, key: str) -> Optional[str]:
+        path = self.get_path(key)
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        return path
+
+    def stream_and_store(self, key: str, chunks: Iterator[bytes]) -> Iterator[bytes]:
+        """
+        Passes the archive chunks through to the client while writing them to the cache.
+        The entry only becomes visible once it is complete, so concurrent or aborted downloads
+        never leave a truncated archive behind.
+        """
+        directory = self.directory
+        os.makedirs(directory, exist_ok=True)
+        temp_path = os.path.join(directory, f".{key}.{uuid.uuid4().hex}.part")
+        try:
+            with open(temp_path, "wb") as cache_file:
+                for chunk in chunks:
+                    cache_file.write(chunk)
+                    yield chunk
+            os.replace(temp_path, os.path.join(directory, f"{key}.zip"))
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+        self.evict(directory)
+
+    def evict(self, directory: Optional[str] = None):
+        directory = directory or self.directory
+        try:
+            names = [name for name in os.listdir(directory) if name.endswith(".zip")]
+        except FileNotFoundError:
+            return
+
+        archives = []
+        for name in names:
+            try:
+                stat = os.stat(os.path.join(directory, name))
+            except FileNotFoundError:
+                continue
+            archives.append((stat.st_mtime, stat.st_size, name))
+
+        total_size = sum(size for _, size, _ in archives)
+        for _, size, name in sorted(archives):
+            if total_size <= self.max_bytes:
+                break
+            try:
+                os.remove(os.path.join(directory, name))
+            except FileNotFoundError:
+                pass
+            total_size -= size
+
+
+class DataSetRecommendationIndex:
+    """
+    In-memory inverted index from dataset features (tags, author identity and publication type)
+    to published dataset ids. Only datasets sharing at least one feature with the target are scored,
+    and only the selected ones are loaded from the database.
+    """
+
+    AUTHOR_WEIGHT = 10
+    TAG_WEIGHT = 3
+    PUBLICATION_TYPE_WEIGHT = 6
+    TTL = 300
+
+    def __init__(self, repository=None, ttl=None):
+        self.repository = repository or DataSetRepository()
+        self.ttl = self.TTL if ttl is None else ttl
+        self._lock = threading.Lock()
+        self._postings = None
+        self._features = {}
+        self._ranking = {}
+        self._built_at = 0.0
+
+    @staticmethod
+    def tag_feature(tag: str):
+        return ("tag", tag.strip().lower())
+
+    @staticmethod
+    def author_feature(name: Optional[str], orcid: Optional[str]):
+        return ("author", person_key(name, orcid))
+
+    @staticmethod
+    def publication_type_feature(publication_type):
+        return ("type", getattr(publication_type, "name", publication_type))
+
+    @classmethod
+    def weight(cls, feature) -> int:
+        return {
+            "author": cls.AUTHOR_WEIGHT,
+            "tag": cls.TAG_WEIGHT,
+            "type": cls.PUBLICATION_TYPE_WEIGHT,
+        }[feature[0]]
+
+    @classmethod
+    def features_of(cls, dataset) -> set:
+        meta = dataset.ds_meta_data
+        features = {cls.tag_feature(tag.name) for tag in meta.tag_list}
+        features.update(cls.author_feature(author.name, author.orcid) for author in meta.authors or [])
+        if meta.publication_type is not None:
+            features.add(cls.publication_type_feature(meta.publication_type))
+        return features
+
+    def invalidate(self):
+        with self._lock:
+            self._postings = None
+
+    def add(self, dataset):
+        """Adds a newly published dataset to an already built index."""
+        features = self.features_of(dataset)
+        with self._lock:
+            if self._postings is None:
+                return
+            for feature in self._features.get(dataset.id, ()):
+                self._postings.get(feature, set()).discard(dataset.id)
+            for feature in features:
+                self._postings.setdefault(feature, set()).add(dataset.id)
+            self._features[dataset.id] = features
+            self._ranking[dataset.id] = (dataset.get_download_count(), dataset.created_at)
+
+    def is_published(self, dataset_id: int) -> bool:
+        self._ensure_built()
+        return dataset_id in self._ranking
+
+    def build(self):
+        datasets, authors, tags = self.repository.get_published_features()
+
+        features = defaultdict(set)
+        ranking = {}
+        for dataset_id, created_at, publication_type, download_count in datasets:
+            ranking[dataset_id] = (download_count, created_at)
+            if publication_type is not None:
+                features[dataset_id].add(self.publication_type_feature(publication_type))
+        for dataset_id, name, orcid in authors:
+            features[dataset_id].add(self.author_feature(name, orcid))
+        for dataset_id, name in tags:
+            features[dataset_id].add(self.tag_feature(name))
+
+        postings = defaultdict(set)
+        for dataset_id, dataset_features in features.items():
+            for feature in dataset_features:
+                postings[feature].add(dataset_id)
+
+        with self._lock:
+            self._postings = dict(postings)
+            self._features = dict(features)
+            self._ranking = ranking
+            self._built_at = time.monotonic()
+
+    def _ensure_built(self):
+        if self._postings is None or time.monotonic() - self._built_at > self.ttl:
+            self.build()
+
+    def published_ids(self) -> List[int]:
+        self._ensure_built()
+        return list(self._ranking)
+
+    def scores(self, dataset_id: int, features=None) -> dict:
+        """
+        Returns the similarity score of every published dataset sharing at least one feature with the
+        given one. ``features`` is only needed for datasets that are not published yet.
+        """
+        self._ensure_built()
+        postings = self._postings
+
+        target = self._features.get(dataset_id) or features or set()
+        scores = defaultdict(int)
+        for feature in target:
+            weight = self.weight(feature)
+            for candidate_id in postings.get(feature, ()):
+                scores[candidate_id] += weight
+        scores.pop(dataset_id, None)
+        return scores
+
+    def top(self, dataset_id: int, limit=5, features=None, fill=True) -> List[Tuple[int, int]]:
+        """
+        Returns the ``(id, score)`` of the ``limit`` published datasets most similar to the given one,
+        ranked by similarity, then downloads, then recency. When fewer datasets share a feature with it
+        and ``fill`` is set, the list is completed with the most downloaded ones.
+        """
+        scores = self.scores(dataset_id, features)
+        ranking = self._ranking
+
+        top = heapq.nlargest(limit, scores, key=lambda i: (scores[i],) + ranking[i])
+        if fill and len(top) < limit:
+            others = (i for i in ranking if i != dataset_id and i not in scores)
+            top += heapq.nlargest(limit - len(top), others, key=ranking.__getitem__)
+        return [(i, scores.get(i, 0)) for i in top]
+
+    def insert(self, ranked: List[Tuple[int, int]], dataset_id: int, score: int, limit: int):
+        """
+        Inserts ``dataset_id`` with ``score`` into a stored ``(id, score)`` list ranked as ``top`` does,
+        keeping it at ``limit`` entries. Returns None when the dataset does not beat its lowest positive
+        entry, so the list is left as it is.
+        """
+        self._ensure_built()
+        ranking = self._ranking
+
+        def key(i, i_score):
+            return (i_score,) + ranking.get(i, (-1, datetime.min))
+
+        ranked = [(i, i_score) for i, i_score in ranked if i != dataset_id]
+        matches = [(i, i_score) for i, i_score in ranked if i_score > 0]
+        fillers = [(i, i_score) for i, i_score in ranked if i_score <= 0]
+        if len(matches) >= limit and key(dataset_id, score) <= key(*matches[limit - 1]):
+            return None
+
+        position = next(
+            (n for n, entry in enumerate(matches) if key(dataset_id, score) > key(*entry)),
+            len(matches),
+        )
+        matches.insert(position, (dataset_id, score))
+        return (matches + fillers)[:limit]
+
+    def recommend_ids(self, dataset, limit=5, fill=True) -> List[int]:
+        features = None if self.is_published(dataset.id) else self.features_of(dataset)
+        return [i for i, _ in self.top(dataset.id, limit=limit, features=features, fill=fill)]
+
+    def recommend(self, dataset, limit=5) -> List[DataSet]:
+        return self.repository.get_by_ids(self.recommend_ids(dataset, limit=limit))
+
+
+dataset_recommendation_index = DataSetRecommendationIndex()
+
+
+class DSNeighborService(BaseService):
+    NEIGHBORS_PER_DATASET = 10
+
+    def __init__(self, index=None):
+        super().__init__(DSNeighborRepository())
+        self.index = index or dataset_recommendation_index
+
+    def get_neighbors(self, dataset, limit=5) -> List[DataSet]:
+        """
+        Reads the neighbors stored for ``dataset`` with one indexed query. They are written when the
+        dataset is created or published, already completed with the most downloaded datasets, so this
+        never computes nor writes anything.
+        """
+        return self.repository.get_neighbors(dataset.id, limit)
+
+    def refresh(self, dataset):
+        """
+        Recomputes the neighbors of ``dataset``. Once it is published, also inserts it into the stored
+        lists it now beats an entry of, without recomputing those lists.
+        """
+        limit = self.NEIGHBORS_PER_DATASET
+        features = None if self.index.is_published(dataset.id) else self.index.features_of(dataset)
+        updates = {dataset.id: self.index.top(dataset.id, limit=limit, features=features)}
+
+        if features is None:
+            scores = self.index.scores(dataset.id)
+            thresholds = self.repository.get_thresholds(scores)
+            # the score 0 fillers never count, or every dataset sharing the publication type would qualify
+            candidates = []
+            for candidate_id, score in scores.items():
+                count, min_score = thresholds.get(candidate_id, (0, 0))
+                if count < limit or score >= min_score:
+                    candidates.append(candidate_id)
+            for candidate_id, stored in self.repository.get_lists(candidates).items():
+                ranked = self.index.insert(stored, dataset.id, scores[candidate_id], limit)
+                if ranked is not None:
+                    updates[candidate_id] = ranked
+
+        self.repository.replace(updates)
+
+    def rebuild(self) -> int:
+        self.index.build()
+        limit = self.NEIGHBORS_PER_DATASET
+        try:
+            self.repository.clear()
+            self.repository.replace(
+                {i: self.index.top(i, limit=limit) for i in self.index.published_ids()},
+                commit=False,
+            )
+            self.repository.session.commit()
+        except Exception:
+            self.repository.session.rollback()
+            raise
+        return len(self.index.published_ids())
+
+
 class DataSetComparisonService:
     def compare(self, old_ds, new_ds):
         """
@@ -380,13 +1139,12 @@ class DataSetComparisonService:
         f_old = Hubfile.query.get(file_id_old)
         f_new = Hubfile.query.get(file_id_new)
 
-        path_old = f_old.get_path()
-        path_new = f_new.get_path()
+        keys = HubfileService().get_storage_keys([f_old, f_new])
 
         try:
-            with open(path_old, "r", encoding="utf-8", errors="ignore") as f:
+            with io.TextIOWrapper(file_storage.open(keys[f_old.id]), encoding="utf-8", errors="ignore") as f:
                 lines_old = f.readlines()
-            with open(path_new, "r", encoding="utf-8", errors="ignore") as f:
+            with io.TextIOWrapper(file_storage.open(keys[f_new.id]), encoding="utf-8", errors="ignore") as f:
                 lines_new = f.readlines()
 
             diff = difflib.HtmlDiff(wrapcolumn=90).make_table(
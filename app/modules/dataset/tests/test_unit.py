@@ -1,23 +1,92 @@
+import hashlib
 import io
 import os
 import shutil
 import tempfile
+import threading
 from datetime import datetime, timedelta, timezone
 from unittest.mock import MagicMock, patch
+from zipfile import ZipFile
 
 import pytest
 from flask import Flask
 from flask_login import LoginManager
+from sqlalchemy import event
+from sqlalchemy.dialects import mysql
+from sqlalchemy.schema import CreateTable
 
+from app import db
 from app.modules.badge.routes import badge_bp, make_segment
 from app.modules.dataset import dataset_bp
-from app.modules.dataset.models import Author, DataSet, DSMetaData, PublicationType
-from app.modules.dataset.repositories import DSDownloadRecordRepository
-from app.modules.dataset.services import DataSetService, DSDownloadRecordService
+from app.modules.dataset import services as services_module
+from app.modules.dataset.models import (
+    Author,
+    BaseDataSet,
+    DataSet,
+    DSCounter,
+    DSDownloadBucket,
+    DSDownloadRecord,
+    DSMetaData,
+    DSViewRecord,
+    Person,
+    PublicationType,
+    Tag,
+    ds_meta_data_tag,
+    insert_missing,
+    parse_tags,
+    tag_labels,
+)
+from app.modules.dataset.repositories import (
+    LEADERBOARD_PERIODS,
+    DataSetRepository,
+    DSCounterRepository,
+    DSDownloadBucketRepository,
+    DSDownloadRecordRepository,
+)
+from app.modules.dataset.services import (
+    ChunkedUploadError,
+    ChunkedUploadService,
+    DataSetArchiveCache,
+    DataSetArchiveService,
+    DataSetRecommendationIndex,
+    DataSetSerializer,
+    DataSetService,
+    DSDownloadRecordService,
+    DSNeighborService,
+    PersonService,
+    calculate_checksums,
+    read_upload_meta,
+    save_upload,
+    upload_checksums,
+)
+from app.modules.explore.models import DatasetSearchDocument
+from app.modules.filemodel.models import FileModel, FMMetaData, fm_meta_data_tag
+from app.modules.hubfile.models import Blob, Hubfile
+from core.buffers.write_behind_buffer import WriteBehindBuffer
+from core.storage.file_storage import LocalStorage
 
 FIXED_TIME = datetime(2025, 12, 1, 15, 0, 0, tzinfo=timezone.utc)
 
 
+def create_dataset_tables(*models):
+    """Creates the tables a dataset and its search document are written to, plus ``models``."""
+    for model in (DSMetaData, Person, Author, Tag, BaseDataSet, DataSet, DSCounter, FMMetaData, FileModel) + models:
+        model.__table__.create(db.engine)
+    for table in (ds_meta_data_tag, fm_meta_data_tag, DatasetSearchDocument.__table__):
+        table.create(db.engine)
+
+
+@pytest.fixture
+def sqlite_app():
+    app = Flask(__name__)
+    app.config["SQLALCHEMY_DATABASE_URI"] = "sqlite://"
+    db.init_app(app)
+
+    with app.app_context():
+        yield app
+        db.session.remove()
+
+
 @pytest.fixture(autouse=True)
 def app_context(app):
     with app.app_context():
@@ -182,8 +251,16 @@ def test_get_dataset_leaderboard_with_month_period(dataset_service, mock_dsdownl
     assert len(leaderboard_data) == 3
 
 
+def test_get_dataset_leaderboard_with_day_and_all_time_periods(dataset_service, mock_dsdownloadrecord_repository):
+    for period in ("day", "all"):
+        mock_dsdownloadrecord_repository.top_3_dowloaded_datasets_per_week.reset_mock()
+        leaderboard_data = dataset_service.get_dataset_leaderboard(period=period)
+        mock_dsdownloadrecord_repository.top_3_dowloaded_datasets_per_week.assert_called_once_with(period=period)
+        assert len(leaderboard_data) == 3
+
+
 def test_get_dataset_leaderboard_invalid_period(dataset_service):
-    with pytest.raises(ValueError, match="Periodo no soportado: usa 'week' o 'month'"):
+    with pytest.raises(ValueError, match="Periodo no soportado: usa 'day', 'week', 'month' o 'all'"):
         dataset_service.get_dataset_leaderboard(period="invalid_period")
 
 
@@ -424,13 +501,166 @@ def test_upload_valid(mock_current_user):
         assert j["filename"] == "test.pix"
         assert "uploaded" in j["message"].lower()
 
-        # ensure file was saved
+        # ensure file was saved, with its checksums in the sidecar
         saved_path = os.path.join(tmp, "test.pix")
         assert os.path.exists(saved_path)
+        assert read_upload_meta(saved_path) == {
+            "md5": hashlib.md5(b"dummy content").hexdigest(),
+            "sha256": hashlib.sha256(b"dummy content").hexdigest(),
+            "size": 13,
+        }
     finally:
         shutil.rmtree(tmp, ignore_errors=True)
 
 
+def test_upload_checksums_reuse_the_sidecar(tmp_path, monkeypatch):
+    file_path = str(tmp_path / "model.pix")
+    checksums = save_upload(io.BytesIO(b"x" * 3000), file_path)
+    assert checksums == calculate_checksums(file_path)
+
+    def read_again(path):
+        raise AssertionError("the upload was read again")
+
+    monkeypatch.setattr("app.modules.dataset.services.calculate_checksums", read_again)
+    assert upload_checksums(file_path) == checksums
+
+
+def test_upload_sidecar_is_ignored_when_the_file_changed(tmp_path):
+    file_path = str(tmp_path / "model.pix")
+    save_upload(io.BytesIO(b"first"), file_path)
+    with open(file_path, "wb") as fh:
+        fh.write(b"second version")
+
+    assert read_upload_meta(file_path) is None
+    assert upload_checksums(file_path)["sha256"] == hashlib.sha256(b"second version").hexdigest()
+
+
+def test_chunked_upload_resumes_from_the_last_offset(tmp_path):
+    content = b"0123456789" * 10
+    service = ChunkedUploadService(str(tmp_path))
+    upload = service.create("model.pix", len(content))
+    upload_id = upload["upload_id"]
+    assert upload["offset"] == 0
+
+    service.append(upload_id, 0, io.BytesIO(content[:40]), 40)
+    # a dropped connection delivers only part of the chunk, which is discarded
+    with pytest.raises(ChunkedUploadError, match="Incomplete"):
+        service.append(upload_id, 40, io.BytesIO(content[40:50]), 60)
+    assert service.status(upload_id)["offset"] == 40
+
+    with pytest.raises(ChunkedUploadError) as error:
+        service.append(upload_id, 0, io.BytesIO(content[:40]), 40)
+    assert error.value.status == 409
+
+    with pytest.raises(ChunkedUploadError, match="checksum"):
+        service.append(upload_id, 40, io.BytesIO(content[40:]), 60, sha256="0" * 64)
+    with pytest.raises(ChunkedUploadError) as error:
+        service.finalize(upload_id)
+    assert error.value.status == 409
+
+    chunk_sha256 = hashlib.sha256(content[40:]).hexdigest()
+    assert service.append(upload_id, 40, io.BytesIO(content[40:]), 60, sha256=chunk_sha256)["offset"] == 100
+
+    finalized = service.finalize(upload_id, sha256=hashlib.sha256(content).hexdigest())
+    file_path = os.path.join(str(tmp_path), "model.pix")
+    assert finalized["filename"] == "model.pix"
+    assert open(file_path, "rb").read() == content
+    assert read_upload_meta(file_path)["md5"] == hashlib.md5(content).hexdigest()
+    with pytest.raises(ChunkedUploadError) as error:
+        service.status(upload_id)
+    assert error.value.status == 404
+
+
+def test_chunked_upload_writes_one_request_at_a_time(tmp_path):
+    service = ChunkedUploadService(str(tmp_path))
+    upload_id = service.create("model.pix", 20)["upload_id"]
+
+    class RetriedChunk(io.BytesIO):
+        # the client retries the chunk while the first request is still writing it
+        def read(self, size=-1):
+            with pytest.raises(ChunkedUploadError) as error:
+                service.append(upload_id, 0, io.BytesIO(b"y" * 10), 10)
+            assert error.value.status == 409
+            return super().read(size)
+
+    assert service.append(upload_id, 0, RetriedChunk(b"x" * 10), 10)["offset"] == 10
+    assert service.append(upload_id, 10, io.BytesIO(b"z" * 10), 10)["offset"] == 20
+    assert open(os.path.join(service.directory, f"{upload_id}.part"), "rb").read() == b"x" * 10 + b"z" * 10
+
+
+def test_abandoned_chunked_uploads_expire(tmp_path):
+    service = ChunkedUploadService(str(tmp_path))
+    old = service.create("old.pix", 10)["upload_id"]
+    recent = service.create("recent.pix", 10)["upload_id"]
+    for path in service._paths(old):
+        os.utime(path, (0, 0))
+
+    assert service.expire() == 1
+    with pytest.raises(ChunkedUploadError):
+        service.status(old)
+    assert service.status(recent)["offset"] == 0
+    assert service.expire(max_age=timedelta(0)) == 1
+    assert os.listdir(service.directory) == []
+
+
+def test_chunked_upload_rejects_invalid_requests(tmp_path):
+    service = ChunkedUploadService(str(tmp_path))
+    with pytest.raises(ChunkedUploadError, match="No valid file"):
+        service.create("model.txt", 10)
+    with pytest.raises(ChunkedUploadError) as error:
+        service.create("model.pix", ChunkedUploadService.MAX_UPLOAD_SIZE + 1)
+    assert error.value.status == 413
+
+    upload_id = service.create("../model.pix", 5)["upload_id"]
+    with pytest.raises(ChunkedUploadError) as error:
+        service.append(upload_id, 0, io.BytesIO(b"123456"), 6)
+    assert error.value.status == 413
+    with pytest.raises(ChunkedUploadError) as error:
+        service.status("../../etc")
+    assert error.value.status == 404
+    assert service.status(upload_id)["filename"] == "model.pix"
+
+
+@patch("app.modules.dataset.routes.current_user")
+def test_chunked_upload_routes(mock_current_user, tmp_path):
+    mock_current_user.temp_folder = lambda: str(tmp_path)
+    mock_current_user.is_authenticated = True
+
+    app = Flask(__name__)
+    app.secret_key = "test-secret"
+    app.register_blueprint(dataset_bp)
+    lm = LoginManager()
+    lm.init_app(app)
+
+    @lm.user_loader
+    def _load_user(user_id):
+        u = MagicMock()
+        u.is_authenticated = True
+        u.id = int(user_id)
+        return u
+
+    client = app.test_client()
+    with client.session_transaction() as sess:
+        sess["_user_id"] = "1"
+
+    resp = client.post("/dataset/file/upload/chunked", json={"filename": "big.pix", "size": 6})
+    assert resp.status_code == 201
+    location = resp.headers["Location"]
+
+    resp = client.patch(location, data=b"abc", headers={"Upload-Offset": "0"})
+    assert resp.headers["Upload-Offset"] == "3"
+    resp = client.patch(location, data=b"def", headers={"Upload-Offset": "0"})
+    assert resp.status_code == 409
+    checksum = f"sha256 {hashlib.sha256(b'def').hexdigest()}"
+    resp = client.patch(location, data=b"def", headers={"Upload-Offset": "3", "Upload-Checksum": checksum})
+    assert client.get(location).get_json()["offset"] == 6
+
+    resp = client.post(f"{location}/finalize", json={})
+    assert resp.status_code == 200
+    assert resp.get_json()["filename"] == "big.pix"
+    assert (tmp_path / "big.pix").read_bytes() == b"abcdef"
+
+
 @patch("app.modules.dataset.routes.current_user")
 def test_upload_invalid_extension(mock_current_user):
     tmp = tempfile.mkdtemp()
@@ -494,6 +724,12 @@ def test_download_dataset(mock_dataset_service, mock_dsdownload_service, mock_cu
         ds = MagicMock()
         ds.id = dataset_id
         ds.user_id = user_id
+        hubfile = MagicMock()
+        hubfile.id = 1
+        hubfile.name = "sample.txt"
+        hubfile.storage_path = f"user_{user_id}/dataset_{dataset_id}/sample.txt"
+        hubfile.checksum = "5eb63bbbe01eeed093cb22bb8f5acdc3"
+        ds.files.return_value = [hubfile]
         mock_dataset_service.get_or_404.return_value = ds
 
         # mock DSDownloadRecordService().create to track calls
@@ -525,155 +761,641 @@ def test_download_dataset(mock_dataset_service, mock_dsdownload_service, mock_cu
         app.config["TESTING"] = True
         client = app.test_client()
 
-        resp = client.get(f"/dataset/download/{dataset_id}")
+        cache_dir = os.path.join(base_dir, "uploads", "cache")
+        with patch.dict(os.environ, {"ARCHIVE_CACHE_DIR": cache_dir}):
+            resp = client.get(f"/dataset/download/{dataset_id}")
+            archive = resp.data
+            resp_cached = client.get(f"/dataset/download/{dataset_id}")
+
         # should return the zip file for download
         assert resp.status_code == 200
         # response should be an attachment with zip mimetype
         assert resp.mimetype == "application/zip"
+        assert resp.headers["Content-Disposition"] == f'attachment; filename="dataset_{dataset_id}.zip"'
+
+        # the streamed archive is built from the Hubfile rows of the dataset
+        with ZipFile(io.BytesIO(archive)) as zipf:
+            assert zipf.namelist() == [f"dataset_{dataset_id}/sample.txt"]
+            assert zipf.read(f"dataset_{dataset_id}/sample.txt") == b"hello world"
+
+        # the second download is served from the archive cache
+        assert len(os.listdir(cache_dir)) == 1
+        assert resp_cached.status_code == 200
+        assert resp_cached.mimetype == "application/zip"
+        assert resp_cached.data == archive
 
-        # ensure download record was created
-        mock_service_instance.create.assert_called()
+        # ensure download record was queued
+        mock_service_instance.enqueue.assert_called()
     finally:
         # cleanup uploads
         shutil.rmtree(os.path.join(base_dir, "uploads"), ignore_errors=True)
 
 
+def mock_author(id, name, orcid=None):
+    # "name" is reserved by the MagicMock constructor
+    author = MagicMock(spec=Author, id=id, orcid=orcid)
+    author.name = name
+    return author
+
+
+def tags_of(*names):
+    return [Tag(name=name) for name in names]
+
+
 @pytest.fixture
 def mock_dataset_with_data():
-    mock_author_1 = MagicMock(spec=Author, id=1, name="A1")
-    mock_author_2 = MagicMock(spec=Author, id=2, name="A2")
     mock_meta = MagicMock(
         spec=DSMetaData,
-        authors=[mock_author_1, mock_author_2],
-        tags="spl,mobile,app",
+        authors=[mock_author(1, "A1", "0000-0001"), mock_author(2, "Doe,  Jane")],
+        tag_list=tags_of("spl", "mobile", "app"),
         publication_type=PublicationType.JOURNAL_ARTICLE,
     )
     target_ds = MagicMock(spec=DataSet, id=10)
     target_ds.ds_meta_data = mock_meta
-    target_ds.get_authors_set.return_value = target_ds.ds_meta_data.authors
-    target_ds.get_tags_set.return_value = set(target_ds.ds_meta_data.tags.split(","))
-    target_ds.get_publication_type.return_value = target_ds.ds_meta_data.publication_type
-    target_ds.get_download_count.return_value = 0
     return target_ds
 
 
 @pytest.fixture
-def mock_all_datasets_query():
-    ds1_meta = MagicMock(
-        spec=DSMetaData,
-        authors=[MagicMock(spec=Author, id=1, name="A1")],
-        tags="spl,mobile,app,android",
-        publication_type=PublicationType.JOURNAL_ARTICLE,
+def recommendation_index():
+    repository = MagicMock()
+    repository.get_published_features.return_value = (
+        [
+            (10, datetime(2023, 1, 1), PublicationType.JOURNAL_ARTICLE, 0),
+            # shares an author (by orcid), two tags and the publication type
+            (11, datetime(2023, 1, 1), PublicationType.JOURNAL_ARTICLE, 5),
+            # shares nothing but is the most downloaded
+            (12, datetime(2024, 1, 1), PublicationType.BOOK, 1000),
+            # shares an author (by normalized name) and a tag
+            (13, datetime(2023, 6, 1), PublicationType.CONFERENCE_PAPER, 350),
+            # shares a tag, ties with 15 on score and downloads but is older
+            (14, datetime(2022, 1, 1), PublicationType.BOOK, 10),
+            (15, datetime(2023, 1, 1), PublicationType.BOOK, 10),
+        ],
+        [
+            (10, "A1", "0000-0001"),
+            (10, "Doe,  Jane", None),
+            (11, "Someone Else", "0000-0001"),
+            (12, "A3", None),
+            (13, "doe, jane", None),
+        ],
+        [
+            (10, "spl"),
+            (10, "mobile"),
+            (10, "app"),
+            (11, "spl"),
+            (11, "mobile"),
+            (11, "android"),
+            (12, "game"),
+            (12, "puzzle"),
+            (13, "spl"),
+            (13, "analysis"),
+            (14, "app"),
+            (15, "app"),
+        ],
     )
-    ds1 = MagicMock(spec=DataSet, id=11, created_at=datetime(2023, 1, 1))
-    ds1.ds_meta_data = ds1_meta
-    ds1.get_authors_set.return_value = ds1.ds_meta_data.authors
-    ds1.get_tags_set.return_value = set(ds1.ds_meta_data.tags.split(","))
-    ds1.get_publication_type.return_value = ds1.ds_meta_data.publication_type
-    ds1.get_download_count.return_value = 5
-
-    ds2_meta = MagicMock(
-        spec=DSMetaData,
-        authors=[MagicMock(spec=Author, id=3, name="A3")],
-        tags="game,puzzle",
-        publication_type=PublicationType.BOOK,
+    repository.get_by_ids.side_effect = lambda ids: [MagicMock(spec=DataSet, id=i) for i in ids]
+    return DataSetRecommendationIndex(repository=repository)
+
+
+def test_recommendations_prioritize_high_score_and_downloads(recommendation_index, mock_dataset_with_data):
+    recommendations = recommendation_index.recommend(mock_dataset_with_data, limit=4)
+
+    assert [ds.id for ds in recommendations] == [11, 13, 15, 14]
+    recommendation_index.repository.get_by_ids.assert_called_once_with([11, 13, 15, 14])
+
+
+def test_recommendations_completed_with_most_downloaded_if_no_match(recommendation_index):
+    unrelated = MagicMock(spec=DataSet, id=99)
+    unrelated.ds_meta_data = MagicMock(
+        spec=DSMetaData, authors=[], tag_list=tags_of("chess"), publication_type=PublicationType.PATENT
     )
-    ds2 = MagicMock(spec=DataSet, id=12, created_at=datetime.now(timezone.utc) - timedelta(days=1))
-    ds2.ds_meta_data = ds2_meta
-    ds2.get_authors_set.return_value = ds2.ds_meta_data.authors
-    ds2.get_tags_set.return_value = set(ds2.ds_meta_data.tags.split(","))
-    ds2.get_publication_type.return_value = ds2.ds_meta_data.publication_type
-    ds2.get_download_count.return_value = 1000
-
-    ds3_meta = MagicMock(
-        spec=DSMetaData,
-        authors=[MagicMock(spec=Author, id=2, name="A2")],
-        tags="spl,analysis",
-        publication_type=PublicationType.CONFERENCE_PAPER,
+
+    assert recommendation_index.recommend_ids(unrelated, limit=3) == [12, 13, 15]
+
+
+def test_recommendations_respects_limit(recommendation_index, mock_dataset_with_data):
+    assert recommendation_index.recommend_ids(mock_dataset_with_data, limit=2) == [11, 13]
+    assert len(recommendation_index.recommend_ids(mock_dataset_with_data, limit=50)) == 5
+
+
+def test_recommendations_excludes_target_dataset(recommendation_index, mock_dataset_with_data):
+    assert 10 not in recommendation_index.recommend_ids(mock_dataset_with_data, limit=10)
+
+
+def test_recommendation_index_is_rebuilt_after_invalidation(recommendation_index, mock_dataset_with_data):
+    recommendation_index.recommend_ids(mock_dataset_with_data)
+    recommendation_index.recommend_ids(mock_dataset_with_data)
+    assert recommendation_index.repository.get_published_features.call_count == 1
+
+    recommendation_index.invalidate()
+    recommendation_index.recommend_ids(mock_dataset_with_data)
+    assert recommendation_index.repository.get_published_features.call_count == 2
+
+
+def test_get_dataset_recommendations_reads_neighbors(dataset_service, mock_dataset_with_data):
+    with patch("app.modules.dataset.services.DSNeighborService") as mock_neighbor_service:
+        mock_neighbor_service.return_value.get_neighbors.return_value = ["ds"]
+        assert dataset_service.get_dataset_recommendations(mock_dataset_with_data, limit=3) == ["ds"]
+        mock_neighbor_service.return_value.get_neighbors.assert_called_once_with(mock_dataset_with_data, limit=3)
+
+
+def test_neighbors_refresh_only_lists_the_dataset_can_enter(recommendation_index, mock_dataset_with_data):
+    service = DSNeighborService(index=recommendation_index)
+    service.repository = MagicMock()
+    service.NEIGHBORS_PER_DATASET = 2
+    # 11 and 13 already hold two better neighbors, 14 has room left and 15 has a worse one
+    service.repository.get_thresholds.return_value = {11: (2, 30), 13: (2, 20), 14: (1, 9), 15: (2, 1)}
+    stored = {14: [(15, 9), (12, 0)], 15: [(14, 9), (11, 1)]}
+    service.repository.get_lists.side_effect = lambda ids: {i: stored[i] for i in ids}
+
+    service.refresh(mock_dataset_with_data)
+
+    assert sorted(service.repository.get_lists.call_args.args[0]) == [14, 15]
+    updates = service.repository.replace.call_args.args[0]
+    assert set(updates) == {10, 14, 15}
+    assert updates[10] == [(11, 22), (13, 13)]
+    # inserted in place of the most downloaded filler and of the lowest match, the rest is kept
+    assert updates[14] == [(15, 9), (10, 3)]
+    assert updates[15] == [(14, 9), (10, 3)]
+
+
+def test_neighbors_refresh_leaves_lists_the_dataset_does_not_enter(recommendation_index, mock_dataset_with_data):
+    service = DSNeighborService(index=recommendation_index)
+    service.repository = MagicMock()
+    service.NEIGHBORS_PER_DATASET = 2
+    service.repository.get_thresholds.return_value = {11: (2, 30), 13: (2, 20), 14: (2, 3), 15: (2, 3)}
+    # 10 ties with the lowest entries on score but has fewer downloads
+    stored = {14: [(15, 9), (13, 3)], 15: [(14, 9), (13, 3)]}
+    service.repository.get_lists.side_effect = lambda ids: {i: stored[i] for i in ids}
+
+    service.refresh(mock_dataset_with_data)
+
+    assert service.repository.replace.call_args.args[0] == {10: [(11, 22), (13, 13)]}
+
+
+def test_neighbors_of_unpublished_dataset_are_not_propagated(recommendation_index):
+    service = DSNeighborService(index=recommendation_index)
+    service.repository = MagicMock()
+    draft = MagicMock(spec=DataSet, id=20)
+    draft.ds_meta_data = MagicMock(
+        spec=DSMetaData, authors=[], tag_list=tags_of("puzzle"), publication_type=PublicationType.BOOK
+    )
+
+    service.refresh(draft)
+
+    service.repository.get_thresholds.assert_not_called()
+    # completed with the most downloaded datasets, so reading them never has to fall back to the index
+    assert service.repository.replace.call_args.args[0] == {20: [(12, 9), (15, 6), (14, 6), (13, 0), (11, 0), (10, 0)]}
+
+
+def test_get_neighbors_only_reads_the_stored_neighbors(recommendation_index, mock_dataset_with_data):
+    service = DSNeighborService(index=recommendation_index)
+    service.repository = MagicMock()
+    service.repository.get_neighbors.return_value = []
+
+    assert service.get_neighbors(mock_dataset_with_data, limit=3) == []
+
+    service.repository.get_neighbors.assert_called_once_with(10, 3)
+    service.repository.replace.assert_not_called()
+    recommendation_index.repository.get_published_features.assert_not_called()
+
+
+def test_stream_archive_is_zip64_and_chunked():
+    tmp = tempfile.mkdtemp()
+    try:
+        path = os.path.join(tmp, "big.pix")
+        payload = os.urandom(3 * DataSetArchiveService.CHUNK_SIZE + 17)
+        with open(path, "wb") as fh:
+            fh.write(payload)
+
+        service = DataSetArchiveService(storage=LocalStorage(tmp))
+        chunks = list(service.stream_archive([("big.pix", "dataset_1/big.pix")]))
+
+        assert len(chunks) > 3
+        with ZipFile(io.BytesIO(b"".join(chunks))) as zipf:
+            assert zipf.read("dataset_1/big.pix") == payload
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+def test_archive_cache_key_changes_with_files():
+    hubfile = MagicMock(checksum="aaa")
+    hubfile.name = "a.pix"
+    ds = MagicMock(id=1)
+    ds.files.return_value = [hubfile]
+    cache = DataSetArchiveCache(directory="unused")
+
+    key = cache.get_key(ds)
+    assert key == cache.get_key(ds)
+
+    hubfile.checksum = "bbb"
+    assert key != cache.get_key(ds)
+
+
+def test_archive_cache_evicts_least_recently_used():
+    tmp = tempfile.mkdtemp()
+    try:
+        cache = DataSetArchiveCache(directory=tmp, max_bytes=10)
+        assert b"".join(cache.stream_and_store("old", iter([b"123456"]))) == b"123456"
+        os.utime(cache.get_path("old"), (0, 0))
+        list(cache.stream_and_store("new", iter([b"abcdef"])))
+
+        assert cache.get("old") is None
+        assert cache.get("new") == cache.get_path("new")
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+def test_write_behind_buffer_batches_and_deduplicates_records(sqlite_app):
+    DSViewRecord.__table__.create(db.engine)
+    buffer = WriteBehindBuffer(sqlite_app, flush_interval=60)
+    flushed = []
+    buffer.on_flush(DSViewRecord, lambda connection, rows: flushed.append(len(rows)))
+
+    def add_view(cookie):
+        buffer.add(
+            DSViewRecord,
+            dedup_on=("user_id", "dataset_id", "view_cookie"),
+            user_id=None,
+            dataset_id=1,
+            view_date=FIXED_TIME,
+            view_cookie=cookie,
+        )
+
+    add_view("cookie-1")
+    add_view("cookie-1")
+    add_view("cookie-2")
+    assert buffer.pending() == 3
+    assert db.session.query(DSViewRecord).count() == 0
+
+    buffer.flush()
+    assert buffer.pending() == 0
+    assert flushed == [2]
+
+    # a record already written is not inserted again
+    add_view("cookie-2")
+    buffer.flush()
+    assert db.session.query(DSViewRecord).count() == 2
+    assert flushed == [2]
+
+
+def test_write_behind_buffer_retries_failed_batches(sqlite_app):
+    DSViewRecord.__table__.create(db.engine)
+    buffer = WriteBehindBuffer(sqlite_app, max_size=2, flush_interval=60)
+    failures = [RuntimeError("database unavailable")] * 2
+
+    def failing_listener(connection, rows):
+        if failures:
+            raise failures.pop()
+
+    buffer.on_flush(DSViewRecord, failing_listener)
+    for cookie in ("cookie-1", "cookie-2", "cookie-3"):
+        buffer.add(DSViewRecord, user_id=None, dataset_id=1, view_date=FIXED_TIME, view_cookie=cookie)
+
+    buffer.flush()
+    # the batch is put back, bounded by max_size
+    assert buffer.pending() == 2
+    assert db.session.query(DSViewRecord).count() == 0
+
+    buffer.flush()
+    buffer.flush()
+    assert buffer.pending() == 0
+    assert sorted(record.view_cookie for record in DSViewRecord.query) == ["cookie-2", "cookie-3"]
+
+    failures.extend([RuntimeError("database unavailable")] * WriteBehindBuffer.MAX_ATTEMPTS)
+    buffer.add(DSViewRecord, user_id=None, dataset_id=1, view_date=FIXED_TIME, view_cookie="cookie-4")
+    for _ in range(WriteBehindBuffer.MAX_ATTEMPTS):
+        buffer.flush()
+    assert buffer.pending() == 0
+    assert db.session.query(DSViewRecord).count() == 2
+
+
+def test_counters_follow_flushed_records(sqlite_app):
+    for model in (DSDownloadRecord, DSViewRecord, DSCounter):
+        model.__table__.create(db.engine)
+    buffer = WriteBehindBuffer(sqlite_app, flush_interval=60)
+    buffer.on_flush(DSDownloadRecord, DSCounterRepository.apply_download_records)
+    buffer.on_flush(DSViewRecord, DSCounterRepository.apply_view_records)
+
+    def add_download(dataset_id, cookie):
+        buffer.add(
+            DSDownloadRecord,
+            user_id=None,
+            dataset_id=dataset_id,
+            download_date=FIXED_TIME,
+            download_cookie=cookie,
+        )
+
+    add_download(1, "cookie-1")
+    add_download(1, "cookie-1")
+    add_download(2, "cookie-1")
+    buffer.add(DSViewRecord, user_id=None, dataset_id=1, view_date=FIXED_TIME, view_cookie="cookie-1")
+    buffer.flush()
+
+    add_download(1, "cookie-1")
+    add_download(1, "cookie-2")
+    buffer.flush()
+
+    counters = DSCounterRepository().get_counters([1, 2, 3])
+    assert set(counters) == {1, 2}
+    assert (counters[1].download_count, counters[1].unique_download_count, counters[1].view_count) == (4, 2, 1)
+    assert (counters[2].download_count, counters[2].unique_download_count, counters[2].view_count) == (1, 1, 0)
+
+    db.session.query(DSCounter).delete()
+    db.session.commit()
+    assert DSCounterRepository().rebuild() == 2
+    assert DSCounterRepository().get_download_counts([1, 2]) == {1: 4, 2: 1}
+
+
+def test_dataset_history_is_loaded_from_the_lineage_root(sqlite_app):
+    create_dataset_tables()
+
+    def new_version(title, parent=None):
+        dataset = DataSet(
+            user_id=1,
+            ds_meta_data=DSMetaData(title=title, description="", publication_type=PublicationType.NONE),
+            version=parent.version + 1 if parent else 1,
+            previous_version_id=parent.id if parent else None,
+        )
+        db.session.add(dataset)
+        db.session.commit()
+        return dataset
+
+    v1 = new_version("v1")
+    v2 = new_version("v2", v1)
+    v3 = new_version("v3", v2)
+    branch = new_version("v2 bis", v1)
+    other = new_version("other")
+
+    assert {v1.lineage_root_id, v2.lineage_root_id, v3.lineage_root_id, branch.lineage_root_id} == {v1.id}
+    assert other.lineage_root_id == other.id
+
+    history = DataSetRepository().get_lineage(v3.id)
+    assert [ds.id for ds in history] == [v1.id, v2.id, branch.id, v3.id]
+    assert [ds.ds_meta_data.title for ds in history] == ["v1", "v2", "v2 bis", "v3"]
+    assert DataSetRepository().get_lineage(other.id) == [other]
+
+
+def test_leaderboard_aggregates_hourly_download_buckets(sqlite_app):
+    create_dataset_tables(DSDownloadRecord, DSDownloadBucket)
+    for i in (1, 2, 3):
+        db.session.add(
+            DataSet(
+                id=i,
+                user_id=1,
+                ds_meta_data=DSMetaData(title=f"ds{i}", description="", publication_type=PublicationType.NONE),
+            )
+        )
+    db.session.commit()
+
+    buffer = WriteBehindBuffer(sqlite_app, flush_interval=60)
+    buffer.on_flush(DSDownloadRecord, DSCounterRepository.apply_download_records)
+    buffer.on_flush(DSDownloadRecord, DSDownloadBucketRepository.apply_download_records)
+
+    now = datetime.now(timezone.utc)
+    downloads = {1: [now - timedelta(days=20)] * 5, 2: [now - timedelta(days=3)] * 3, 3: [now] * 2}
+    for dataset_id, dates in downloads.items():
+        for date in dates:
+            buffer.add(DSDownloadRecord, user_id=None, dataset_id=dataset_id, download_date=date, download_cookie="c")
+    buffer.flush()
+
+    bucket = DSDownloadBucket.query.filter_by(dataset_id=3).one()
+    assert bucket.download_count == 2
+    assert bucket.bucket_start == DSDownloadBucketRepository.bucket_of(now)
+
+    repository = DSDownloadRecordRepository()
+    top = {
+        period: [ds.id for ds in repository.top_3_dowloaded_datasets_per_week(period)] for period in LEADERBOARD_PERIODS
+    }
+    assert top == {"day": [3], "week": [2, 3], "month": [1, 2, 3], "all": [1, 2, 3]}
+    assert [ds.id for ds in repository.top_3_dowloaded_datasets_per_week("month", limit=1)] == [1]
+
+    db.session.query(DSDownloadBucket).delete()
+    db.session.commit()
+    assert DSDownloadBucketRepository().rebuild() == 3
+
+
+def test_serializer_matches_to_dict_with_a_constant_number_of_queries(sqlite_app):
+    with sqlite_app.test_request_context("/explore"):
+        create_dataset_tables(Hubfile)
+
+        for i in range(1, 5):
+            meta = DSMetaData(
+                title=f"ds{i}",
+                description="",
+                tags="Retro,  pixel art ,retro",
+                publication_type=PublicationType.JOURNAL_ARTICLE,
+                dataset_doi=f"10.1234/dataset{i}" if i % 2 else None,
+                deposition_id=i,
+                authors=[Author(name=f"author{i}-{j}") for j in range(2)],
+            )
+            dataset = DataSet(id=i, user_id=1, ds_meta_data=meta, created_at=datetime(2025, 1, i))
+            db.session.add(dataset)
+            db.session.flush()
+            for j in range(i):
+                fm_meta = FMMetaData(
+                    filename=f"f{j}.pix", title="", description="", publication_type=PublicationType.NONE
+                )
+                file_model = FileModel(data_set_id=dataset.id, fm_meta_data=fm_meta)
+                file_model.files.append(Hubfile(name=f"f{j}.pix", checksum="x", size=1000 * (j + 1)))
+                db.session.add(file_model)
+        db.session.add(DSCounter(dataset_id=3, download_count=7))
+        db.session.commit()
+
+        expected = [ds.to_dict() for ds in DataSet.query.order_by(DataSet.id).all()]
+        db.session.expunge_all()
+
+        statements = []
+        event.listen(db.engine, "before_cursor_execute", lambda *args: statements.append(args[2]))
+        datasets = DataSet.query.order_by(DataSet.id).all()
+        serialized = DataSetSerializer().serialize(datasets)
+
+        assert serialized == expected
+        assert serialized[2]["download_count"] == 7
+        assert serialized[3]["files_count"] == 4
+        # shown as typed, while the tag rows hold the normalized names
+        assert serialized[0]["tags"] == ["Retro", "pixel art"]
+        assert datasets[0].ds_meta_data.get_tag_names() == ["pixel art", "retro"]
+        # the page itself, then datasets, metadata, authors, tags, counters, file models and files
+        assert len(statements) == 8
+
+
+def test_create_from_form_hashes_the_uploads_before_the_transaction(sqlite_app, tmp_path, monkeypatch):
+    monkeypatch.setattr(DataSetService, "refresh_neighbors", lambda self, dataset: None)
+
+    contents = {f"m{i}.pix": f"model {i % 3}".encode() for i in range(6)}
+    for name, content in contents.items():
+        (tmp_path / name).write_bytes(content)
+
+    file_models = []
+    for name in contents:
+        file_model = MagicMock()
+        file_model.filename.data = name
+        file_model.get_fmmetadata.return_value = {
+            "filename": name,
+            "title": name,
+            "description": "",
+            "publication_type": PublicationType.NONE,
+        }
+        file_model.get_authors.return_value = []
+        file_models.append(file_model)
+    form = MagicMock(file_models=file_models)
+    form.get_dsmetadata.return_value = {"title": "ds", "description": "", "publication_type": PublicationType.NONE}
+    form.get_authors.return_value = []
+    user = MagicMock(id=1, temp_folder=lambda: str(tmp_path))
+    user.profile.surname, user.profile.name, user.profile.affiliation, user.profile.orcid = "S", "N", "", ""
+
+    events = []
+    checksums = services_module.upload_checksums
+
+    def recorded_checksums(file_path):
+        events.append(("hash", threading.current_thread().name))
+        return checksums(file_path)
+
+    monkeypatch.setattr(services_module, "upload_checksums", recorded_checksums)
+
+    create_dataset_tables(Blob, Hubfile)
+    event.listen(db.engine, "before_cursor_execute", lambda *args: events.append(("sql", args[2])))
+
+    dataset = DataSetService().create_from_form(form, user)
+
+    first_statement = next(i for i, (kind, _) in enumerate(events) if kind == "sql")
+    hashes = [name for kind, name in events if kind == "hash"]
+    assert len(hashes) == 6 and events[:6] == [("hash", name) for name in hashes]
+    assert first_statement == 6
+    assert all(name.startswith("upload-checksums") for name in hashes)
+
+    files = sorted(dataset.files(), key=lambda file: file.name)
+    assert [file.checksum for file in files] == [hashlib.md5(contents[file.name]).hexdigest() for file in files]
+    # identical contents share a blob
+    assert Blob.query.count() == 3
+    assert sorted(blob.ref_count for blob in Blob.query) == [2, 2, 2]
+
+
+def test_parse_tags_normalizes_and_deduplicates():
+    assert parse_tags(" Pixel Art,retro,  pixel   art ,,RETRO") == ["pixel art", "retro"]
+    assert parse_tags(None) == []
+
+
+def test_tag_labels_keep_the_typed_case_and_order():
+    assert tag_labels(" Pixel Art,retro,  pixel   art ,,RETRO") == ["Pixel Art", "retro"]
+    assert tag_labels(None) == []
+
+
+def test_tags_string_is_synced_to_the_tag_table(sqlite_app):
+    create_dataset_tables()
+
+    first = DSMetaData(title="a", description="", tags="Tiles, dungeon", publication_type=PublicationType.NONE)
+    second = DSMetaData(title="b", description="", tags="tiles", publication_type=PublicationType.NONE)
+    fm_meta = FMMetaData(
+        filename="a.pix", title="", description="", tags="dungeon", publication_type=PublicationType.NONE
     )
-    ds3 = MagicMock(spec=DataSet, id=13, created_at=datetime.now(timezone.utc) - timedelta(days=30))
-    ds3.ds_meta_data = ds3_meta
-    ds3.get_authors_set.return_value = ds3.ds_meta_data.authors
-    ds3.get_tags_set.return_value = set(ds3.ds_meta_data.tags.split(","))
-    ds3.get_publication_type.return_value = ds3.ds_meta_data.publication_type
-    ds3.get_download_count.return_value = 350
-
-    return [ds1, ds2, ds3]
-
-
-@patch("app.modules.dataset.models.DataSet.calculate_similarity_score", autospec=True)
-@patch("app.modules.dataset.models.DataSet.query", new_callable=MagicMock)
-def test_recommendations_prioritize_high_score_and_downloads(
-    mock_dataset_query,
-    mock_similarity_score,
-    dataset_service,
-    mock_dataset_with_data,
-    mock_all_datasets_query,
-):
-    mock_dataset_query.filter.return_value = mock_dataset_query
-    mock_dataset_query.all.return_value = mock_all_datasets_query
-
-    ds1_base_score = 40
-    ds2_base_score = 10
-    ds3_base_score = 30
-
-    def side_effect(self, other_dataset):
-        if other_dataset.id == 11:
-            return ds1_base_score
-        if other_dataset.id == 12:
-            return ds2_base_score
-        if other_dataset.id == 13:
-            return ds3_base_score
-        return 0
-
-    mock_similarity_score.side_effect = side_effect
-    recommendations = dataset_service.get_dataset_recommendations(mock_dataset_with_data, limit=3)
-
-    assert len(recommendations) == 3
-    assert recommendations[0].id == 12
-    assert recommendations[1].id == 13
-    assert recommendations[2].id == 11
-
-
-@patch("app.modules.dataset.models.DataSet.calculate_similarity_score", autospec=True)
-@patch("app.modules.dataset.models.DataSet.query", new_callable=MagicMock)
-def test_recommendations_returns_random_3__if_no_match(
-    mock_dataset_query,
-    mock_similarity_score,
-    dataset_service,
-    mock_dataset_with_data,
-    mock_all_datasets_query,
-):
-    mock_dataset_query.filter.return_value = mock_dataset_query
-    mock_dataset_query.all.return_value = mock_all_datasets_query
-    mock_similarity_score.return_value = 0
-    recommendations = dataset_service.get_dataset_recommendations(mock_dataset_with_data, limit=3)
-    assert len(recommendations) == 3
-
-
-@patch("app.modules.dataset.models.DataSet.calculate_similarity_score", autospec=True)
-@patch("app.modules.dataset.models.DataSet.query", new_callable=MagicMock)
-def test_recommendations_respects_limit(
-    mock_dataset_query,
-    mock_similarity_score,
-    dataset_service,
-    mock_dataset_with_data,
-    mock_all_datasets_query,
-):
-    mock_dataset_query.filter.return_value = mock_dataset_query
-    mock_dataset_query.all.return_value = mock_all_datasets_query
-    mock_similarity_score.return_value = 10
-    recommendations = dataset_service.get_dataset_recommendations(mock_dataset_with_data, limit=2)
-    assert len(recommendations) == 2
-
-
-@patch("app.modules.dataset.models.DataSet.calculate_similarity_score", autospec=True)
-@patch("app.modules.dataset.models.DataSet.query", new_callable=MagicMock)
-def test_recommendations_excludes_target_dataset(
-    mock_dataset_query, mock_similarity_score, dataset_service, mock_dataset_with_data
-):
-    mock_dataset_query.filter.return_value = mock_dataset_query
-    mock_dataset_query.all.return_value = [mock_dataset_with_data]
-    mock_dataset_query.filter.return_value.all.return_value = []
-    recommendations = dataset_service.get_dataset_recommendations(mock_dataset_with_data, limit=5)
-    assert len(recommendations) == 0
+    db.session.add_all([first, second, fm_meta])
+    db.session.commit()
+
+    assert first.get_tag_names() == ["dungeon", "tiles"]
+    assert [tag.name for tag in fm_meta.tag_list] == ["dungeon"]
+    assert db.session.query(Tag).count() == 2
+
+    first.tags = "heroes"
+    db.session.commit()
+
+    assert first.get_tag_names() == ["heroes"]
+    assert second.get_tag_names() == ["tiles"]
+    assert db.session.query(ds_meta_data_tag).count() == 2
+
+
+def test_tags_differing_only_by_accents_are_distinct(sqlite_app):
+    # MariaDB's default collation would make these the same unique key
+    assert "COLLATE utf8mb4_bin" in str(CreateTable(Tag.__table__).compile(dialect=mysql.dialect()))
+
+    create_dataset_tables()
+    meta = DSMetaData(title="a", description="", tags="Café, cafe", publication_type=PublicationType.NONE)
+    db.session.add(meta)
+    db.session.commit()
+
+    assert meta.get_tag_names() == ["cafe", "café"]
+
+
+def test_tags_added_by_another_transaction_are_reused(sqlite_app):
+    create_dataset_tables()
+    meta = DSMetaData(title="a", description="", tags="retro", publication_type=PublicationType.NONE)
+    db.session.add(meta)
+    session = db.session()
+    real_scalars = session.scalars
+    calls = []
+
+    def scalars_missing_concurrent_insert(statement, *args, **kwargs):
+        # the first, snapshot read does not see the tag a concurrent request has just committed
+        calls.append(statement)
+        if len(calls) == 1:
+            session.execute(Tag.__table__.insert().values(name="retro"))
+            return real_scalars(statement.where(Tag.id.is_(None)), *args, **kwargs)
+        return real_scalars(statement, *args, **kwargs)
+
+    with patch.object(session, "scalars", side_effect=scalars_missing_concurrent_insert):
+        db.session.commit()
+
+    assert len(calls) == 2
+    assert meta.get_tag_names() == ["retro"]
+    assert db.session.query(Tag).count() == 1
+    insert_missing(db.session.connection(), Tag.__table__, "name", [{"name": "retro"}, {"name": "new"}])
+    assert db.session.query(Tag).count() == 2
+
+
+def test_people_added_by_another_transaction_are_reused(sqlite_app):
+    assert "COLLATE utf8mb4_bin" in str(CreateTable(Person.__table__).compile(dialect=mysql.dialect()))
+
+    create_dataset_tables()
+    authors = [Author(name="José García"), Author(name="Jose Garcia"), Author(name="Luis")]
+    db.session.add(DSMetaData(title="a", description="", publication_type=PublicationType.NONE, authors=authors))
+    session = db.session()
+    real_scalars = session.scalars
+    calls = []
+
+    def scalars_missing_concurrent_insert(statement, *args, **kwargs):
+        # the first, snapshot read does not see the person a concurrent request has just committed
+        calls.append(statement)
+        if len(calls) == 1:
+            session.execute(Person.__table__.insert().values(key="name:luis", name="Luis"))
+            return real_scalars(statement.where(Person.id.is_(None)), *args, **kwargs)
+        return real_scalars(statement, *args, **kwargs)
+
+    with patch.object(session, "scalars", side_effect=scalars_missing_concurrent_insert):
+        db.session.commit()
+
+    assert len(calls) == 2
+    assert sorted(person.key for person in Person.query) == ["name:jose garcia", "name:josé garcía", "name:luis"]
+    assert authors[0].person.name == "José García" and authors[2].person.key == "name:luis"
+
+
+def test_authors_are_linked_to_one_person_per_orcid_or_name(sqlite_app):
+    create_dataset_tables()
+
+    def create(id, authors, doi=True):
+        meta = DSMetaData(
+            title=f"ds{id}",
+            description="",
+            publication_type=PublicationType.NONE,
+            dataset_doi=f"10.1234/dataset{id}" if doi else None,
+            authors=[Author(name=name, orcid=orcid) for name, orcid in authors],
+        )
+        db.session.add(DataSet(id=id, user_id=1, ds_meta_data=meta, created_at=datetime(2025, 1, id)))
+
+    create(1, [("Ana Pérez", "0000-0001"), ("Luis", None)])
+    create(2, [("A. Pérez", "0000-0001"), ("luis ", None), ("Marta", None)])
+    create(3, [("Ana Pérez", "0000-0001")], doi=False)
+    db.session.add(FMMetaData(filename="a.pix", title="", description="", publication_type=PublicationType.NONE))
+    db.session.commit()
+
+    assert db.session.query(Person).count() == 3
+    ana = PersonService().get_by_author(Author(name="Ana", orcid="0000-0001"))
+    assert ana.name == "Ana Pérez" and len(ana.authors) == 3
+
+    assert [dataset.id for dataset in PersonService().get_datasets(ana.id)] == [2, 1]
+    coauthors = PersonService().get_coauthors(ana.id)
+    assert [(person.key, shared) for person, shared in coauthors] == [("name:luis", 2), ("name:marta", 1)]
+
+    datasets = DataSet.query.order_by(DataSet.id).all()
+    # two shared people and the publication type
+    assert datasets[0].calculate_similarity_score(datasets[1]) == 26
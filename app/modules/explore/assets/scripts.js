@@ -1,7 +1,32 @@
 document.addEventListener('DOMContentLoaded', () => {
     send_query();
+    document.getElementById('query').addEventListener('input', event => fetch_suggestions(event.target.value));
 });
 
+function fetch_suggestions(prefix) {
+    const datalist = document.getElementById('query_suggestions');
+    if (!prefix.trim()) {
+        datalist.innerHTML = '';
+        return;
+    }
+
+    fetch(`/explore/suggest?q=${encodeURIComponent(prefix)}&limit=8`)
+        .then(response => response.json())
+        .then(data => {
+            // Ignore answers to a prefix that has been typed over meanwhile
+            if (document.getElementById('query').value !== prefix) {
+                return;
+            }
+            datalist.innerHTML = '';
+            data.suggestions.forEach(suggestion => {
+                const option = document.createElement('option');
+                option.value = suggestion.text;
+                option.label = suggestion.type;
+                datalist.appendChild(option);
+            });
+        });
+}
+
 function send_query() {
 
     console.log("send query...")
@@ -14,142 +39,215 @@ function send_query() {
 
     filters.forEach(filter => {
         filter.addEventListener('input', () => {
-            const csrfToken = document.getElementById('csrf_token').value;
-
-            const searchCriteria = {
-                csrf_token: csrfToken,
-                query: document.querySelector('#query').value,
-                publication_type: document.querySelector('#publication_type').value,
-                sorting: document.querySelector('[name="sorting"]:checked').value,
-            };
-
-            console.log(document.querySelector('#publication_type').value);
-
-            fetch('/explore', {
-                method: 'POST',
-                headers: {
-                    'Content-Type': 'application/json',
-                },
-                body: JSON.stringify(searchCriteria),
-            })
-                .then(response => response.json())
-                .then(data => {
-
-                    console.log(data);
-                    document.getElementById('results').innerHTML = '';
-
-                    // results counter
-                    const resultCount = data.length;
-                    const resultText = resultCount === 1 ? 'dataset' : 'datasets';
-                    document.getElementById('results_number').textContent = `${resultCount} ${resultText} found`;
-
-                    if (resultCount === 0) {
-                        console.log("show not found icon");
-                        document.getElementById("results_not_found").style.display = "block";
-                    } else {
-                        document.getElementById("results_not_found").style.display = "none";
-                    }
-
-
-                    data.forEach(dataset => {
-                        let card = document.createElement('div');
-                        card.className = 'col-12';
-                        card.innerHTML = `
-                            <div class="card">
-                                <div class="card-body">
-                                    <div class="d-flex align-items-center justify-content-between">
-                                        <div class="d-flex align-items-center">
-                                            
-                                            <h3 class="m-0 me-5">
-                                                <a href="${dataset.url}">${dataset.title}</a>
-                                            </h3>
-
-                                            <span class="text-secondary small">
-                                                ${dataset.download_count}
-                                                <i data-feather="download" class="align-middle me-1"></i>
-                                            </span>
-
-                                        </div>
-                                        <div>
-                                            <span class="badge bg-primary" style="cursor: pointer;" onclick="set_publication_type_as_query('${dataset.publication_type}')">${dataset.publication_type}</span>
-                                        </div>
-                                    </div>
-                                    <p class="text-secondary">${formatDate(dataset.created_at)}</p>
-
-                                    <div class="row mb-2">
-
-                                        <div class="col-md-4 col-12">
-                                            <span class=" text-secondary">
-                                                Description
-                                            </span>
-                                        </div>
-                                        <div class="col-md-8 col-12">
-                                            <p class="card-text">${dataset.description}</p>
-                                        </div>
-
-                                    </div>
-
-                                    <div class="row mb-2">
-
-                                        <div class="col-md-4 col-12">
-                                            <span class=" text-secondary">
-                                                Authors
-                                            </span>
-                                        </div>
-                                        <div class="col-md-8 col-12">
-                                            ${dataset.authors.map(author => `
-                                                <p class="p-0 m-0">${author.name}${author.affiliation ? ` (${author.affiliation})` : ''}${author.orcid ? ` (${author.orcid})` : ''}</p>
-                                            `).join('')}
-                                        </div>
-
-                                    </div>
-
-                                    <div class="row mb-2">
-
-                                        <div class="col-md-4 col-12">
-                                            <span class=" text-secondary">
-                                                Tags
-                                            </span>
-                                        </div>
-                                        <div class="col-md-8 col-12">
-                                            ${dataset.tags.map(tag => `<span class="badge bg-primary me-1" style="cursor: pointer;" onclick="set_tag_as_query('${tag}')">${tag}</span>`).join('')}
-                                        </div>
-
-                                    </div>
-
-                                    <div class="row">
-
-                                        <div class="col-md-4 col-12">
-
-                                        </div>
-                                        <div class="col-md-8 col-12">
-                                            <a href="${dataset.url}" class="btn btn-outline-primary btn-sm" id="search" style="border-radius: 5px;">
-                                                View dataset
-                                            </a>
-                                            <a href="/dataset/download/${dataset.id}" class="btn btn-outline-primary btn-sm" id="search" style="border-radius: 5px;">
-                                                Download (${dataset.total_size_in_human_format})
-                                            </a>
-                                        </div>
-
-
-                                    </div>
-
-                                </div>
-                            </div>
-                        `;
-
-                        document.getElementById('results').appendChild(card);
-                    });
-
-                    // Fix load icons bug
-                    if (typeof feather !== 'undefined') {
-                        feather.replace();
-                    }
-                });
+            fetch_page(null);
         });
     });
 }
 
+// Criteria of the search being shown and cursor of its next page
+let currentCriteria = null;
+let nextCursor = null;
+
+function fetch_page(cursor) {
+    const csrfToken = document.getElementById('csrf_token').value;
+
+    if (cursor === null) {
+        currentCriteria = {
+            csrf_token: csrfToken,
+            query: document.querySelector('#query').value,
+            publication_type: document.querySelector('#publication_type').value,
+            sorting: document.querySelector('[name="sorting"]:checked').value,
+        };
+    }
+    const criteria = currentCriteria;
+
+    const searchCriteria = {
+        ...criteria,
+        cursor: cursor,
+        include_total: cursor === null,
+        include_facets: cursor === null,
+    };
+
+    fetch('/explore', {
+        method: 'POST',
+        headers: {
+            'Content-Type': 'application/json',
+        },
+        body: JSON.stringify(searchCriteria),
+    })
+        .then(response => response.json())
+        .then(data => {
+
+            // Ignore pages of a search that has been replaced meanwhile
+            if (criteria !== currentCriteria) {
+                return;
+            }
+
+            console.log(data);
+            if (cursor === null) {
+                document.getElementById('results').innerHTML = '';
+
+                // results counter
+                const resultCount = data.total;
+                const resultText = resultCount === 1 ? 'dataset' : 'datasets';
+                document.getElementById('results_number').textContent = `${resultCount} ${resultText} found`;
+
+                if (resultCount === 0) {
+                    console.log("show not found icon");
+                    document.getElementById("results_not_found").style.display = "block";
+                } else {
+                    document.getElementById("results_not_found").style.display = "none";
+                }
+
+                render_facets(data.facets);
+            }
+
+            const loadMore = document.getElementById('load_more');
+            if (loadMore) {
+                loadMore.remove();
+            }
+
+            data.datasets.forEach(dataset => {
+                document.getElementById('results').appendChild(render_dataset(dataset));
+            });
+
+            nextCursor = data.next_cursor;
+            if (nextCursor) {
+                let button = document.createElement('div');
+                button.className = 'col-12 text-center mb-3';
+                button.id = 'load_more';
+                button.innerHTML = `
+                    <button class="btn btn-outline-primary btn-sm" style="border-radius: 5px;">
+                        Load more
+                    </button>
+                `;
+                button.querySelector('button').addEventListener('click', () => fetch_page(nextCursor));
+                document.getElementById('results').appendChild(button);
+            }
+
+            // Fix load icons bug
+            if (typeof feather !== 'undefined') {
+                feather.replace();
+            }
+        });
+}
+
+function render_facets(facets) {
+    if (!facets) {
+        return;
+    }
+
+    // Show how many datasets each publication type would return
+    const options = document.querySelectorAll('#publication_type option');
+    options.forEach(option => {
+        if (!option.dataset.label) {
+            option.dataset.label = option.text;
+        }
+        if (option.value === 'any') {
+            return;
+        }
+        const count = facets.publication_type[option.value] || 0;
+        option.text = `${option.dataset.label} (${count})`;
+    });
+
+    const tagFacets = document.getElementById('tag_facets');
+    tagFacets.innerHTML = Object.entries(facets.tags).map(([tag, count]) => `
+        <span class="badge bg-secondary me-1 mb-1" style="cursor: pointer;" onclick="set_tag_as_query('${tag}')">
+            ${tag} (${count})
+        </span>
+    `).join('');
+}
+
+function render_dataset(dataset) {
+    let card = document.createElement('div');
+    card.className = 'col-12';
+    card.innerHTML = `
+        <div class="card">
+            <div class="card-body">
+                <div class="d-flex align-items-center justify-content-between">
+                    <div class="d-flex align-items-center">
+                        
+                        <h3 class="m-0 me-5">
+                            <a href="${dataset.url}">${dataset.title}</a>
+                        </h3>
+
+                        <span class="text-secondary small">
+                            ${dataset.download_count}
+                            <i data-feather="download" class="align-middle me-1"></i>
+                        </span>
+
+                    </div>
+                    <div>
+                        <span class="badge bg-primary" style="cursor: pointer;" onclick="set_publication_type_as_query('${dataset.publication_type}')">${dataset.publication_type}</span>
+                    </div>
+                </div>
+                <p class="text-secondary">${formatDate(dataset.created_at)}</p>
+
+                <div class="row mb-2">
+
+                    <div class="col-md-4 col-12">
+                        <span class=" text-secondary">
+                            Description
+                        </span>
+                    </div>
+                    <div class="col-md-8 col-12">
+                        <p class="card-text">${dataset.description}</p>
+                    </div>
+
+                </div>
+
+                <div class="row mb-2">
+
+                    <div class="col-md-4 col-12">
+                        <span class=" text-secondary">
+                            Authors
+                        </span>
+                    </div>
+                    <div class="col-md-8 col-12">
+                        ${dataset.authors.map(author => `
+                            <p class="p-0 m-0">${author.name}${author.affiliation ? ` (${author.affiliation})` : ''}${author.orcid ? ` (${author.orcid})` : ''}</p>
+                        `).join('')}
+                    </div>
+
+                </div>
+
+                <div class="row mb-2">
+
+                    <div class="col-md-4 col-12">
+                        <span class=" text-secondary">
+                            Tags
+                        </span>
+                    </div>
+                    <div class="col-md-8 col-12">
+                        ${dataset.tags.map(tag => `<span class="badge bg-primary me-1" style="cursor: pointer;" onclick="set_tag_as_query('${tag}')">${tag}</span>`).join('')}
+                    </div>
+
+                </div>
+
+                <div class="row">
+
+                    <div class="col-md-4 col-12">
+
+                    </div>
+                    <div class="col-md-8 col-12">
+                        <a href="${dataset.url}" class="btn btn-outline-primary btn-sm" id="search" style="border-radius: 5px;">
+                            View dataset
+                        </a>
+                        <a href="/dataset/download/${dataset.id}" class="btn btn-outline-primary btn-sm" id="search" style="border-radius: 5px;">
+                            Download (${dataset.total_size_in_human_format})
+                        </a>
+                    </div>
+
+
+                </div>
+
+            </div>
+        </div>
+    `;
+
+    return card;
+}
+
 function formatDate(dateString) {
     const options = {day: 'numeric', month: 'long', year: 'numeric', hour: 'numeric', minute: 'numeric'};
     const date = new Date(dateString);
@@ -165,7 +263,8 @@ function set_tag_as_query(tagName) {
 function set_publication_type_as_query(publicationType) {
     const publicationTypeSelect = document.getElementById('publication_type');
     for (let i = 0; i < publicationTypeSelect.options.length; i++) {
-        if (publicationTypeSelect.options[i].text === publicationType.trim()) {
+        const label = publicationTypeSelect.options[i].dataset.label || publicationTypeSelect.options[i].text;
+        if (label === publicationType.trim()) {
             // Set the value of the select to the value of the matching option
             publicationTypeSelect.value = publicationTypeSelect.options[i].value;
             break;
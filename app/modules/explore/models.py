@@ -0,0 +1,37 @@
+from datetime import datetime
+
+from sqlalchemy import Enum as SQLAlchemyEnum
+
+from app import db
+from app.modules.dataset.models import PublicationType
+
+
+class DatasetSearchDocument(db.Model):
+    """
+    Denormalized row of a dataset as searched and sorted by explore: the normalized text of the dataset,
+    its authors and file models, plus the columns explore filters and orders by. Kept in sync on flush.
+    """
+
+    __tablename__ = "dataset_search_doc"
+
+    dataset_id = db.Column(db.Integer, db.ForeignKey("data_set.id", ondelete="CASCADE"), primary_key=True)
+    content = db.Column(db.Text, nullable=False, default="")
+    # normalized tag names, comma-separated
+    tags = db.Column(db.Text, nullable=False, default="")
+    publication_type = db.Column(SQLAlchemyEnum(PublicationType), nullable=True)
+    published = db.Column(db.Boolean, nullable=False, default=False)
+    created_at = db.Column(db.DateTime, nullable=True)
+    download_count = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    __table_args__ = (
+        db.Index("ix_dataset_search_doc_content", "content", mysql_prefix="FULLTEXT"),
+        # keyset pagination of the explore results
+        db.Index("ix_dataset_search_doc_published_created_at", "published", "created_at", "dataset_id"),
+    )
+
+    def get_tag_names(self):
+        return self.tags.split(",") if self.tags else []
+
+    def __repr__(self):
+        return f"DatasetSearchDocument<{self.dataset_id}>"
@@ -1,62 +1,673 @@
+import heapq
+import logging
 import re
+import threading
+import time
+from bisect import bisect_left, insort
+from collections import Counter, defaultdict
+from datetime import datetime
+from typing import Callable, Dict, FrozenSet, Iterable, List, Optional, Set, Tuple
 
 import unidecode
-from sqlalchemy import any_, or_
+from flask import current_app
+from sqlalchemy import and_, bindparam, event, func, or_, select
+from sqlalchemy.dialects.mysql import match
+from sqlalchemy.orm import Session
 
-from app.modules.dataset.models import Author, DataSet, DSMetaData, PublicationType
+from app import record_buffer
+from app.modules.dataset.models import (
+    Author,
+    BaseDataSet,
+    DataSet,
+    DSCounter,
+    DSDownloadRecord,
+    DSMetaData,
+    PublicationType,
+    Tag,
+    ds_meta_data_tag,
+    parse_tags,
+)
+from app.modules.explore.models import DatasetSearchDocument
 from app.modules.filemodel.models import FileModel, FMMetaData
 from core.repositories.BaseRepository import BaseRepository
 
+logger = logging.getLogger(__name__)
 
-class ExploreRepository(BaseRepository):
-    def __init__(self):
-        super().__init__(DataSet)
+# InnoDB does not index tokens shorter than innodb_ft_min_token_size nor its default stopwords,
+# so those words are matched with LIKE on the search document instead
+FULLTEXT_MIN_TOKEN_SIZE = 3
+FULLTEXT_STOPWORDS = frozenset(
+    "a about an are as at be by com de en for from how i in is it la of on or that the this to was what when "
+    "where who will with und www".split()
+)
 
-    def filter(self, query="", sorting="newest", publication_type="any", tags=[], **kwargs):
-        # Normalize and remove unwanted characters
-        normalized_query = unidecode.unidecode(query).lower()
-        cleaned_query = re.sub(r'[,.":\'()\[\]^;!¡¿?]', "", normalized_query)
-
-        filters = []
-        for word in cleaned_query.split():
-            filters.append(DSMetaData.title.ilike(f"%{word}%"))
-            filters.append(DSMetaData.description.ilike(f"%{word}%"))
-            filters.append(Author.name.ilike(f"%{word}%"))
-            filters.append(Author.affiliation.ilike(f"%{word}%"))
-            filters.append(Author.orcid.ilike(f"%{word}%"))
-            filters.append(FMMetaData.filename.ilike(f"%{word}%"))
-            filters.append(FMMetaData.title.ilike(f"%{word}%"))
-            filters.append(FMMetaData.description.ilike(f"%{word}%"))
-            filters.append(FMMetaData.publication_doi.ilike(f"%{word}%"))
-            filters.append(FMMetaData.tags.ilike(f"%{word}%"))
-            filters.append(DSMetaData.tags.ilike(f"%{word}%"))
-
-        datasets = (
-            self.model.query.join(DataSet.ds_meta_data)
-            .join(DSMetaData.authors)
-            .join(DataSet.file_models)
-            .join(FileModel.fm_meta_data)
-            .filter(or_(*filters))
-            .filter(DSMetaData.dataset_doi.isnot(None))  # Exclude datasets with empty dataset_doi
+
+def tokenize(text) -> List[str]:
+    """
+    Normalizes text to lowercase ASCII and splits it on punctuation and whitespace, the same
+    boundaries the MariaDB full-text parser uses.
+    """
+    return re.findall(r"[a-z0-9_]+", unidecode.unidecode(text or "").lower())
+
+
+class CachedIndex:
+    """
+    In-process snapshot of database rows, reloaded once older than ``ttl`` seconds. Requests keep
+    reading the stale snapshot while one background thread reloads it.
+    """
+
+    TTL = 300
+
+    def __init__(self, ttl=None):
+        self.ttl = self.TTL if ttl is None else ttl
+        self._lock = threading.Lock()
+        self._built_at = None
+        self._refreshing = False
+
+    def is_loaded(self) -> bool:
+        return self._built_at is not None
+
+    def is_stale(self) -> bool:
+        return self._built_at is None or time.monotonic() - self._built_at > self.ttl
+
+    def claim_refresh(self) -> bool:
+        """Returns True for the one caller that should rebuild the index; False while a rebuild runs."""
+        with self._lock:
+            if self._refreshing:
+                return False
+            self._refreshing = True
+            return True
+
+    def release_refresh(self):
+        with self._lock:
+            self._refreshing = False
+
+    def refresh_in_background(self, app, load: Callable[[], None], name: str):
+        """Runs ``load`` in a thread with an app context, unless a reload is already running."""
+        if not self.claim_refresh():
+            return
+
+        def run():
+            with app.app_context():
+                try:
+                    load()
+                except Exception as exc:
+                    logger.warning(f"Could not reload the {type(self).__name__}: {exc}")
+                finally:
+                    self.release_refresh()
+
+        threading.Thread(target=run, name=name, daemon=True).start()
+
+    def ensure_loaded(self, load: Callable[[], None], name: str):
+        """
+        Runs ``load`` in the request only when nothing was loaded yet; a stale snapshot is served as is
+        and reloaded in the background.
+        """
+        if not self.is_loaded():
+            load()
+        elif self.is_stale():
+            self.refresh_in_background(current_app._get_current_object(), load, name)
+
+
+class SearchIndex(CachedIndex):
+    """
+    In-process inverted index over the search documents, used when the database has no full-text
+    support. Words match every indexed token they are a prefix of, like ``word*`` in MariaDB.
+    """
+
+    def __init__(self, ttl=None):
+        super().__init__(ttl)
+        self._documents: Dict[int, Set[str]] = {}
+        self._postings: Dict[str, Set[int]] = defaultdict(set)
+        self._vocabulary: List[str] = []
+
+    def load(self, documents: Dict[int, str]):
+        with self._lock:
+            self._documents = {}
+            self._postings = defaultdict(set)
+            for dataset_id, content in documents.items():
+                self._add(dataset_id, content)
+            self._vocabulary = sorted(self._postings)
+            self._built_at = time.monotonic()
+
+    def update(self, documents: Dict[int, str]):
+        with self._lock:
+            if self._built_at is None:
+                return
+            for dataset_id, content in documents.items():
+                self._remove(dataset_id)
+                self._add(dataset_id, content)
+            self._vocabulary = sorted(self._postings)
+
+    def _add(self, dataset_id: int, content: str):
+        tokens = set(content.split())
+        self._documents[dataset_id] = tokens
+        for token in tokens:
+            self._postings[token].add(dataset_id)
+
+    def _remove(self, dataset_id: int):
+        for token in self._documents.pop(dataset_id, ()):
+            postings = self._postings[token]
+            postings.discard(dataset_id)
+            if not postings:
+                del self._postings[token]
+
+    def search(self, words: Iterable[str]) -> Set[int]:
+        """Returns the ids of the documents containing a token starting with any of ``words``."""
+        vocabulary, postings = self._vocabulary, self._postings
+        matches = set()
+        for word in words:
+            position = bisect_left(vocabulary, word)
+            while position < len(vocabulary) and vocabulary[position].startswith(word):
+                matches |= postings.get(vocabulary[position], set())
+                position += 1
+        return matches
+
+
+search_index = SearchIndex()
+
+
+class FacetIndex(CachedIndex):
+    """
+    Cached publication type and tags of every published dataset, so facet counts over a set of
+    matching ids are computed in memory.
+    """
+
+    def __init__(self, ttl=None):
+        super().__init__(ttl)
+        self._facets: Dict[int, Tuple[Optional[str], FrozenSet[str]]] = {}
+
+    def load(self, rows):
+        """Loads ``(dataset_id, publication_type, tag names)`` rows."""
+        facets = {dataset_id: self._facet(publication_type, tags) for dataset_id, publication_type, tags in rows}
+        with self._lock:
+            self._facets = facets
+            self._built_at = time.monotonic()
+
+    def add(self, dataset_id: int, publication_type, tags):
+        with self._lock:
+            if self._built_at is not None:
+                self._facets[dataset_id] = self._facet(publication_type, tags)
+
+    @staticmethod
+    def _facet(publication_type, tags):
+        return (publication_type.value if publication_type else None, frozenset(tags))
+
+    def counts(self, dataset_ids: Iterable[int], publication_type=None, tags=(), max_tags=20) -> dict:
+        """
+        Counts, in one pass over ``dataset_ids``, the datasets each facet value would return: publication
+        types are counted under the selected tags and tags under the selected publication type.
+        """
+        tags = parse_tags(",".join(tags))
+        type_counts, tag_counts = defaultdict(int), defaultdict(int)
+        total = 0
+
+        for dataset_id in dataset_ids:
+            facet = self._facets.get(dataset_id)
+            if facet is None:
+                continue
+            dataset_type, dataset_tags = facet
+            type_matches = publication_type is None or dataset_type == publication_type
+            tags_match = not tags or not dataset_tags.isdisjoint(tags)
+
+            if tags_match and dataset_type:
+                type_counts[dataset_type] += 1
+            if type_matches:
+                for tag in dataset_tags:
+                    tag_counts[tag] += 1
+            if type_matches and tags_match:
+                total += 1
+
+        top_tags = sorted(tag_counts.items(), key=lambda item: (-item[1], item[0]))[:max_tags]
+        return {"total": total, "publication_type": dict(type_counts), "tags": dict(top_tags)}
+
+
+facet_index = FacetIndex()
+
+
+def normalize_completion(text) -> str:
+    return " ".join(unidecode.unidecode(text or "").lower().split())
+
+
+class SuggestIndex(CachedIndex):
+    """
+    Sorted array of the normalized titles, tags, author names and ORCIDs of the published datasets,
+    searched by prefix with bisect. Every word of a completion is indexed, so "tiles" completes
+    "Dungeon tiles". The best completions of the one and two letter prefixes, whose ranges are the
+    widest, are kept precomputed.
+    """
+
+    MAX_LIMIT = 20
+    CACHED_PREFIX_LENGTH = 2
+
+    def __init__(self, ttl=None):
+        super().__init__(ttl)
+        self._completions: Dict[Tuple[str, str], int] = {}
+        self._keys: List[Tuple[str, Tuple[str, str]]] = []
+        self._top: Dict[str, List[Tuple[str, str]]] = {}
+
+    @staticmethod
+    def _keys_of(completion: Tuple[str, str]) -> List[str]:
+        words = normalize_completion(completion[1]).split()
+        return [" ".join(words[i:]) for i in range(len(words))]
+
+    def _rank(self, completion: Tuple[str, str]):
+        return (-self._completions[completion], completion[1].lower(), completion[0])
+
+    def _best(self, completions: Iterable[Tuple[str, str]]) -> List[Tuple[str, str]]:
+        return heapq.nsmallest(self.MAX_LIMIT, set(completions), key=self._rank)
+
+    def load(self, entries: Iterable[Tuple[str, str, int]]):
+        """Loads ``(kind, text, weight)`` entries; the weights of repeated completions are added up."""
+        completions = defaultdict(int)
+        for kind, text, weight in entries:
+            if text and text.strip():
+                completions[(kind, text.strip())] += weight
+
+        with self._lock:
+            self._completions = dict(completions)
+            self._keys = sorted((key, completion) for completion in completions for key in self._keys_of(completion))
+            by_prefix = defaultdict(list)
+            for key, completion in self._keys:
+                for length in range(1, self.CACHED_PREFIX_LENGTH + 1):
+                    if len(key) >= length:
+                        by_prefix[key[:length]].append(completion)
+            self._top = {prefix: self._best(completions) for prefix, completions in by_prefix.items()}
+            self._built_at = time.monotonic()
+
+    def add(self, entries: Iterable[Tuple[str, str, int]]):
+        """Adds the completions of a newly published dataset to an already built index."""
+        with self._lock:
+            if self._built_at is None:
+                return
+            for kind, text, weight in entries:
+                if not text or not text.strip():
+                    continue
+                completion = (kind, text.strip())
+                if completion not in self._completions:
+                    self._completions[completion] = 0
+                    for key in self._keys_of(completion):
+                        insort(self._keys, (key, completion))
+                self._completions[completion] += weight
+                # weights only grow, so the new best of a prefix is among its old best and this one
+                for key in self._keys_of(completion):
+                    for length in range(1, min(len(key), self.CACHED_PREFIX_LENGTH) + 1):
+                        prefix = key[:length]
+                        self._top[prefix] = self._best(self._top.get(prefix, []) + [completion])
+
+    def suggest(self, prefix: str, limit: int = 10) -> List[dict]:
+        prefix = normalize_completion(prefix)
+        if not prefix:
+            return []
+
+        with self._lock:
+            if len(prefix) <= self.CACHED_PREFIX_LENGTH:
+                best = self._top.get(prefix, [])
+            else:
+                start = bisect_left(self._keys, (prefix,))
+                end = bisect_left(self._keys, (prefix + "\uffff",), lo=start)
+                best = self._best(completion for _, completion in self._keys[start:end])
+            return [{"type": kind, "text": text} for kind, text in best[: min(limit, self.MAX_LIMIT)]]
+
+
+suggest_index = SuggestIndex()
+
+
+class DatasetSearchRepository(BaseRepository):
+    def __init__(self, index=None, session=None):
+        super().__init__(DatasetSearchDocument)
+        self.index = index or search_index
+        if session is not None:
+            self.session = session
+
+    def build_documents(self, dataset_ids: Iterable[int]) -> Dict[int, dict]:
+        """
+        Builds the search document row of each dataset: the normalized text of its metadata, authors and
+        file models, and the denormalized columns explore filters and sorts by.
+        """
+        dataset_ids = list(set(dataset_ids))
+        if not dataset_ids:
+            return {}
+
+        documents = {}
+        texts = defaultdict(list)
+        for dataset_id, created_at, publication_type, dataset_doi, download_count, *fields in (
+            self.session.query(
+                DataSet.id,
+                DataSet.created_at,
+                DSMetaData.publication_type,
+                DSMetaData.dataset_doi,
+                func.coalesce(DSCounter.download_count, 0),
+                DSMetaData.title,
+                DSMetaData.description,
+                DSMetaData.tags,
+            )
+            .join(DSMetaData, DataSet.ds_meta_data_id == DSMetaData.id)
+            .outerjoin(DSCounter, DSCounter.dataset_id == DataSet.id)
+            .filter(DataSet.id.in_(dataset_ids))
+        ):
+            documents[dataset_id] = {
+                "dataset_id": dataset_id,
+                "publication_type": publication_type,
+                "published": dataset_doi is not None,
+                "created_at": created_at,
+                "download_count": download_count,
+            }
+            texts[dataset_id].extend(fields)
+        for dataset_id, *fields in (
+            self.session.query(DataSet.id, Author.name, Author.affiliation, Author.orcid)
+            .join(Author, Author.ds_meta_data_id == DataSet.ds_meta_data_id)
+            .filter(DataSet.id.in_(dataset_ids))
+        ):
+            texts[dataset_id].extend(fields)
+        for dataset_id, *fields in (
+            self.session.query(
+                FileModel.data_set_id,
+                FMMetaData.filename,
+                FMMetaData.title,
+                FMMetaData.description,
+                FMMetaData.publication_doi,
+                FMMetaData.tags,
+            )
+            .join(FMMetaData, FileModel.fm_meta_data_id == FMMetaData.id)
+            .filter(FileModel.data_set_id.in_(dataset_ids))
+        ):
+            texts[dataset_id].extend(fields)
+        tags = defaultdict(list)
+        for dataset_id, name in (
+            self.session.query(DataSet.id, Tag.name)
+            .join(ds_meta_data_tag, ds_meta_data_tag.c.ds_meta_data_id == DataSet.ds_meta_data_id)
+            .join(Tag, Tag.id == ds_meta_data_tag.c.tag_id)
+            .filter(DataSet.id.in_(dataset_ids))
+            .order_by(Tag.name)
+        ):
+            tags[dataset_id].append(name)
+
+        for dataset_id, document in documents.items():
+            document["content"] = " ".join(tokenize(" ".join(field for field in texts[dataset_id] if field)))
+            document["tags"] = ",".join(tags[dataset_id])
+        return documents
+
+    def write(self, dataset_ids: Iterable[int]) -> Dict[int, dict]:
+        """
+        Replaces the search documents of the given datasets in the current transaction, dropping those
+        of the datasets that no longer exist.
+        """
+        dataset_ids = list(set(dataset_ids))
+        documents = self.build_documents(dataset_ids)
+        table = self.model.__table__
+        now = datetime.utcnow()
+        self.session.execute(table.delete().where(table.c.dataset_id.in_(dataset_ids)))
+        if documents:
+            self.session.execute(table.insert(), [{**document, "updated_at": now} for document in documents.values()])
+        return documents
+
+    def refresh(self, dataset_ids: Iterable[int], commit: bool = True):
+        """Rewrites the search documents of the given datasets."""
+        try:
+            documents = self.write(dataset_ids)
+            if commit:
+                self.session.commit()
+        except Exception:
+            self.session.rollback()
+            raise
+        self.index.update({dataset_id: document["content"] for dataset_id, document in documents.items()})
+
+    def rebuild(self) -> int:
+        try:
+            self.model.query.delete()
+            self.write([dataset_id for (dataset_id,) in self.session.query(DataSet.id)])
+            self.session.commit()
+        except Exception:
+            self.session.rollback()
+            raise
+        self.index.load(self.load_documents())
+        return self.count()
+
+    def load_documents(self) -> Dict[int, str]:
+        return dict(self.session.query(self.model.dataset_id, self.model.content))
+
+    @staticmethod
+    def collect_flushed(session, flush_context):
+        """
+        after_flush listener: remembers the datasets whose rows, metadata, authors or file models were
+        just flushed. Their search documents are written once, right before the transaction commits.
+        """
+        dirty = session.info.setdefault(
+            "search_dirty", {"dataset": set(), "ds_meta_data": set(), "fm_meta_data": set()}
+        )
+        for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+            if isinstance(obj, BaseDataSet):
+                dirty["dataset"].add(obj.id)
+            elif isinstance(obj, DSMetaData):
+                dirty["ds_meta_data"].add(obj.id)
+            elif isinstance(obj, Author) and obj.ds_meta_data_id is not None:
+                dirty["ds_meta_data"].add(obj.ds_meta_data_id)
+            elif isinstance(obj, FileModel):
+                dirty["dataset"].add(obj.data_set_id)
+            elif isinstance(obj, FMMetaData):
+                dirty["fm_meta_data"].add(obj.id)
+
+    @classmethod
+    def write_collected(cls, session):
+        """
+        before_commit listener: rewrites, in the committing transaction, the search documents of the
+        datasets collected since the last commit. The in-memory index is only updated once it commits.
+        """
+        # the pending changes are only flushed after this hook, and may touch more datasets
+        session.flush()
+        dirty = session.info.pop("search_dirty", None)
+        if not dirty:
+            return
+
+        dataset_ids = dirty["dataset"]
+        with session.no_autoflush:
+            if dirty["ds_meta_data"]:
+                dataset_ids.update(
+                    dataset_id
+                    for (dataset_id,) in session.query(DataSet.id).filter(
+                        DataSet.ds_meta_data_id.in_(dirty["ds_meta_data"])
+                    )
+                )
+            if dirty["fm_meta_data"]:
+                dataset_ids.update(
+                    dataset_id
+                    for (dataset_id,) in session.query(FileModel.data_set_id).filter(
+                        FileModel.fm_meta_data_id.in_(dirty["fm_meta_data"])
+                    )
+                )
+            dataset_ids.discard(None)
+            if not dataset_ids:
+                return
+            documents = cls(session=session).write(dataset_ids)
+
+        contents = session.info.setdefault("search_documents", {})
+        contents.update({dataset_id: "" for dataset_id in dataset_ids})
+        contents.update({dataset_id: document["content"] for dataset_id, document in documents.items()})
+
+    @staticmethod
+    def apply_committed(session):
+        contents = session.info.pop("search_documents", None)
+        if contents:
+            search_index.update(contents)
+
+    @staticmethod
+    def discard_uncommitted(session):
+        session.info.pop("search_dirty", None)
+        session.info.pop("search_documents", None)
+
+    @classmethod
+    def apply_download_records(cls, connection, rows: List[dict]):
+        """Flush listener of DSDownloadRecord."""
+        table = DatasetSearchDocument.__table__
+        downloads = Counter(row["dataset_id"] for row in rows)
+        connection.execute(
+            table.update()
+            .where(table.c.dataset_id == bindparam("id"))
+            .values(download_count=table.c.download_count + bindparam("downloads")),
+            [{"id": dataset_id, "downloads": count} for dataset_id, count in downloads.items()],
         )
 
+    def supports_fulltext(self) -> bool:
+        return self.session.get_bind().dialect.name == "mysql"
+
+    def matching(self, words: List[str]):
+        """Returns a filter keeping the search documents matching any of ``words``."""
+        if not self.supports_fulltext():
+            self.index.ensure_loaded(lambda: self.index.load(self.load_documents()), name="search-index-refresh")
+            return self.model.dataset_id.in_(self.index.search(words))
+
+        indexed = [w for w in words if len(w) >= FULLTEXT_MIN_TOKEN_SIZE and w not in FULLTEXT_STOPWORDS]
+        conditions = [self.model.content.like(f"%{w}%") for w in words if w not in indexed]
+        if indexed:
+            conditions.append(match(self.model.content, against=" ".join(f"{w}*" for w in indexed)).in_boolean_mode())
+        return or_(*conditions)
+
+
+event.listen(Session, "after_flush", DatasetSearchRepository.collect_flushed)
+event.listen(Session, "before_commit", DatasetSearchRepository.write_collected)
+event.listen(Session, "after_commit", DatasetSearchRepository.apply_committed)
+event.listen(Session, "after_rollback", DatasetSearchRepository.discard_uncommitted)
+record_buffer.on_flush(DSDownloadRecord, DatasetSearchRepository.apply_download_records)
+
+
+class ExploreRepository(BaseRepository):
+    def __init__(self, facets=None, suggestions=None):
+        super().__init__(DataSet)
+        self.search_repository = DatasetSearchRepository()
+        self.facets = facets or facet_index
+        self.suggestions = suggestions or suggest_index
+
+    @staticmethod
+    def get_publication_type(publication_type) -> Optional[PublicationType]:
         if publication_type != "any":
-            matching_type = None
             for member in PublicationType:
                 if member.value.lower() == publication_type:
-                    matching_type = member
-                    break
+                    return member
+        return None
+
+    def search_query(self, query="", publication_type="any", tags=[]):
+        """
+        Returns the unordered query of the search documents of the published datasets matching the
+        given criteria. It only reads the dataset_search_doc table, plus the tag index for tags.
+        """
+        document = DatasetSearchDocument
+        words = list(dict.fromkeys(tokenize(query)))
+
+        documents = document.query.filter(document.published.is_(True))
 
-            if matching_type is not None:
-                datasets = datasets.filter(DSMetaData.publication_type == matching_type.name)
+        if words:
+            documents = documents.filter(self.search_repository.matching(words))
 
-        if tags:
-            datasets = datasets.filter(DSMetaData.tags.ilike(any_(f"%{tag}%" for tag in tags)))
+        matching_type = self.get_publication_type(publication_type)
+        if matching_type is not None:
+            documents = documents.filter(document.publication_type == matching_type)
+
+        tag_names = parse_tags(",".join(tags or []))
+        if tag_names:
+            tagged = (
+                select(DataSet.id)
+                .join(ds_meta_data_tag, ds_meta_data_tag.c.ds_meta_data_id == DataSet.ds_meta_data_id)
+                .join(Tag, Tag.id == ds_meta_data_tag.c.tag_id)
+                .where(Tag.name.in_(tag_names))
+            )
+            documents = documents.filter(document.dataset_id.in_(tagged))
+
+        return documents
+
+    def get_datasets(self, dataset_ids: List[int]) -> List[DataSet]:
+        """Loads the datasets of a page of search documents, keeping their order."""
+        if not dataset_ids:
+            return []
+        by_id = {dataset.id: dataset for dataset in self.model.query.filter(DataSet.id.in_(dataset_ids))}
+        return [by_id[dataset_id] for dataset_id in dataset_ids if dataset_id in by_id]
+
+    def load_facets(self):
+        document = DatasetSearchDocument
+        self.facets.load(
+            (dataset_id, publication_type, tags.split(",") if tags else [])
+            for dataset_id, publication_type, tags in self.session.query(
+                document.dataset_id, document.publication_type, document.tags
+            ).filter(document.published.is_(True))
+        )
+
+    def load_suggestions(self):
+        """Loads the titles, tags, author names and ORCIDs of the published datasets, weighted by use."""
+        published = DSMetaData.dataset_doi.isnot(None)
+        titles = self.session.query(DSMetaData.title, func.count()).filter(published).group_by(DSMetaData.title)
+        tags = (
+            self.session.query(Tag.name, func.count())
+            .join(ds_meta_data_tag, ds_meta_data_tag.c.tag_id == Tag.id)
+            .join(DSMetaData, DSMetaData.id == ds_meta_data_tag.c.ds_meta_data_id)
+            .filter(published)
+            .group_by(Tag.name)
+        )
+        authors = self.session.query(Author.name, func.count()).join(DSMetaData).filter(published).group_by(Author.name)
+        orcids = (
+            self.session.query(Author.orcid, func.count())
+            .join(DSMetaData)
+            .filter(published, Author.orcid.isnot(None))
+            .group_by(Author.orcid)
+        )
+
+        entries = []
+        for kind, query in (("title", titles), ("tag", tags), ("author", authors), ("orcid", orcids)):
+            entries.extend((kind, text, count) for text, count in query)
+        self.suggestions.load(entries)
+
+    def suggest(self, prefix: str, limit: int = 10) -> List[dict]:
+        """Completes ``prefix`` from the in-memory index only; it is rebuilt by load_suggestions."""
+        return self.suggestions.suggest(prefix, limit)
+
+    def facet_counts(self, query="", publication_type="any", tags=[]) -> dict:
+        """
+        Returns the facet counts of a search. The matching ids are fetched once, without the facet
+        filters, which are then applied in memory over the cached facet index.
+        """
+        self.facets.ensure_loaded(self.load_facets, name="facet-index-refresh")
+        ids = (dataset_id for (dataset_id,) in self.search_query(query).with_entities(DatasetSearchDocument.dataset_id))
+        matching_type = self.get_publication_type(publication_type)
+        return self.facets.counts(ids, matching_type.value if matching_type else None, tags or ())
+
+    def filter(self, query="", sorting="newest", publication_type="any", tags=[], **kwargs):
+        documents = self.search_query(query, publication_type, tags)
+        created_at, id = DatasetSearchDocument.created_at, DatasetSearchDocument.dataset_id
 
         # Order by created_at
         if sorting == "oldest":
-            datasets = datasets.order_by(self.model.created_at.asc())
+            documents = documents.order_by(created_at.asc(), id.asc())
+        else:
+            documents = documents.order_by(created_at.desc(), id.desc())
+
+        return self.get_datasets([dataset_id for (dataset_id,) in documents.with_entities(id)])
+
+    def page(
+        self,
+        query="",
+        sorting="newest",
+        publication_type="any",
+        tags=[],
+        after: Optional[Tuple[datetime, int]] = None,
+        limit=20,
+        with_total=False,
+    ):
+        """
+        Returns one page of matching datasets ordered by ``(created_at, id)``, starting after the
+        ``(created_at, id)`` key of the last dataset of the previous page. Also returns whether more
+        pages follow and, if requested, the total number of matches.
+        """
+        documents = self.search_query(query, publication_type, tags)
+        total = documents.order_by(None).count() if with_total else None
+
+        created_at, id = DatasetSearchDocument.created_at, DatasetSearchDocument.dataset_id
+        if sorting == "oldest":
+            if after:
+                documents = documents.filter(or_(created_at > after[0], and_(created_at == after[0], id > after[1])))
+            documents = documents.order_by(created_at.asc(), id.asc())
         else:
-            datasets = datasets.order_by(self.model.created_at.desc())
+            if after:
+                documents = documents.filter(or_(created_at < after[0], and_(created_at == after[0], id < after[1])))
+            documents = documents.order_by(created_at.desc(), id.desc())
 
-        return datasets.all()
+        ids = [dataset_id for (dataset_id,) in documents.with_entities(id).limit(limit + 1)]
+        return self.get_datasets(ids[:limit]), len(ids) > limit, total
@@ -1,5 +1,6 @@
 from flask import jsonify, render_template, request
 
+from app.modules.dataset.services import DataSetSerializer
 from app.modules.explore import explore_bp
 from app.modules.explore.forms import ExploreForm
 from app.modules.explore.services import ExploreService
@@ -14,5 +15,32 @@ def index():
 
     if request.method == "POST":
         criteria = request.get_json()
-        datasets = ExploreService().filter(**criteria)
-        return jsonify([dataset.to_dict() for dataset in datasets])
+        include_facets = criteria.pop("include_facets", False)
+        service = ExploreService()
+        try:
+            facets = service.facets(**criteria) if include_facets else None
+            if facets is not None:
+                # the facets already count the matches
+                criteria["include_total"] = False
+            datasets, next_cursor, total = service.paginate(**criteria)
+        except ValueError as exc:
+            return jsonify({"message": str(exc)}), 400
+        if facets is not None:
+            total = facets.pop("total")
+        return jsonify(
+            {
+                "datasets": DataSetSerializer().serialize(datasets),
+                "next_cursor": next_cursor,
+                "total": total,
+                "facets": facets,
+            }
+        )
+
+
+@explore_bp.route("/explore/suggest", methods=["GET"])
+def suggest():
+    try:
+        suggestions = ExploreService().suggest(request.args.get("q", ""), request.args.get("limit"))
+    except ValueError as exc:
+        return jsonify({"message": str(exc)}), 400
+    return jsonify({"suggestions": suggestions})
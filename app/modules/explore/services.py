@@ -1,10 +1,109 @@
-from app.modules.explore.repositories import ExploreRepository
+import base64
+import binascii
+import json
+from datetime import datetime
+
+from flask import current_app
+
+from app.modules.explore.repositories import (
+    DatasetSearchRepository,
+    ExploreRepository,
+    facet_index,
+    suggest_index,
+)
 from core.services.BaseService import BaseService
 
 
 class ExploreService(BaseService):
+    PAGE_SIZE = 20
+    MAX_PAGE_SIZE = 100
+
     def __init__(self):
         super().__init__(ExploreRepository())
 
     def filter(self, query="", sorting="newest", publication_type="any", tags=[], **kwargs):
         return self.repository.filter(query, sorting, publication_type, tags, **kwargs)
+
+    @staticmethod
+    def encode_cursor(dataset) -> str:
+        key = json.dumps([dataset.created_at.isoformat(), dataset.id])
+        return base64.urlsafe_b64encode(key.encode()).decode()
+
+    @staticmethod
+    def decode_cursor(cursor: str):
+        if not isinstance(cursor, str):
+            raise ValueError("Invalid cursor")
+        try:
+            created_at, id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+            return datetime.fromisoformat(created_at), int(id)
+        except (binascii.Error, TypeError, ValueError) as exc:
+            raise ValueError("Invalid cursor") from exc
+
+    def facets(self, query="", publication_type="any", tags=[], **kwargs) -> dict:
+        return self.repository.facet_counts(query, publication_type, tags)
+
+    def paginate(
+        self,
+        query="",
+        sorting="newest",
+        publication_type="any",
+        tags=[],
+        cursor=None,
+        limit=None,
+        include_total=False,
+        **kwargs,
+    ):
+        """
+        Returns one page of the search: the datasets, the cursor of the next page (None on the last one)
+        and the total number of matches when ``include_total`` is set.
+        """
+        try:
+            limit = min(max(int(limit or self.PAGE_SIZE), 1), self.MAX_PAGE_SIZE)
+        except (TypeError, ValueError) as exc:
+            raise ValueError("Invalid limit") from exc
+        after = self.decode_cursor(cursor) if cursor else None
+
+        datasets, has_more, total = self.repository.page(
+            query, sorting, publication_type, tags, after=after, limit=limit, with_total=bool(include_total)
+        )
+        next_cursor = self.encode_cursor(datasets[-1]) if has_more else None
+        return datasets, next_cursor, total
+
+    def suggest(self, prefix="", limit=None):
+        try:
+            limit = min(max(int(limit or 10), 1), suggest_index.MAX_LIMIT)
+        except (TypeError, ValueError) as exc:
+            raise ValueError("Invalid limit") from exc
+        if suggest_index.is_stale():
+            # keystrokes are served from the stale (or still empty) index while it is rebuilt
+            self.refresh_suggestions(current_app._get_current_object())
+        return self.repository.suggest(prefix, limit)
+
+    @staticmethod
+    def refresh_suggestions(app):
+        """Rebuilds the suggestion index in a background thread, unless a rebuild is already running."""
+        suggest_index.refresh_in_background(
+            app, lambda: ExploreRepository().load_suggestions(), name="suggest-index-refresh"
+        )
+
+
+class DatasetSearchService(BaseService):
+    def __init__(self):
+        super().__init__(DatasetSearchRepository())
+
+    def refresh(self, dataset_ids):
+        return self.repository.refresh(dataset_ids)
+
+    def publish(self, dataset):
+        """Adds a dataset that just got its DOI to the cached facets and suggestions."""
+        meta = dataset.ds_meta_data
+        facet_index.add(dataset.id, meta.publication_type, meta.get_tag_names())
+        suggest_index.add(
+            [("title", meta.title, 1)]
+            + [("tag", name, 1) for name in meta.get_tag_names()]
+            + [("author", author.name, 1) for author in meta.authors]
+            + [("orcid", author.orcid, 1) for author in meta.authors if author.orcid]
+        )
+
+    def rebuild(self) -> int:
+        return self.repository.rebuild()
@@ -0,0 +1,393 @@
+from datetime import datetime
+from unittest.mock import MagicMock, patch
+
+import pytest
+from flask import Flask
+from sqlalchemy import event
+from sqlalchemy.dialects import mysql
+
+from app import db
+from app.modules.dataset.models import (
+    Author,
+    BaseDataSet,
+    DataSet,
+    DSCounter,
+    DSMetaData,
+    Person,
+    PixMetaData,
+    PublicationType,
+    Tag,
+    ds_meta_data_tag,
+)
+from app.modules.explore import repositories as explore_repositories
+from app.modules.explore import services as explore_services
+from app.modules.explore.models import DatasetSearchDocument
+from app.modules.explore.repositories import (
+    DatasetSearchRepository,
+    ExploreRepository,
+    FacetIndex,
+    SearchIndex,
+    SuggestIndex,
+    search_index,
+    tokenize,
+)
+from app.modules.explore.services import ExploreService
+from app.modules.filemodel.models import FileModel, FMMetaData, fm_meta_data_tag
+
+
+@pytest.fixture
+def sqlite_app():
+    app = Flask(__name__)
+    app.config["SQLALCHEMY_DATABASE_URI"] = "sqlite://"
+    db.init_app(app)
+
+    with app.app_context():
+        for model in (DSMetaData, Person, Author, Tag, BaseDataSet, DataSet, PixMetaData, DSCounter, FMMetaData):
+            model.__table__.create(db.engine)
+        for table in (FileModel.__table__, ds_meta_data_tag, fm_meta_data_tag, DatasetSearchDocument.__table__):
+            table.create(db.engine)
+        yield app
+        db.session.remove()
+    search_index.load({})
+
+
+def create_dataset(id, title, tags="", authors=(), filenames=(), doi=True, publication_type=PublicationType.NONE):
+    meta = DSMetaData(
+        title=title,
+        description=f"Description of {title}",
+        tags=tags,
+        publication_type=publication_type,
+        dataset_doi=f"10.1234/dataset{id}" if doi else None,
+        authors=[Author(name=name) for name in authors],
+    )
+    dataset = DataSet(id=id, user_id=1, ds_meta_data=meta, created_at=datetime(2025, 1, id))
+    db.session.add(dataset)
+    db.session.flush()
+    for filename in filenames:
+        fm_meta = FMMetaData(filename=filename, title=filename, description="", publication_type=PublicationType.NONE)
+        db.session.add(FileModel(data_set_id=dataset.id, fm_meta_data=fm_meta))
+    db.session.commit()
+    return dataset
+
+
+def test_tokenize_normalizes_like_the_explore_cleanup():
+    assert tokenize('Pixel-Árt (Retro), "Sprites"! ¿8x8?') == ["pixel", "art", "retro", "sprites", "8x8"]
+    assert tokenize(None) == []
+
+
+def test_search_index_matches_token_prefixes():
+    index = SearchIndex()
+    index.load({1: "pixel art retro", 2: "pixar sprites", 3: "landscape"})
+
+    assert index.search(["pix"]) == {1, 2}
+    assert index.search(["sprites", "land"]) == {2, 3}
+    assert index.search(["art"]) == {1}
+    assert index.search(["zzz"]) == set()
+
+    index.update({1: "landscape"})
+    assert index.search(["pix"]) == {2}
+    assert index.search(["land"]) == {1, 3}
+
+
+def test_search_documents_include_authors_and_file_models(sqlite_app):
+    create_dataset(1, "Retro Sprites", tags="8bit", authors=["Pérez, Ana"], filenames=["hero.pix"])
+
+    DatasetSearchRepository().refresh([1])
+
+    content = DatasetSearchDocument.query.get(1).content.split()
+    assert {"retro", "sprites", "8bit", "perez", "ana", "hero", "pix"} <= set(content)
+
+
+def test_explore_filter_uses_the_search_documents(sqlite_app):
+    create_dataset(1, "Retro Sprites", authors=["Ana"], filenames=["hero.pix"])
+    create_dataset(2, "Landscapes", tags="nature", publication_type=PublicationType.BOOK)
+    create_dataset(3, "Nature tiles")
+    create_dataset(4, "Unpublished nature", doi=False)
+    DatasetSearchRepository().rebuild()
+
+    def search(**criteria):
+        return [dataset.id for dataset in ExploreRepository().filter(**criteria)]
+
+    assert search(query="") == [3, 2, 1]
+    assert search(query="natur", sorting="oldest") == [2, 3]
+    assert search(query="hero") == [1]
+    assert search(query="ana landscapes") == [2, 1]
+    assert search(query="nature", publication_type="book") == [2]
+    assert search(query="nature", tags=["nature"]) == [2]
+    assert search(query="missing") == []
+
+
+def test_fulltext_query_routes_short_words_and_stopwords_to_like(sqlite_app):
+    repository = DatasetSearchRepository()
+    with patch.object(repository, "supports_fulltext", return_value=True):
+        clause = repository.matching(["pixel", "8x", "the", "retro"])
+
+    sql = str(clause.compile(dialect=mysql.dialect(), compile_kwargs={"literal_binds": True}))
+    assert "data_set" not in sql
+    assert "MATCH (dataset_search_doc.content) AGAINST ('pixel* retro*' IN BOOLEAN MODE)" in sql
+    assert "dataset_search_doc.content LIKE '%%8x%%'" in sql
+    assert "dataset_search_doc.content LIKE '%%the%%'" in sql
+
+
+def test_explore_pages_follow_the_cursor(sqlite_app):
+    for id in range(1, 6):
+        create_dataset(id, f"Tiles {id}")
+    # same creation date as dataset 3, ordered by id
+    create_dataset(6, "Tiles 6").created_at = datetime(2025, 1, 3)
+    db.session.commit()
+    DatasetSearchRepository().rebuild()
+
+    service = ExploreService()
+
+    def all_pages(**criteria):
+        pages, cursor = [], None
+        while True:
+            datasets, cursor, total = service.paginate(cursor=cursor, limit=2, include_total=True, **criteria)
+            pages.append([dataset.id for dataset in datasets])
+            assert total == 6
+            if cursor is None:
+                return pages
+
+    assert all_pages(query="tiles") == [[5, 4], [6, 3], [2, 1]]
+    assert all_pages(query="tiles", sorting="oldest") == [[1, 2], [3, 6], [4, 5]]
+
+    datasets, cursor, total = service.paginate(limit=500)
+    assert len(datasets) == 6 and cursor is None and total is None
+
+
+def test_explore_rejects_invalid_cursors(sqlite_app):
+    with pytest.raises(ValueError, match="Invalid cursor"):
+        ExploreService().paginate(cursor="not-a-cursor")
+    for cursor in (5, ["a"], {"created_at": 1}):
+        with pytest.raises(ValueError, match="Invalid cursor"):
+            ExploreService().paginate(cursor=cursor)
+    with pytest.raises(ValueError, match="Invalid limit"):
+        ExploreService().paginate(limit="ten")
+
+
+def test_explore_returns_each_dataset_once_whatever_its_authors_and_file_models(sqlite_app):
+    create_dataset(1, "Dungeon tiles", authors=["Ana", "Luis", "Marta"], filenames=["a.pix", "b.pix", "c.pix"])
+    create_dataset(2, "Dungeon heroes")
+    DatasetSearchRepository().rebuild()
+
+    assert [dataset.id for dataset in ExploreRepository().filter(query="dungeon pix ana")] == [2, 1]
+    datasets, _, total = ExploreService().paginate(query="dungeon", include_total=True)
+    assert [dataset.id for dataset in datasets] == [2, 1]
+    assert total == 2
+
+
+def test_facet_counts_apply_the_other_facets_only():
+    index = FacetIndex()
+    index.load(
+        [
+            (1, PublicationType.BOOK, ["tiles", "dungeon"]),
+            (2, PublicationType.BOOK, ["heroes"]),
+            (3, PublicationType.PATENT, ["tiles"]),
+            (4, None, ["tiles"]),
+        ]
+    )
+
+    counts = index.counts([1, 2, 3, 4, 99], publication_type="book", tags=["Tiles"])
+
+    assert counts["total"] == 1
+    assert counts["publication_type"] == {"book": 1, "patent": 1}
+    assert counts["tags"] == {"dungeon": 1, "heroes": 1, "tiles": 1}
+    assert index.counts([1, 2, 3, 4], max_tags=1)["tags"] == {"tiles": 3}
+
+
+def test_explore_facet_counts_follow_the_search_query(sqlite_app):
+    create_dataset(1, "Dungeon tiles", tags="tiles, dungeon", publication_type=PublicationType.BOOK)
+    create_dataset(2, "Dungeon heroes", tags="heroes", publication_type=PublicationType.PATENT)
+    create_dataset(3, "Forest tiles", tags="tiles", publication_type=PublicationType.BOOK)
+    create_dataset(4, "Dungeon draft", tags="tiles", doi=False)
+    DatasetSearchRepository().rebuild()
+
+    facets = ExploreRepository(facets=FacetIndex()).facet_counts(query="dungeon", publication_type="book")
+
+    assert facets == {
+        "total": 1,
+        "publication_type": {"book": 1, "patent": 1},
+        "tags": {"dungeon": 1, "tiles": 1},
+    }
+
+
+def test_explore_tag_filter_matches_whole_tags(sqlite_app):
+    create_dataset(1, "Dungeon tiles", tags="Tiles, dungeon")
+    create_dataset(2, "Tileset", tags="tileset")
+    create_dataset(3, "Heroes", tags="heroes")
+
+    assert [dataset.id for dataset in ExploreRepository().filter(tags=["tiles", "heroes"])] == [3, 1]
+
+
+def test_suggest_index_completes_every_word_by_weight():
+    index = SuggestIndex()
+    index.load(
+        [
+            ("title", "Dungeon tiles", 1),
+            ("tag", "tiles", 3),
+            ("tag", "Tileset", 1),
+            ("author", "Tíl, Ana", 1),
+            ("orcid", "0000-0001", 1),
+        ]
+    )
+
+    assert index.suggest("til") == [
+        {"type": "tag", "text": "tiles"},
+        {"type": "title", "text": "Dungeon tiles"},
+        {"type": "tag", "text": "Tileset"},
+        {"type": "author", "text": "Tíl, Ana"},
+    ]
+    assert index.suggest("ti", limit=1) == [{"type": "tag", "text": "tiles"}]
+    assert index.suggest("0000") == [{"type": "orcid", "text": "0000-0001"}]
+    assert index.suggest("  ") == []
+
+
+def test_suggest_index_adds_published_completions_to_the_cached_prefixes():
+    index = SuggestIndex()
+    index.add([("tag", "tiles", 1)])
+    assert index.suggest("ti") == []
+
+    index.load([("tag", "tiles", 2)])
+    index.add([("tag", "tileset", 1), ("tag", "tileset", 2)])
+
+    assert index.suggest("ti") == [{"type": "tag", "text": "tileset"}, {"type": "tag", "text": "tiles"}]
+    assert index.suggest("tiles") == [{"type": "tag", "text": "tileset"}, {"type": "tag", "text": "tiles"}]
+
+
+def test_explore_suggestions_load_published_datasets_only(sqlite_app):
+    create_dataset(1, "Dungeon tiles", tags="tiles", authors=["Ana"])
+    create_dataset(2, "Forest tiles", tags="tiles, forest", authors=["Ana"])
+    create_dataset(3, "Draft tiles", tags="draft", doi=False)
+
+    repository = ExploreRepository(suggestions=SuggestIndex())
+    repository.load_suggestions()
+
+    assert repository.suggest("t") == [
+        {"type": "tag", "text": "tiles"},
+        {"type": "title", "text": "Dungeon tiles"},
+        {"type": "title", "text": "Forest tiles"},
+    ]
+    assert repository.suggest("an") == [{"type": "author", "text": "Ana"}]
+
+
+def test_stale_suggestions_are_served_while_rebuilt_in_the_background(sqlite_app, monkeypatch):
+    index = SuggestIndex(ttl=0)
+    index.load([("tag", "tiles", 1)])
+    monkeypatch.setattr(explore_repositories, "suggest_index", index)
+    monkeypatch.setattr(explore_services, "suggest_index", index)
+    started = []
+    monkeypatch.setattr(
+        explore_repositories.threading, "Thread", lambda **kwargs: MagicMock(start=lambda: started.append(1))
+    )
+
+    with patch.object(ExploreRepository, "load_suggestions") as load_suggestions:
+        assert ExploreService().suggest("ti") == [{"type": "tag", "text": "tiles"}]
+        assert ExploreService().suggest("ti") == [{"type": "tag", "text": "tiles"}]
+
+    load_suggestions.assert_not_called()
+    # one rebuild at a time
+    assert started == [1]
+
+
+def test_search_documents_are_maintained_on_flush(sqlite_app):
+    dataset = create_dataset(
+        1, "Dungeon tiles", tags="Tiles, dungeon", doi=False, publication_type=PublicationType.BOOK
+    )
+
+    document = db.session.get(DatasetSearchDocument, 1)
+    assert document.published is False
+    assert document.get_tag_names() == ["dungeon", "tiles"]
+    assert document.publication_type == PublicationType.BOOK
+    assert document.created_at == datetime(2025, 1, 1)
+    assert "dungeon" in document.content.split()
+
+    dataset.ds_meta_data.dataset_doi = "10.1234/dataset1"
+    dataset.ds_meta_data.tags = "heroes"
+    dataset.ds_meta_data.authors.append(Author(name="Ana"))
+    db.session.commit()
+    db.session.expire_all()
+
+    document = db.session.get(DatasetSearchDocument, 1)
+    assert document.published is True
+    assert document.get_tag_names() == ["heroes"]
+    assert {"heroes", "ana"} <= set(document.content.split())
+    assert search_index.search(["ana"]) == {1}
+
+    db.session.delete(dataset)
+    db.session.commit()
+    assert db.session.get(DatasetSearchDocument, 1) is None
+
+
+def test_search_documents_are_written_once_per_commit(sqlite_app):
+    statements = []
+    event.listen(db.engine, "before_cursor_execute", lambda *args: statements.append(args[2]))
+
+    meta = DSMetaData(title="Dungeon tiles", description="", publication_type=PublicationType.NONE)
+    db.session.add(DataSet(id=1, user_id=1, ds_meta_data=meta, created_at=datetime(2025, 1, 1)))
+    db.session.flush()
+    for name in ("Ana", "Bea"):
+        db.session.add(Author(name=name, ds_meta_data_id=meta.id))
+        db.session.flush()
+    fm_meta = FMMetaData(filename="hero.pix", title="", description="", publication_type=PublicationType.NONE)
+    db.session.add(FileModel(data_set_id=1, fm_meta_data=fm_meta))
+    db.session.commit()
+
+    assert len([statement for statement in statements if statement.startswith("INSERT INTO dataset_search_doc")]) == 1
+    assert {"dungeon", "ana", "bea", "hero"} <= set(db.session.get(DatasetSearchDocument, 1).content.split())
+
+    meta.title = "Forest tiles"
+    db.session.flush()
+    db.session.rollback()
+    assert "search_dirty" not in db.session.info
+    db.session.commit()
+    assert "forest" not in db.session.get(DatasetSearchDocument, 1).content.split()
+
+
+def test_search_documents_count_flushed_downloads(sqlite_app):
+    create_dataset(1, "Dungeon tiles")
+    create_dataset(2, "Forest tiles")
+
+    with db.engine.begin() as connection:
+        DatasetSearchRepository.apply_download_records(
+            connection, [{"dataset_id": 1}, {"dataset_id": 1}, {"dataset_id": 2}, {"dataset_id": None}]
+        )
+
+    counts = dict(db.session.query(DatasetSearchDocument.dataset_id, DatasetSearchDocument.download_count))
+    assert counts == {1: 2, 2: 1}
+
+
+def test_explore_pages_only_read_the_search_documents(sqlite_app):
+    for id in range(1, 4):
+        create_dataset(id, f"Tiles {id}", tags="tiles", authors=["Ana"], filenames=["a.pix"])
+
+    statements = []
+    event.listen(db.engine, "before_cursor_execute", lambda *args: statements.append(args[2]))
+    datasets, _, _ = ExploreService().paginate(query="tiles", tags=["tiles"], limit=2)
+
+    assert [dataset.id for dataset in datasets] == [3, 2]
+    search, hydrate = statements
+    assert "dataset_search_doc" in search and "ds_meta_data.id" not in search and "author" not in search
+    assert "dataset_search_doc" not in hydrate
+
+
+def test_stale_facets_and_search_index_are_served_while_reloaded_in_the_background(sqlite_app, monkeypatch):
+    create_dataset(1, "Dungeon tiles", tags="tiles", publication_type=PublicationType.BOOK)
+    facets, index = FacetIndex(ttl=0), SearchIndex(ttl=0)
+    repository = ExploreRepository(facets=facets)
+    repository.search_repository.index = index
+    started = []
+    monkeypatch.setattr(
+        explore_repositories.threading,
+        "Thread",
+        lambda **kwargs: MagicMock(start=lambda: started.append(kwargs["name"])),
+    )
+
+    # the first load runs in the request, as there is nothing to serve yet
+    assert repository.facet_counts(query="tiles")["total"] == 1
+    assert started == []
+
+    create_dataset(2, "Forest tiles", tags="tiles", publication_type=PublicationType.BOOK)
+    assert repository.facet_counts(query="tiles")["total"] == 1
+    assert repository.facet_counts(query="tiles")["total"] == 1
+    # one reload of each index at a time
+    assert started == ["facet-index-refresh", "search-index-refresh"]
@@ -1,7 +1,14 @@
 from sqlalchemy import Enum as SQLAlchemyEnum
 
 from app import db
-from app.modules.dataset.models import Author, PublicationType
+from app.modules.dataset.models import Author, PublicationType, Tag, tag_labels
+
+fm_meta_data_tag = db.Table(
+    "fm_meta_data_tag",
+    db.Column("fm_meta_data_id", db.Integer, db.ForeignKey("fm_meta_data.id", ondelete="CASCADE"), primary_key=True),
+    db.Column("tag_id", db.Integer, db.ForeignKey("tag.id", ondelete="CASCADE"), primary_key=True),
+    db.Index("ix_fm_meta_data_tag_tag_id", "tag_id", "fm_meta_data_id"),
+)
 
 
 class FileModel(db.Model):
@@ -23,7 +30,9 @@ class FMMetaData(db.Model):
     description = db.Column(db.Text, nullable=False)
     publication_type = db.Column(SQLAlchemyEnum(PublicationType), nullable=False)
     publication_doi = db.Column(db.String(120))
+    # comma-separated tags as entered in the forms; tag_list is kept in sync on flush
     tags = db.Column(db.String(120))
+    tag_list = db.relationship(Tag, secondary=fm_meta_data_tag, order_by=Tag.name, lazy=True)
     uvl_version = db.Column(db.String(120))
     fm_metrics_id = db.Column(db.Integer, db.ForeignKey("fm_metrics.id"))
     fm_metrics = db.relationship("FMMetrics", uselist=False, backref="fm_meta_data")
@@ -35,6 +44,12 @@ class FMMetaData(db.Model):
         foreign_keys=[Author.fm_meta_data_id],
     )
 
+    def get_tag_names(self):
+        return [tag.name for tag in self.tag_list]
+
+    def get_tag_labels(self):
+        return tag_labels(self.tags)
+
     def __repr__(self):
         return f"FMMetaData<{self.title}"
 
@@ -1,12 +1,46 @@
+import os
+from collections import defaultdict
 from datetime import datetime, timezone
 
 from flask import request
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
 
-from app import db
+from app import db, file_storage
 from app.modules.auth.models import User
 from app.modules.dataset.models import DataSet
 
 
+def dataset_storage_path(user_id: int, dataset_id: int, name: str) -> str:
+    """Location of a dataset file, relative to the uploads folder."""
+    return os.path.join(f"user_{user_id}", f"dataset_{dataset_id}", name)
+
+
+def blob_storage_path(sha256: str) -> str:
+    """Location of a blob, relative to the uploads folder, sharded by the first bytes of its hash."""
+    return os.path.join("blobs", sha256[:2], sha256[2:4], sha256)
+
+
+class Blob(db.Model):
+    """
+    Stored content of one or more files, addressed by its sha256. ref_count is the number of Hubfile rows
+    pointing at it, kept by ``count_blob_references``; blobs left without references are garbage collected.
+    """
+
+    __tablename__ = "blob"
+    id = db.Column(db.Integer, primary_key=True)
+    sha256 = db.Column(db.String(64), nullable=False, unique=True, index=True)
+    size = db.Column(db.BigInteger, nullable=False)
+    ref_count = db.Column(db.Integer, nullable=False, default=0)
+    created_at = db.Column(db.DateTime, nullable=False, default=lambda: datetime.now(timezone.utc))
+
+    def get_storage_path(self) -> str:
+        return blob_storage_path(self.sha256)
+
+    def __repr__(self):
+        return f"Blob<{self.sha256}>"
+
+
 class Hubfile(db.Model):
     __tablename__ = "file"
     id = db.Column(db.Integer, primary_key=True)
@@ -16,6 +50,11 @@ class Hubfile(db.Model):
     file_model_id = db.Column(
         db.Integer, db.ForeignKey("file_model.id"), nullable=False
     )  # TODO: cambiar a file_model.id
+    # relative to the uploads folder; rows created before it existed are resolved from their dataset
+    storage_path = db.Column(db.String(255), nullable=True)
+    blob_id = db.Column(db.Integer, db.ForeignKey("blob.id"), nullable=True, index=True)
+
+    blob = db.relationship("Blob")
 
     def get_formatted_size(self):
         from app.modules.dataset.services import SizeService
@@ -32,10 +71,22 @@ class Hubfile(db.Model):
 
         return HubfileService().get_dataset_by_hubfile(self)
 
-    def get_path(self) -> DataSet:
+    def get_storage_key(self) -> str:
+        """Key of the file in the storage backend."""
+        if self.storage_path:
+            return self.storage_path
+
         from app.modules.hubfile.services import HubfileService
 
-        return HubfileService().get_path_by_hubfile(self)
+        return HubfileService().get_storage_keys([self])[self.id]
+
+    def get_path(self) -> str:
+        """Path of the file on the local disk; None when the storage backend is not local."""
+        return file_storage.local_path(self.get_storage_key())
+
+    def open(self):
+        """Opens the content of the file for reading, from whichever storage backend holds it."""
+        return file_storage.open(self.get_storage_key())
 
     def to_dict(self):
         return {
@@ -51,6 +102,34 @@ class Hubfile(db.Model):
         return f"File<{self.id}>"
 
 
+@event.listens_for(Session, "after_flush")
+def count_blob_references(session, flush_context):
+    """Applies the Hubfile rows added, deleted or repointed in the flush to the ref_count of their blobs."""
+    deltas = defaultdict(int)
+    for obj in session.new:
+        if isinstance(obj, Hubfile) and obj.blob_id:
+            deltas[obj.blob_id] += 1
+    for obj in session.deleted:
+        if isinstance(obj, Hubfile) and obj.blob_id:
+            deltas[obj.blob_id] -= 1
+    for obj in session.dirty:
+        if isinstance(obj, Hubfile):
+            history = inspect(obj).attrs.blob_id.history
+            for blob_id in history.added or ():
+                if blob_id:
+                    deltas[blob_id] += 1
+            for blob_id in history.deleted or ():
+                if blob_id:
+                    deltas[blob_id] -= 1
+
+    blobs = Blob.__table__
+    for blob_id, delta in deltas.items():
+        if delta:
+            session.connection().execute(
+                blobs.update().where(blobs.c.id == blob_id).values(ref_count=blobs.c.ref_count + delta)
+            )
+
+
 class HubfileViewRecord(db.Model):
     __tablename__ = "file_view_record"
     id = db.Column(db.Integer, primary_key=True)
@@ -1,10 +1,16 @@
-from sqlalchemy import func
+import threading
+from array import array
+from collections import OrderedDict
+from datetime import datetime
+from typing import BinaryIO, Dict, Iterable, List, Optional, Tuple
 
-from app import db
+from sqlalchemy import func, select
+
+from app import db, record_buffer
 from app.modules.auth.models import User
-from app.modules.dataset.models import DataSet
+from app.modules.dataset.models import BaseDataSet, DataSet, insert_missing
 from app.modules.filemodel.models import FileModel
-from app.modules.hubfile.models import Hubfile, HubfileDownloadRecord, HubfileViewRecord
+from app.modules.hubfile.models import Blob, Hubfile, HubfileDownloadRecord, HubfileViewRecord, dataset_storage_path
 from core.repositories.BaseRepository import BaseRepository
 
 
@@ -20,6 +26,165 @@ class HubfileRepository(BaseRepository):
     def get_dataset_by_hubfile(self, hubfile: Hubfile) -> DataSet:
         return db.session.query(DataSet).join(FileModel).join(Hubfile).filter(Hubfile.id == hubfile.id).first()
 
+    def get_storage_paths(self, hubfiles: Iterable[Hubfile]) -> Dict[int, str]:
+        """
+        Returns the storage path of each file, relative to the uploads folder. Files created before
+        storage_path existed are resolved with a single query for all of them.
+        """
+        paths, missing = {}, {}
+        for hubfile in hubfiles:
+            if hubfile.storage_path:
+                paths[hubfile.id] = hubfile.storage_path
+            else:
+                missing[hubfile.id] = hubfile.name
+        if missing:
+            # plain table columns, so the polymorphic dataset subclasses are not joined in
+            data_set = BaseDataSet.__table__
+            rows = (
+                db.session.query(Hubfile.id, data_set.c.user_id, data_set.c.id)
+                .join(FileModel, FileModel.id == Hubfile.file_model_id)
+                .join(data_set, data_set.c.id == FileModel.data_set_id)
+                .filter(Hubfile.id.in_(list(missing)))
+            )
+            for hubfile_id, user_id, dataset_id in rows:
+                paths[hubfile_id] = dataset_storage_path(user_id, dataset_id, missing[hubfile_id])
+        return paths
+
+
+class BlobRepository(BaseRepository):
+    def __init__(self):
+        super().__init__(Blob)
+
+    def get_by_sha256(self, sha256: str) -> Optional[Blob]:
+        return self.session.query(Blob).filter(Blob.sha256 == sha256).first()
+
+    def get_or_create(self, sha256: str, size: int) -> Blob:
+        return self.get_or_create_many({sha256: size})[sha256]
+
+    def get_or_create_many(self, sizes: Dict[str, int]) -> Dict[str, Blob]:
+        """
+        Returns the blob of each sha256 in ``sizes``, adding the missing ones. The rows are upserted in a
+        single statement, so concurrent inserts of the same content are reused, and read back with a single
+        locking read: a plain SELECT would use the transaction snapshot and miss rows committed after it.
+        The lock also keeps the garbage collector off the blobs until the transaction that references them
+        commits.
+        """
+        if not sizes:
+            return {}
+        rows = [{"sha256": sha256, "size": size} for sha256, size in sorted(sizes.items())]
+        insert_missing(self.session.connection(), Blob.__table__, "sha256", rows)
+        blobs = self.session.scalars(
+            select(Blob)
+            .where(Blob.sha256.in_(list(sizes)))
+            .order_by(Blob.sha256)
+            .with_for_update()
+            .execution_options(populate_existing=True)
+        )
+        return {blob.sha256: blob for blob in blobs}
+
+    def lock_unreferenced(self, created_before: datetime) -> List[Blob]:
+        """Returns the unreferenced blobs created before ``created_before``, locked until the transaction ends."""
+        return (
+            self.session.query(Blob)
+            .filter(Blob.ref_count <= 0, Blob.created_at < created_before)
+            .with_for_update()
+            .populate_existing()
+            .all()
+        )
+
+    def delete_unreferenced(self, blob_ids: Iterable[int]) -> int:
+        """Deletes the given blobs that are still unreferenced. Returns how many."""
+        blob_ids = list(blob_ids)
+        if not blob_ids:
+            return 0
+        return (
+            self.session.query(Blob)
+            .filter(Blob.id.in_(blob_ids), Blob.ref_count <= 0)
+            .delete(synchronize_session=False)
+        )
+
+
+class LineIndex:
+    """
+    Byte offset of every ``stride``-th line of a file, so a window of lines is read by seeking to the
+    nearest indexed line and skipping at most ``stride - 1`` lines, instead of reading from the start.
+    """
+
+    STRIDE = 128
+    BLOCK_SIZE = 1024 * 1024
+
+    def __init__(self, offsets: array, total_lines: int, size: int, stride: int):
+        self.offsets = offsets
+        self.total_lines = total_lines
+        self.size = size
+        self.stride = stride
+
+    @classmethod
+    def build(cls, fh: BinaryIO, stride=None) -> "LineIndex":
+        """Builds the index in one pass over ``fh``, holding one block of the file in memory at a time."""
+        stride = stride or cls.STRIDE
+        offsets = array("Q", [0])
+        lines, position, last = 0, 0, b""
+        while True:
+            block = fh.read(cls.BLOCK_SIZE)
+            if not block:
+                break
+            newline = block.find(b"\n")
+            while newline != -1:
+                lines += 1
+                if lines % stride == 0:
+                    offsets.append(position + newline + 1)
+                newline = block.find(b"\n", newline + 1)
+            position += len(block)
+            last = block[-1:]
+        # a last line without a trailing newline is still a line
+        if position and last != b"\n":
+            lines += 1
+        return cls(offsets, lines, position, stride)
+
+    def seek(self, fh: BinaryIO, line: int):
+        """Positions ``fh`` at the start of ``line``."""
+        fh.seek(self.offsets[line // self.stride])
+        for _ in range(line % self.stride):
+            # in bounded reads, so a very long line is never held in memory whole
+            chunk = fh.readline(self.BLOCK_SIZE)
+            while chunk and not chunk.endswith(b"\n"):
+                chunk = fh.readline(self.BLOCK_SIZE)
+
+
+class LineIndexCache:
+    """Line indexes of the most recently viewed files, keyed by checksum and size."""
+
+    MAX_ENTRIES = 256
+
+    def __init__(self, max_entries=None):
+        self.max_entries = max_entries or self.MAX_ENTRIES
+        self._lock = threading.Lock()
+        self._indexes: "OrderedDict[Tuple[str, int], LineIndex]" = OrderedDict()
+
+    def get(self, checksum: str, size: int, fh: BinaryIO) -> LineIndex:
+        key = (checksum, size)
+        with self._lock:
+            index = self._indexes.get(key)
+            if index is not None:
+                self._indexes.move_to_end(key)
+                return index
+
+        # built outside the lock; two requests for a new file may both build it, the last one wins
+        index = LineIndex.build(fh)
+        with self._lock:
+            self._indexes[key] = index
+            while len(self._indexes) > self.max_entries:
+                self._indexes.popitem(last=False)
+        return index
+
+    def clear(self):
+        with self._lock:
+            self._indexes.clear()
+
+
+line_index_cache = LineIndexCache()
+
 
 class HubfileViewRecordRepository(BaseRepository):
     def __init__(self):
@@ -29,6 +194,16 @@ class HubfileViewRecordRepository(BaseRepository):
         max_id = self.model.query.with_entities(func.max(self.model.id)).scalar()
         return max_id if max_id is not None else 0
 
+    def enqueue(self, user_id: Optional[int], file_id: int, view_date: datetime, view_cookie: str):
+        record_buffer.add(
+            self.model,
+            dedup_on=("user_id", "file_id", "view_cookie"),
+            user_id=user_id,
+            file_id=file_id,
+            view_date=view_date,
+            view_cookie=view_cookie,
+        )
+
 
 class HubfileDownloadRecordRepository(BaseRepository):
     def __init__(self):
@@ -37,3 +212,13 @@ class HubfileDownloadRecordRepository(BaseRepository):
     def total_hubfile_downloads(self) -> int:
         max_id = self.model.query.with_entities(func.max(self.model.id)).scalar()
         return max_id if max_id is not None else 0
+
+    def enqueue(self, user_id: Optional[int], file_id: int, download_date: datetime, download_cookie: str):
+        record_buffer.add(
+            self.model,
+            dedup_on=("user_id", "file_id", "download_cookie"),
+            user_id=user_id,
+            file_id=file_id,
+            download_date=download_date,
+            download_cookie=download_cookie,
+        )
@@ -2,45 +2,41 @@ import os
 import uuid
 from datetime import datetime, timezone
 
-from flask import current_app, jsonify, make_response, request, send_from_directory
+from flask import abort, jsonify, make_response, request, send_file
 from flask_login import current_user
 
-from app import db
 from app.modules.hubfile import hubfile_bp
-from app.modules.hubfile.models import HubfileDownloadRecord, HubfileViewRecord
-from app.modules.hubfile.services import HubfileDownloadRecordService, HubfileService
+from app.modules.hubfile.services import (
+    HubfileDownloadRecordService,
+    HubfileService,
+    HubfileViewRecordService,
+)
 
 
 @hubfile_bp.route("/file/download/<int:file_id>", methods=["GET"])
 def download_file(file_id):
-    file = HubfileService().get_or_404(file_id)
-    filename = file.name
-
-    directory_path = f"uploads/user_{file.file_model.data_set.user_id}/dataset_{file.file_model.data_set_id}/"
-    parent_directory_path = os.path.dirname(current_app.root_path)
-    file_path = os.path.join(parent_directory_path, directory_path)
+    service = HubfileService()
+    file = service.get_or_404(file_id)
+    if not service.exists(file):
+        abort(404)
 
     # Get the cookie from the request or generate a new one if it does not exist
     user_cookie = request.cookies.get("file_download_cookie")
     if not user_cookie:
         user_cookie = str(uuid.uuid4())
 
-    # Check if the download record already exists for this cookie
-    existing_record = HubfileDownloadRecord.query.filter_by(
-        user_id=current_user.id if current_user.is_authenticated else None, file_id=file_id, download_cookie=user_cookie
-    ).first()
-
-    if not existing_record:
-        # Record the download in your database
-        HubfileDownloadRecordService().create(
-            user_id=current_user.id if current_user.is_authenticated else None,
-            file_id=file_id,
-            download_date=datetime.now(timezone.utc),
-            download_cookie=user_cookie,
-        )
-
-    # Save the cookie to the user's browser
-    resp = make_response(send_from_directory(directory=file_path, path=filename, as_attachment=True))
+    # Record the download, once per cookie (written in batches, off the request path)
+    HubfileDownloadRecordService().enqueue(
+        user_id=current_user.id if current_user.is_authenticated else None,
+        file_id=file_id,
+        download_date=datetime.now(timezone.utc),
+        download_cookie=user_cookie,
+    )
+
+    # Served from the local disk when the storage backend is local, streamed from the backend otherwise
+    file_path = file.get_path()
+    source = os.path.abspath(file_path) if file_path else service.open(file)
+    resp = make_response(send_file(source, download_name=file.name, as_attachment=True))
     resp.set_cookie("file_download_cookie", user_cookie)
 
     return resp
@@ -48,42 +44,42 @@ def download_file(file_id):
 
 @hubfile_bp.route("/file/view/<int:file_id>", methods=["GET"])
 def view_file(file_id):
-    file = HubfileService().get_or_404(file_id)
-    filename = file.name
-
-    directory_path = f"uploads/user_{file.file_model.data_set.user_id}/dataset_{file.file_model.data_set_id}/"
-    parent_directory_path = os.path.dirname(current_app.root_path)
-    file_path = os.path.join(parent_directory_path, directory_path, filename)
+    """
+    Returns one page of the file: lines ``start`` to ``start + lines`` by default, or, when ``offset`` is
+    given, ``length`` bytes from that offset. Pages are bounded in size, so large files are read in windows.
+    """
+    service = HubfileService()
+    file = service.get_or_404(file_id)
 
     try:
-        if os.path.exists(file_path):
-            with open(file_path, "r") as f:
-                content = f.read()
+        if service.exists(file):
+            if "offset" in request.args:
+                page = service.read_bytes(
+                    file,
+                    offset=request.args.get("offset", 0, type=int),
+                    length=request.args.get("length", None, type=int),
+                )
+            else:
+                page = service.read_lines(
+                    file,
+                    start=request.args.get("start", 0, type=int),
+                    count=request.args.get("lines", None, type=int),
+                )
 
             user_cookie = request.cookies.get("view_cookie")
             if not user_cookie:
                 user_cookie = str(uuid.uuid4())
 
-            # Check if the view record already exists for this cookie
-            existing_record = HubfileViewRecord.query.filter_by(
+            # Register file view, once per cookie (written in batches, off the request path)
+            HubfileViewRecordService().enqueue(
                 user_id=current_user.id if current_user.is_authenticated else None,
                 file_id=file_id,
+                view_date=datetime.now(),
                 view_cookie=user_cookie,
-            ).first()
-
-            if not existing_record:
-                # Register file view
-                new_view_record = HubfileViewRecord(
-                    user_id=current_user.id if current_user.is_authenticated else None,
-                    file_id=file_id,
-                    view_date=datetime.now(),
-                    view_cookie=user_cookie,
-                )
-                db.session.add(new_view_record)
-                db.session.commit()
+            )
 
             # Prepare response
-            response = jsonify({"success": True, "content": content})
+            response = jsonify({"success": True, **page})
             if not request.cookies.get("view_cookie"):
                 response = make_response(response)
                 response.set_cookie("view_cookie", user_cookie, max_age=60 * 60 * 24 * 365 * 2)
@@ -1,21 +1,37 @@
+import hashlib
+import io
+import logging
 import os
+from datetime import datetime, timedelta, timezone
+from typing import BinaryIO, Dict, Iterable, Optional, Tuple
 
+from app import file_storage
 from app.modules.auth.models import User
 from app.modules.dataset.models import DataSet
-from app.modules.hubfile.models import Hubfile
+from app.modules.hubfile.models import Blob, Hubfile
 from app.modules.hubfile.repositories import (
+    BlobRepository,
     HubfileDownloadRecordRepository,
     HubfileRepository,
     HubfileViewRecordRepository,
+    line_index_cache,
 )
 from core.services.BaseService import BaseService
 
+logger = logging.getLogger(__name__)
+
 
 class HubfileService(BaseService):
-    def __init__(self):
+    PAGE_LINES = 500
+    MAX_PAGE_LINES = 5000
+    MAX_PAGE_BYTES = 1024 * 1024
+
+    def __init__(self, line_indexes=None, storage=None):
         super().__init__(HubfileRepository())
         self.hubfile_view_record_repository = HubfileViewRecordRepository()
         self.hubfile_download_record_repository = HubfileDownloadRecordRepository()
+        self.line_indexes = line_indexes or line_index_cache
+        self.storage = storage or file_storage
 
     def get_owner_user_by_hubfile(self, hubfile: Hubfile) -> User:
         return self.repository.get_owner_user_by_hubfile(hubfile)
@@ -23,17 +39,85 @@ class HubfileService(BaseService):
     def get_dataset_by_hubfile(self, hubfile: Hubfile) -> DataSet:
         return self.repository.get_dataset_by_hubfile(hubfile)
 
-    def get_path_by_hubfile(self, hubfile: Hubfile) -> str:
+    def get_storage_keys(self, hubfiles: Iterable[Hubfile]) -> Dict[int, str]:
+        """Returns the storage key of each file, with at most one query for all of them."""
+        return self.repository.get_storage_paths(hubfiles)
+
+    def get_path_by_hubfile(self, hubfile: Hubfile) -> Optional[str]:
+        return self.get_paths([hubfile])[hubfile.id]
+
+    def get_paths(self, hubfiles: Iterable[Hubfile]) -> Dict[int, Optional[str]]:
+        """Returns the local path of each file, or None for the files of a non-local storage backend."""
+        return {hubfile_id: self.storage.local_path(key) for hubfile_id, key in self.get_storage_keys(hubfiles).items()}
+
+    def open(self, hubfile: Hubfile) -> BinaryIO:
+        return self.storage.open(hubfile.get_storage_key())
 
-        hubfile_user = self.get_owner_user_by_hubfile(hubfile)
-        hubfile_dataset = self.get_dataset_by_hubfile(hubfile)
-        working_dir = os.getenv("WORKING_DIR")
+    def exists(self, hubfile: Hubfile) -> bool:
+        return self.storage.exists(hubfile.get_storage_key())
 
-        path = os.path.join(
-            working_dir, "uploads", f"user_{hubfile_user.id}", f"dataset_{hubfile_dataset.id}", hubfile.name
-        )
+    def read_lines(self, hubfile: Hubfile, start: int = 0, count: int = None) -> dict:
+        """
+        Returns up to ``count`` whole lines of the file from line ``start``, and never more than
+        MAX_PAGE_BYTES of them: the page stops before a line that does not fit. Only when the first line
+        alone is longer is it cut; the page is then marked as truncated, and ``next_offset`` is the byte
+        offset the rest of the file is read from with ``read_bytes``.
+        """
+        count = min(max(count or self.PAGE_LINES, 1), self.MAX_PAGE_LINES)
+        with self.open(hubfile) as fh:
+            size = fh.seek(0, io.SEEK_END)
+            fh.seek(0)
+            index = self.line_indexes.get(hubfile.checksum, size, fh)
+            start = min(max(start, 0), index.total_lines)
+            index.seek(fh, start)
 
-        return path
+            lines, used, next_offset = [], 0, None
+            while len(lines) < count and used < self.MAX_PAGE_BYTES:
+                line = fh.readline(self.MAX_PAGE_BYTES - used)
+                if not line:
+                    break
+                position = fh.tell()
+                if not line.endswith(b"\n") and position < index.size:
+                    # the line does not fit in what is left of the page
+                    if not lines:
+                        lines.append(line)
+                        next_offset = position
+                    break
+                lines.append(line)
+                used += len(line)
+
+        truncated = next_offset is not None
+        end = start if truncated else start + len(lines)
+        page = {
+            "content": b"".join(lines).decode("utf-8", errors="replace"),
+            "start": start,
+            "end": end,
+            "total_lines": index.total_lines,
+            "size": index.size,
+            "has_more": truncated or end < index.total_lines,
+            "truncated": truncated,
+        }
+        if truncated:
+            page["next_offset"] = next_offset
+        return page
+
+    def read_bytes(self, hubfile: Hubfile, offset: int = 0, length: int = None) -> dict:
+        """Returns up to MAX_PAGE_BYTES bytes of the file from ``offset``."""
+        length = min(max(length or self.MAX_PAGE_BYTES, 1), self.MAX_PAGE_BYTES)
+        with self.open(hubfile) as fh:
+            size = fh.seek(0, io.SEEK_END)
+            offset = min(max(offset, 0), size)
+            fh.seek(offset)
+            data = fh.read(length)
+
+        end = offset + len(data)
+        return {
+            "content": data.decode("utf-8", errors="replace"),
+            "offset": offset,
+            "end": end,
+            "size": size,
+            "has_more": end < size,
+        }
 
     def total_hubfile_views(self) -> int:
         return self.hubfile_view_record_repository.total_hubfile_views()
@@ -46,3 +130,85 @@ class HubfileService(BaseService):
 class HubfileDownloadRecordService(BaseService):
     def __init__(self):
         super().__init__(HubfileDownloadRecordRepository())
+
+    def enqueue(self, **kwargs):
+        return self.repository.enqueue(**kwargs)
+
+
+class HubfileViewRecordService(BaseService):
+    def __init__(self):
+        super().__init__(HubfileViewRecordRepository())
+
+    def enqueue(self, **kwargs):
+        return self.repository.enqueue(**kwargs)
+
+
+class BlobService(BaseService):
+    """
+    Content-addressable store of the uploaded files: each distinct content is kept once in the storage
+    backend, under ``blobs/`` sharded by its hash, and the Hubfile rows of every dataset that contains it
+    point at the same blob.
+    """
+
+    BLOCK_SIZE = 1024 * 1024
+    # blobs younger than this are never collected, whatever their ref_count
+    GC_GRACE_PERIOD = timedelta(hours=1)
+
+    def __init__(self, storage=None):
+        super().__init__(BlobRepository())
+        self.storage = storage or file_storage
+
+    @classmethod
+    def hash_file(cls, path: str) -> Tuple[str, int]:
+        """Returns the sha256 and size of the file, reading it one block at a time."""
+        digest, size = hashlib.sha256(), 0
+        with open(path, "rb") as fh:
+            for block in iter(lambda: fh.read(cls.BLOCK_SIZE), b""):
+                digest.update(block)
+                size += len(block)
+        return digest.hexdigest(), size
+
+    def get_or_create(self, sha256: str, size: int) -> Blob:
+        return self.repository.get_or_create(sha256, size)
+
+    def get_or_create_many(self, sizes: Dict[str, int]) -> Dict[str, Blob]:
+        return self.repository.get_or_create_many(sizes)
+
+    def ingest(self, source_path: str, blob: Blob, move: bool = True):
+        """
+        Puts the content of ``source_path`` in the store as ``blob``. Content that is already stored is not
+        written again; with ``move`` the source file is consumed either way.
+        """
+        key = blob.get_storage_path()
+        if self.storage.exists(key):
+            if move:
+                os.remove(source_path)
+            return
+        self.storage.save(source_path, key, move=move)
+
+    def collect_garbage(self, grace_period: timedelta = None) -> int:
+        """
+        Deletes the blobs no Hubfile points at any more and that are older than ``grace_period``, and
+        their content. Returns how many.
+
+        The blobs are locked while their content is removed, and the rows are deleted last and only if
+        still unreferenced: an upload of the same content waits on the lock, then adds a new row and
+        stores the content again instead of trusting content that is about to go.
+        """
+        grace_period = self.GC_GRACE_PERIOD if grace_period is None else grace_period
+        created_before = datetime.now(timezone.utc).replace(tzinfo=None) - grace_period
+        try:
+            removed = []
+            for blob in self.repository.lock_unreferenced(created_before):
+                try:
+                    self.storage.delete(blob.get_storage_path())
+                except Exception as exc:
+                    logger.warning(f"Could not remove blob {blob.sha256}: {exc}")
+                    continue
+                removed.append(blob.id)
+            collected = self.repository.delete_unreferenced(removed)
+            self.repository.session.commit()
+        except Exception:
+            self.repository.session.rollback()
+            raise
+        return collected
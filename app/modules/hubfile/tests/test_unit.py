@@ -1,4 +1,24 @@
+import io
+import os
+from datetime import datetime, timedelta
+from unittest.mock import MagicMock
+
 import pytest
+from flask import Flask
+from sqlalchemy import event
+
+from app import db, file_storage
+from app.modules.dataset.models import BaseDataSet
+from app.modules.filemodel.models import FileModel
+from app.modules.hubfile.models import Blob, Hubfile, blob_storage_path
+from app.modules.hubfile.repositories import LineIndex, LineIndexCache
+from app.modules.hubfile.services import BlobService, HubfileService
+from core.storage.file_storage import (
+    FileStorage,
+    LocalStorage,
+    S3Storage,
+    StorageBackend,
+)
 
 
 @pytest.fixture(scope="module")
@@ -22,3 +42,351 @@ def test_sample_assertion(test_client):
     """
     greeting = "Hello, World!"
     assert greeting == "Hello, World!", "The greeting does not coincide with 'Hello, World!'"
+
+
+@pytest.fixture
+def sqlite_app():
+    app = Flask(__name__)
+    app.config["SQLALCHEMY_DATABASE_URI"] = "sqlite://"
+    db.init_app(app)
+
+    with app.app_context():
+        for model in (BaseDataSet, FileModel, Blob, Hubfile):
+            model.__table__.create(db.engine)
+        db.session.execute(
+            BaseDataSet.__table__.insert(),
+            [{"id": 1, "user_id": 7, "ds_meta_data_id": 1, "created_at": datetime(2025, 1, 1), "type": "pix"}],
+        )
+        db.session.execute(FileModel.__table__.insert(), [{"id": 1, "data_set_id": 1}])
+        yield app
+        db.session.remove()
+
+
+def test_storage_paths_are_resolved_without_queries(sqlite_app, monkeypatch):
+    monkeypatch.setenv("WORKING_DIR", "/srv/pixelhub")
+    files = [
+        Hubfile(
+            id=i, name=f"f{i}.pix", checksum="x", size=1, file_model_id=1, storage_path=f"user_7/dataset_1/f{i}.pix"
+        )
+        for i in (1, 2)
+    ]
+    db.session.add_all(files)
+    db.session.commit()
+    for file in files:
+        db.session.refresh(file)
+
+    statements = []
+    event.listen(db.engine, "before_cursor_execute", lambda *args: statements.append(args[2]))
+
+    assert files[0].get_path() == "/srv/pixelhub/uploads/user_7/dataset_1/f1.pix"
+    assert HubfileService().get_paths(files) == {
+        1: "/srv/pixelhub/uploads/user_7/dataset_1/f1.pix",
+        2: "/srv/pixelhub/uploads/user_7/dataset_1/f2.pix",
+    }
+    assert statements == []
+
+
+def test_storage_paths_of_older_files_are_resolved_in_one_query(sqlite_app, monkeypatch):
+    monkeypatch.setenv("WORKING_DIR", "/srv/pixelhub")
+    files = [Hubfile(id=i, name=f"f{i}.pix", checksum="x", size=1, file_model_id=1) for i in (1, 2, 3)]
+    db.session.add_all(files)
+    db.session.commit()
+    for file in files:
+        db.session.refresh(file)
+
+    statements = []
+    event.listen(db.engine, "before_cursor_execute", lambda *args: statements.append(args[2]))
+
+    paths = HubfileService().get_paths(files)
+
+    assert paths[3] == "/srv/pixelhub/uploads/user_7/dataset_1/f3.pix"
+    assert len(paths) == 3
+    assert len(statements) == 1
+
+
+def write_lines(path, count):
+    path.write_bytes(b"".join(f"line {i}\n".encode() for i in range(count)))
+    return path
+
+
+def test_line_index_seeks_to_any_line(tmp_path):
+    path = write_lines(tmp_path / "model.pix", 1000)
+
+    with open(path, "rb") as fh:
+        index = LineIndex.build(fh, stride=16)
+        assert index.total_lines == 1000
+        assert len(index.offsets) == 1000 // 16 + 1
+        for line in (0, 15, 16, 17, 999):
+            index.seek(fh, line)
+            assert fh.readline() == f"line {line}\n".encode()
+
+
+def test_line_index_counts_last_line_without_newline(tmp_path):
+    path = tmp_path / "model.pix"
+    path.write_bytes(b"a\nb\nc")
+
+    with open(path, "rb") as fh:
+        assert LineIndex.build(fh).total_lines == 3
+
+
+def test_line_index_cache_builds_once_per_checksum(tmp_path, monkeypatch):
+    path = write_lines(tmp_path / "model.pix", 10)
+    cache = LineIndexCache(max_entries=1)
+    builds = []
+    build = LineIndex.build
+    monkeypatch.setattr(LineIndex, "build", classmethod(lambda cls, fh: builds.append(1) or build(fh)))
+
+    with open(path, "rb") as fh:
+        first = cache.get("abc", 60, fh)
+        assert cache.get("abc", 60, fh) is first
+        cache.get("def", 60, fh)
+        assert cache.get("abc", 60, fh) is not first
+
+    assert len(builds) == 3
+
+
+def test_read_lines_returns_pages(tmp_path):
+    write_lines(tmp_path / "model.pix", 1200)
+    hubfile = MagicMock(checksum="abc", get_storage_key=MagicMock(return_value="model.pix"))
+    service = HubfileService(line_indexes=LineIndexCache(), storage=LocalStorage(str(tmp_path)))
+
+    page = service.read_lines(hubfile, start=500, count=3)
+
+    assert page["content"] == "line 500\nline 501\nline 502\n"
+    assert (page["start"], page["end"], page["total_lines"]) == (500, 503, 1200)
+    assert page["has_more"] and not page["truncated"]
+
+    last = service.read_lines(hubfile, start=1190)
+    assert last["end"] == 1200 and not last["has_more"]
+
+
+def test_read_lines_bounds_page_size(tmp_path, monkeypatch):
+    path = tmp_path / "model.pix"
+    path.write_bytes(b"x" * 100 + b"\nshort\n")
+    hubfile = MagicMock(checksum="abc", get_storage_key=MagicMock(return_value="model.pix"))
+    service = HubfileService(line_indexes=LineIndexCache(), storage=LocalStorage(str(tmp_path)))
+    monkeypatch.setattr(HubfileService, "MAX_PAGE_BYTES", 10)
+
+    page = service.read_lines(hubfile)
+
+    # only a first line longer than the page is cut, and the rest of it is read from next_offset
+    assert page["content"] == "x" * 10
+    assert page["truncated"] and page["has_more"] and page["end"] == 0 and page["next_offset"] == 10
+    rest = service.read_bytes(hubfile, offset=page["next_offset"])
+    assert (rest["content"], rest["offset"], rest["end"]) == ("x" * 10, 10, 20)
+
+
+def test_read_lines_pages_never_lose_content(tmp_path, monkeypatch):
+    path = tmp_path / "model.pix"
+    path.write_bytes(b"".join(f"{i:03d}".encode() * 10 + b"\n" for i in range(60)))
+    hubfile = MagicMock(checksum="abc", get_storage_key=MagicMock(return_value="model.pix"))
+    service = HubfileService(line_indexes=LineIndexCache(), storage=LocalStorage(str(tmp_path)))
+    monkeypatch.setattr(HubfileService, "MAX_PAGE_BYTES", 100)
+
+    content, start = "", 0
+    while True:
+        page = service.read_lines(hubfile, start=start, count=50)
+        # a page stops before the line that does not fit instead of cutting it
+        assert not page["truncated"] and page["content"].endswith("\n")
+        content += page["content"]
+        if not page["has_more"]:
+            break
+        start = page["end"]
+
+    assert content == path.read_text()
+
+
+def test_line_index_skips_long_lines_in_bounded_reads(tmp_path, monkeypatch):
+    path = tmp_path / "model.pix"
+    path.write_bytes(b"x" * 5000 + b"\nlast\n")
+    monkeypatch.setattr(LineIndex, "BLOCK_SIZE", 64)
+
+    with open(path, "rb") as fh:
+        index = LineIndex.build(fh)
+        reads = []
+        readline = fh.readline
+        fh = MagicMock(seek=fh.seek, readline=lambda limit=-1: reads.append(limit) or readline(limit))
+        index.seek(fh, 1)
+        assert readline() == b"last\n"
+
+    assert reads and all(0 < limit <= 64 for limit in reads)
+
+
+def test_read_bytes_returns_range(tmp_path):
+    path = tmp_path / "model.pix"
+    path.write_bytes(b"0123456789")
+    hubfile = MagicMock(get_storage_key=MagicMock(return_value="model.pix"))
+
+    page = HubfileService(storage=LocalStorage(str(tmp_path))).read_bytes(hubfile, offset=4, length=3)
+
+    assert page == {"content": "456", "offset": 4, "end": 7, "size": 10, "has_more": True}
+
+
+def test_blob_store_keeps_one_copy_of_each_content(sqlite_app, tmp_path, monkeypatch):
+    monkeypatch.setenv("WORKING_DIR", str(tmp_path))
+    first, second = tmp_path / "first.pix", tmp_path / "second.pix"
+    first.write_bytes(b"same content")
+    second.write_bytes(b"same content")
+    service = BlobService()
+
+    sha256, size = BlobService.hash_file(str(first))
+    blob = service.get_or_create(sha256, size)
+    service.ingest(str(first), blob)
+    assert service.get_or_create(*BlobService.hash_file(str(second))) is blob
+    service.ingest(str(second), blob)
+
+    assert (size, blob.get_storage_path()) == (12, blob_storage_path(sha256))
+    path = file_storage.local_path(blob.get_storage_path())
+    assert open(path, "rb").read() == b"same content"
+    assert not first.exists() and not second.exists()
+    assert os.listdir(os.path.dirname(path)) == [sha256]
+
+
+def test_blob_committed_by_another_transaction_is_reused(sqlite_app):
+    # as if a concurrent upload had inserted it after this transaction read the table
+    db.session.execute(Blob.__table__.insert().values(sha256="a" * 64, size=3, ref_count=0, created_at=datetime.now()))
+
+    blob = BlobService().get_or_create("a" * 64, 3)
+
+    assert blob.id is not None and Blob.query.count() == 1
+
+
+def test_blobs_are_upserted_in_one_statement_and_read_back_in_another(sqlite_app):
+    db.session.execute(Blob.__table__.insert().values(sha256="a" * 64, size=3, ref_count=0, created_at=datetime.now()))
+    statements = []
+    event.listen(db.engine, "before_cursor_execute", lambda *args: statements.append(args[2]))
+
+    blobs = BlobService().get_or_create_many({"a" * 64: 3, "b" * 64: 4, "c" * 64: 5})
+
+    assert sorted(blobs) == ["a" * 64, "b" * 64, "c" * 64] and all(blob.id for blob in blobs.values())
+    assert len(statements) == 2 and Blob.query.count() == 3
+
+
+def test_blob_references_are_counted_and_collected(sqlite_app, tmp_path, monkeypatch):
+    monkeypatch.setenv("WORKING_DIR", str(tmp_path))
+    source = tmp_path / "model.pix"
+    source.write_bytes(b"content")
+    service = BlobService()
+    blob = service.get_or_create(*BlobService.hash_file(str(source)))
+    service.ingest(str(source), blob)
+
+    original = Hubfile(
+        name="a.pix", checksum="x", size=7, file_model_id=1, storage_path=blob.get_storage_path(), blob=blob
+    )
+    db.session.add(original)
+    db.session.commit()
+    # a clone, as built for a cart dataset, shares the blob
+    clone = Hubfile(name="a.pix", checksum="x", size=7, file_model_id=1, storage_path=original.storage_path)
+    clone.blob_id = original.blob_id
+    db.session.add(clone)
+    db.session.commit()
+    assert blob.ref_count == 2
+
+    db.session.delete(original)
+    db.session.commit()
+    assert blob.ref_count == 1
+    assert service.collect_garbage(grace_period=timedelta(0)) == 0
+
+    db.session.delete(clone)
+    db.session.commit()
+    assert blob.ref_count == 0
+    path = file_storage.local_path(blob.get_storage_path())
+    # recent blobs are left for an upload that may be about to reference them
+    assert service.collect_garbage() == 0 and os.path.exists(path)
+    assert service.collect_garbage(grace_period=timedelta(0)) == 1
+    assert not os.path.exists(path)
+    assert Blob.query.count() == 0
+
+
+class FakeS3Client:
+    """In-memory stand-in for the boto3 S3 client calls the storage backend makes."""
+
+    class NotFound(Exception):
+        response = {"Error": {"Code": "404"}}
+
+    def __init__(self):
+        self.objects = {}
+        self.ranges = []
+
+    def _get(self, Bucket, Key):
+        if (Bucket, Key) not in self.objects:
+            raise self.NotFound(Key)
+        return self.objects[(Bucket, Key)]
+
+    def upload_file(self, Filename, Bucket, Key):
+        with open(Filename, "rb") as fh:
+            self.objects[(Bucket, Key)] = fh.read()
+
+    def head_object(self, Bucket, Key):
+        return {"ContentLength": len(self._get(Bucket, Key))}
+
+    def get_object(self, Bucket, Key, Range):
+        start, end = (int(value) for value in Range[len("bytes=") :].split("-"))
+        self.ranges.append((start, end))
+        return {"Body": io.BytesIO(self._get(Bucket, Key)[start : end + 1])}
+
+    def delete_object(self, Bucket, Key):
+        self.objects.pop((Bucket, Key), None)
+
+
+def test_s3_storage_saves_reads_and_deletes(tmp_path):
+    client = FakeS3Client()
+    storage = S3Storage("pixelhub", prefix="uploads/", client=client)
+    source = write_lines(tmp_path / "model.pix", 300)
+    content = source.read_bytes()
+
+    storage.save(str(source), "blobs/ab/cd/abcd", move=True)
+
+    assert not source.exists()
+    assert list(client.objects) == [("pixelhub", "uploads/blobs/ab/cd/abcd")]
+    assert storage.exists("blobs/ab/cd/abcd") and not storage.exists("blobs/ab/cd/other")
+    assert storage.size("blobs/ab/cd/abcd") == len(content)
+    assert storage.local_path("blobs/ab/cd/abcd") is None
+    with storage.open("blobs/ab/cd/abcd") as fh:
+        assert fh.read() == content
+
+    storage.delete("blobs/ab/cd/abcd")
+    assert not storage.exists("blobs/ab/cd/abcd")
+    with pytest.raises(FileNotFoundError):
+        storage.open("blobs/ab/cd/abcd")
+
+
+def test_file_pages_are_read_from_s3_with_ranged_requests(tmp_path):
+    client = FakeS3Client()
+    storage = S3Storage("pixelhub", client=client)
+    storage.save(str(write_lines(tmp_path / "model.pix", 2000)), "blobs/model")
+    hubfile = MagicMock(checksum="abc", get_storage_key=MagicMock(return_value="blobs/model"))
+    service = HubfileService(line_indexes=LineIndexCache(), storage=storage)
+
+    page = service.read_lines(hubfile, start=1500, count=2)
+    assert page["content"] == "line 1500\nline 1501\n"
+    assert page["total_lines"] == 2000
+
+    client.ranges.clear()
+    assert service.read_bytes(hubfile, offset=5, length=1)["content"] == "0"
+    # a window is fetched with ranged GETs, never the whole object
+    assert all(end - start < S3Storage.READ_BUFFER_SIZE for start, end in client.ranges)
+
+
+def test_file_storage_backend_is_chosen_by_config():
+    assert isinstance(FileStorage.create_backend({}), LocalStorage)
+    backend = FileStorage.create_backend(
+        {"STORAGE_BACKEND": "s3", "STORAGE_S3_BUCKET": "pixelhub", "STORAGE_S3_ENDPOINT_URL": "http://minio:9000"}
+    )
+    assert isinstance(backend, S3Storage)
+    assert backend.bucket == "pixelhub"
+    assert backend._client_kwargs == {"endpoint_url": "http://minio:9000"}
+    with pytest.raises(ValueError):
+        FileStorage.create_backend({"STORAGE_BACKEND": "ftp"})
+
+
+def test_storage_backend_requires_every_method():
+    with pytest.raises(TypeError):
+        StorageBackend()
+
+    class PartialStorage(StorageBackend):
+        def open(self, key):
+            return io.BytesIO()
+
+    with pytest.raises(TypeError):
+        PartialStorage()
@@ -1,3 +1,7 @@
+import re
+from itertools import islice
+from typing import IO, Iterable, Iterator, List, Optional, Tuple
+
 from app.modules.pixchecker.repositories import PixcheckerRepository
 from core.services.BaseService import BaseService
 
@@ -5,3 +9,118 @@ from core.services.BaseService import BaseService
 class PixcheckerService(BaseService):
     def __init__(self):
         super().__init__(PixcheckerRepository())
+
+
+class PixValidator:
+    """Streaming validator of the PIX syntax:
+
+    element1{
+        attr1=val1
+        attr2=val2
+    }
+    element2{
+        ...
+    }
+
+    Lines are checked one at a time as they are read, so memory does not grow with the file, and
+    validation stops as soon as ``max_errors`` errors are found.
+    """
+
+    MAX_ERRORS = 100
+    # longer lines are reported and skipped instead of being read whole
+    MAX_LINE_LENGTH = 64 * 1024
+
+    # Allow either unquoted identifiers or quoted strings (single or double) which may include spaces.
+    # We capture the raw token and then "unquote" it so mixed or repeated quote combinations
+    # (e.g. '"name"' or '"name\'' ) are normalized by stripping surrounding quote pairs.
+    ELEMENT_HEADER_RE = re.compile(r"^\s*(?P<name>(?:\"[^\"]*\"|'[^']*'|[^\{\s][^\{]*?))\s*\{\s*$")
+    # For attributes: key can be quoted or unquoted, separator can be ':' or '=', value may be empty.
+    ATTR_RE = re.compile(
+        r"^\s*(?P<key>(?:\"[^\"]*\"|'[^']*'|[^:=\s][^:=\{]*?))" r"\s*(?P<sep>[:=])\s*(?P<value>.*?)\s*$"
+    )
+
+    def __init__(self, max_errors: Optional[int] = None):
+        if max_errors is not None and max_errors < 0:
+            raise ValueError("max_errors must not be negative")
+        self.max_errors = self.MAX_ERRORS if max_errors is None else max_errors
+
+    @staticmethod
+    def unquote_token(tok: str) -> str:
+        """Strip surrounding quote pairs (single or double) repeatedly.
+
+        Example: '"name"' -> name, "'foo'" -> foo
+        """
+        if tok is None:
+            return tok
+        s = tok.strip()
+        # strip matching or mixed surrounding quotes as long as both ends are quotes
+        while len(s) >= 2 and (s[0] in "'\"" and s[-1] in "'\""):
+            s = s[1:-1]
+        return s
+
+    def validate(self, lines: Iterable[str]) -> List[str]:
+        """Returns the first ``max_errors`` errors of ``lines``; an empty list means the model is valid."""
+        return list(islice(self.iter_errors(lines), self.max_errors))
+
+    def validate_file(self, fh: IO[str]) -> List[str]:
+        return self.validate(self.read_lines(fh))
+
+    def check(self, lines: Iterable[str]) -> Tuple[List[str], bool]:
+        """
+        Returns the first ``max_errors`` errors of ``lines`` and whether validation stopped before the end
+        of the file, which it only does once one more error than the limit is found.
+        """
+        errors = list(islice(self.iter_errors(lines), self.max_errors + 1))
+        return errors[: self.max_errors], len(errors) > self.max_errors
+
+    def check_file(self, fh: IO[str]) -> Tuple[List[str], bool]:
+        return self.check(self.read_lines(fh))
+
+    @classmethod
+    def read_lines(cls, fh: IO[str]) -> Iterator[Optional[str]]:
+        """Yields the lines of ``fh``, or None in place of a line longer than MAX_LINE_LENGTH."""
+        for line in iter(lambda: fh.readline(cls.MAX_LINE_LENGTH), ""):
+            if len(line) < cls.MAX_LINE_LENGTH or line.endswith("\n"):
+                yield line
+                continue
+            # skip the rest of the overlong line without keeping it
+            while line and not line.endswith("\n"):
+                line = fh.readline(cls.MAX_LINE_LENGTH)
+            yield None
+
+    def iter_errors(self, lines: Iterable[Optional[str]]) -> Iterator[str]:
+        state = "outside"  # or "inside"
+        current_element = None
+
+        for idx, raw in enumerate(lines, start=1):
+            if raw is None:
+                yield f"Line {idx}: Line longer than {self.MAX_LINE_LENGTH} characters"
+                continue
+            line = raw.rstrip("\n")
+            if state == "outside":
+                if line.strip() == "":
+                    continue
+                m = self.ELEMENT_HEADER_RE.match(line)
+                if m:
+                    current_element = self.unquote_token(m.group("name"))
+                    state = "inside"
+                else:
+                    yield f"Line {idx}: Expected element header like 'name{{' but got: {line!r}"
+            else:  # inside an element
+                stripped = line.strip()
+                if stripped == "":
+                    continue
+                if stripped == "}":
+                    current_element = None
+                    state = "outside"
+                    continue
+
+                # attribute line expected
+                if not self.ATTR_RE.match(line):
+                    if "{" in line:
+                        yield f"Line {idx}: Unexpected '{{' inside element {current_element!r}"
+                    else:
+                        yield f"Line {idx}: Invalid attribute format, expected 'key:val' or 'key=val', got: {line!r}"
+
+        if state == "inside":
+            yield f"Unexpected end of file: missing closing '}}' for element {current_element!r}"
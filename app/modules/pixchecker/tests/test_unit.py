@@ -1,3 +1,4 @@
+import io
 import os
 from unittest.mock import MagicMock, patch
 
@@ -5,6 +6,7 @@ import pytest
 from flask import Flask
 
 from app.modules.pixchecker import pixchecker_bp
+from app.modules.pixchecker.services import PixValidator
 
 
 @pytest.fixture
@@ -22,7 +24,7 @@ def client(app):
 
 def make_hubfile_mock(path):
     m = MagicMock()
-    m.get_path.return_value = path
+    m.open.side_effect = lambda: open(path, "rb")
     return m
 
 
@@ -52,3 +54,87 @@ def test_check_pix_invalid(MockHubfileService, client):
     assert resp.status_code == 400
     data = resp.get_json()
     assert "errors" in data and len(data["errors"]) > 0
+
+
+def test_pix_validator_reports_the_same_errors_as_before():
+    lines = ["a{\n", "  x=1\n", "  bad line\n", "  b{\n", "}\n", "oops\n", "c{\n", "  'k': v\n"]
+
+    errors = PixValidator().validate(lines)
+
+    assert errors == [
+        "Line 3: Invalid attribute format, expected 'key:val' or 'key=val', got: '  bad line'",
+        "Line 4: Unexpected '{' inside element 'a'",
+        "Line 6: Expected element header like 'name{' but got: 'oops'",
+        "Unexpected end of file: missing closing '}' for element 'c'",
+    ]
+
+
+def test_pix_validator_stops_reading_at_the_error_limit():
+    read = []
+
+    def lines():
+        for i in range(10_000):
+            read.append(i)
+            yield "not a header\n"
+
+    errors = PixValidator(max_errors=3).validate(lines())
+
+    assert len(errors) == 3
+    assert len(read) == 3
+
+
+def test_pix_validator_skips_overlong_lines_without_reading_them_whole():
+    fh = io.StringIO("a{\n  k=" + "v" * (PixValidator.MAX_LINE_LENGTH * 3) + "\n}\n")
+
+    errors = PixValidator().validate_file(fh)
+
+    assert errors == [f"Line 2: Line longer than {PixValidator.MAX_LINE_LENGTH} characters"]
+
+
+def test_check_pix_limits_the_reported_errors(client, app, tmp_path):
+    path = tmp_path / "many_errors.pix"
+    path.write_text("bad\n" * 50)
+    app.config["PIXCHECKER_MAX_ERRORS"] = 5
+
+    with patch("app.modules.pixchecker.routes.HubfileService") as MockHubfileService:
+        MockHubfileService.return_value.get_or_404.return_value = make_hubfile_mock(str(path))
+        resp = client.get("/pixchecker/check_pix/1")
+
+    assert resp.status_code == 400
+    data = resp.get_json()
+    assert len(data["errors"]) == 5
+    assert data["error_limit_reached"] is True
+
+
+def test_pix_validator_flags_the_limit_only_when_errors_are_left_unreported():
+    validator = PixValidator(max_errors=3)
+
+    assert validator.check(["bad\n"] * 3) == (
+        [f"Line {i}: Expected element header like 'name{{' but got: 'bad'" for i in (1, 2, 3)],
+        False,
+    )
+    errors, error_limit_reached = validator.check(["bad\n"] * 4)
+    assert len(errors) == 3
+    assert error_limit_reached is True
+
+
+def test_pix_validator_accepts_a_zero_error_limit():
+    assert PixValidator(max_errors=0).check(["bad\n"]) == ([], True)
+    assert PixValidator(max_errors=0).check(["a{\n", "}\n"]) == ([], False)
+    with pytest.raises(ValueError):
+        PixValidator(max_errors=-1)
+
+
+def test_check_pix_reports_a_complete_list_at_the_error_limit(client, app, tmp_path):
+    path = tmp_path / "five_errors.pix"
+    path.write_text("bad\n" * 5)
+    app.config["PIXCHECKER_MAX_ERRORS"] = 5
+
+    with patch("app.modules.pixchecker.routes.HubfileService") as MockHubfileService:
+        MockHubfileService.return_value.get_or_404.return_value = make_hubfile_mock(str(path))
+        resp = client.get("/pixchecker/check_pix/1")
+
+    assert resp.status_code == 400
+    data = resp.get_json()
+    assert len(data["errors"]) == 5
+    assert data["error_limit_reached"] is False
@@ -1,5 +1,6 @@
 from flask import redirect, render_template, request, url_for
 from flask_login import current_user, login_required
+from sqlalchemy.orm import selectinload
 
 from app import db
 from app.modules.auth.models import User
@@ -37,6 +38,7 @@ def my_profile():
 
     user_datasets_pagination = (
         db.session.query(DataSet)
+        .options(selectinload(DataSet.ds_meta_data))
         .filter(DataSet.user_id == current_user.id)
         .order_by(DataSet.created_at.desc())
         .paginate(page=page, per_page=per_page, error_out=False)
@@ -62,7 +64,11 @@ def public_profile(user_id: int):
 
     page = request.args.get("page", 1, type=int)
     per_page = 10
-    q = DataSet.query.filter_by(user_id=user.id).order_by(DataSet.created_at.desc())
+    q = (
+        DataSet.query.options(selectinload(DataSet.ds_meta_data))
+        .filter_by(user_id=user.id)
+        .order_by(DataSet.created_at.desc())
+    )
     pagination = q.paginate(page=page, per_page=per_page)
     total_datasets = q.count()
 
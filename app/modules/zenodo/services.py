@@ -4,13 +4,11 @@ import os
 import requests
 from dotenv import load_dotenv
 from flask import Response, jsonify
-from flask_login import current_user
 
 from app.modules.dataset.models import DataSet
 from app.modules.filemodel.models import FileModel
 from app.modules.zenodo.forms import ZenodoForm
 from app.modules.zenodo.repositories import ZenodoRepository
-from core.configuration.configuration import uploads_folder_name
 from core.services.BaseService import BaseService
 
 logger = logging.getLogger(__name__)
@@ -170,9 +168,7 @@ class ZenodoService(BaseService):
                 }
                 for author in dataset.ds_meta_data.authors
             ],
-            "keywords": (
-                ["pixelhub"] if not dataset.ds_meta_data.tags else dataset.ds_meta_data.tags.split(", ") + ["pixelhub"]
-            ),
+            "keywords": [tag.name for tag in dataset.ds_meta_data.tag_list] + ["pixelhub"],
             "access_right": "open",
             "license": "CC-BY-4.0",
         }
@@ -197,19 +193,18 @@ class ZenodoService(BaseService):
         Args:
             deposition_id (int): The ID of the deposition in Zenodo.
             file_model (FileModel): The FileModel object representing the file model.
-            user (FileModel): The User object representing the file owner.
+            user (User): Unused; the file is read from the stored content of its Hubfile.
 
         Returns:
             dict: The response in JSON format with the details of the uploaded file.
         """
         filename = file_model.fm_meta_data.filename
         data = {"name": filename}
-        user_id = current_user.id if user is None else user.id
-        file_path = os.path.join(uploads_folder_name(), f"user_{str(user_id)}", f"dataset_{dataset.id}/", filename)
-        files = {"file": open(file_path, "rb")}
+        hubfile = next(file for file in file_model.files if file.name == filename)
 
         publish_url = f"{self.ZENODO_API_URL}/{deposition_id}/files"
-        response = requests.post(publish_url, params=self.params, data=data, files=files)
+        with hubfile.open() as fh:
+            response = requests.post(publish_url, params=self.params, data=data, files={"file": fh})
 
         if response.status_code != 201:
             error_message = f"Failed to upload files. Error details: {response.json()}"
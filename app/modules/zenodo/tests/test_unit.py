@@ -222,7 +222,6 @@ def mock_service(mocker, test_client):
     mocker.patch("app.modules.zenodo.services.os.path.join", return_value="/fake/path/file.txt")
 
     # 4. Mockear dependencias de otros módulos
-    mocker.patch("app.modules.zenodo.services.uploads_folder_name", return_value="/fake/uploads")
     mocker.patch("app.modules.dataset.models.DSMetaData.query")
 
     # Devolvemos una instancia del servicio
@@ -322,7 +321,7 @@ def test_service_create_new_deposition_full_branches(mock_service):
     1. publication_type == 'none'
     2. author.affiliation es None
     3. author.orcid es None
-    4. dataset.ds_meta_data.tags es None
+    4. dataset.ds_meta_data.tag_list está vacía
     """
     service, mocker = mock_service
     requests_post = mocker.patch("app.modules.zenodo.services.requests.post")
@@ -339,7 +338,7 @@ def test_service_create_new_deposition_full_branches(mock_service):
     mock_dataset.ds_meta_data.publication_type.value = "none"  # Rama 1
     mock_dataset.ds_meta_data.description = "Test Desc"
     mock_dataset.ds_meta_data.authors = [mock_author_no_details]  # Rama 2 y 3
-    mock_dataset.ds_meta_data.tags = None  # Rama 4
+    mock_dataset.ds_meta_data.tag_list = []  # Rama 4
 
     # Ejecutamos
     service.create_new_deposition(mock_dataset)
@@ -349,7 +348,7 @@ def test_service_create_new_deposition_full_branches(mock_service):
     assert call_args["upload_type"] == "dataset"
     assert call_args["publication_type"] is None
     assert call_args["creators"][0] == {"name": "John Doe"}
-    assert call_args["keywords"] == ["pixelhub"]  # Fallback para tags=None
+    assert call_args["keywords"] == ["pixelhub"]  # Fallback sin tags
 
 
 def test_service_create_new_deposition_handles_json_decode_error(mock_service):
@@ -367,7 +366,7 @@ def test_service_create_new_deposition_handles_json_decode_error(mock_service):
 
     mock_dataset = MagicMock()
     mock_dataset.ds_meta_data.publication_type.value = "dataset"
-    mock_dataset.ds_meta_data.tags = "tag"
+    mock_dataset.ds_meta_data.tag_list = [MagicMock()]
     mock_dataset.ds_meta_data.authors = []
 
     # Verificamos que la excepción se captura y se usa .text en el mensaje
@@ -382,9 +381,6 @@ def test_service_upload_file(mock_service):
     service, mocker = mock_service
     requests_post = mocker.patch("app.modules.zenodo.services.requests.post")
 
-    # Mockeamos current_user
-    mocker.patch("app.modules.zenodo.services.current_user", MagicMock(id=1))
-
     # 1. Creamos un mock del manejador de fichero
     mock_file_handle = MagicMock()
 
@@ -396,9 +392,12 @@ def test_service_upload_file(mock_service):
     mock_dataset = MagicMock(id=1)
     mock_fm = MagicMock()
     mock_fm.fm_meta_data.filename = "test.uvl"
+    mock_hubfile = MagicMock()
+    mock_hubfile.name = "test.uvl"
+    mock_fm.files = [mock_hubfile]
     mock_user = MagicMock(id=1)
 
-    # Caso 1: Éxito (con user=None, usa current_user)
+    # Caso 1: Éxito (la ruta se toma del Hubfile del modelo)
     requests_post.return_value = MagicMock(status_code=201, json=lambda: {"status": "ok"})
     result = service.upload_file(mock_dataset, 123, mock_fm, user=None)
     assert result == {"status": "ok"}
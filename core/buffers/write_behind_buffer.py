@@ -0,0 +1,169 @@
+import atexit
+import logging
+import os
+import threading
+import time
+from collections import defaultdict
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import and_, insert, or_, select
+
+logger = logging.getLogger(__name__)
+
+
+class WriteBehindBuffer:
+    """
+    In-process buffer that takes record inserts off the request path.
+
+    Records are queued in memory and written by a background thread with one multi-row INSERT
+    per table, either when the buffer reaches ``max_size`` records or every ``flush_interval``
+    seconds, and a last time when the process exits. Records declared with ``dedup_on`` are only
+    inserted if no row with the same values for those columns exists, which replaces the
+    SELECT-then-INSERT that used to run inside each request.
+
+    Listeners registered with ``on_flush`` run in the same transaction as the insert, so derived
+    tables (counters, rollups...) never drift from the records they are built from.
+
+    A batch whose write fails is put back in the buffer, bounded by ``max_size`` records, and retried
+    with an exponential backoff; records are only dropped after ``MAX_ATTEMPTS`` failed writes.
+    """
+
+    MAX_ATTEMPTS = 5
+    MAX_BACKOFF = 300.0
+
+    def __init__(self, app=None, max_size: int = 200, flush_interval: float = 5.0):
+        self.app = None
+        self.max_size = max_size
+        self.flush_interval = flush_interval
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        # (model, dedup_on, values, failed attempts)
+        self._pending: List[Tuple[type, Tuple[str, ...], dict, int]] = []
+        self._listeners: Dict[type, List[Callable]] = defaultdict(list)
+        self._wakeup = threading.Event()
+        self._worker_pid: Optional[int] = None
+        self._failures = 0
+        self._retry_at = 0.0
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        self.max_size = app.config.get("RECORD_BUFFER_MAX_SIZE", self.max_size)
+        self.flush_interval = app.config.get("RECORD_BUFFER_FLUSH_INTERVAL", self.flush_interval)
+        atexit.register(self.flush)
+
+    def on_flush(self, model: type, listener: Callable):
+        """Registers ``listener(connection, rows)`` to run whenever rows of ``model`` are inserted."""
+        self._listeners[model].append(listener)
+
+    def add(self, model: type, dedup_on: Iterable[str] = (), **values):
+        if self.app is None:
+            from flask import current_app
+
+            self.app = current_app._get_current_object()
+
+        with self._lock:
+            self._pending.append((model, tuple(dedup_on), values, 0))
+            size = len(self._pending)
+
+        if self.flush_interval <= 0:
+            self.flush()
+            return
+
+        self._ensure_worker()
+        if size >= self.max_size:
+            self._wakeup.set()
+
+    def pending(self) -> int:
+        with self._lock:
+            return len(self._pending)
+
+    def flush(self):
+        with self._lock:
+            pending, self._pending = self._pending, []
+        if not pending:
+            return
+
+        with self._flush_lock:
+            try:
+                self._app_context_write(pending)
+            except Exception as exc:
+                logger.exception(f"Exception flushing {len(pending)} buffered records: {exc}")
+                self._requeue(pending)
+            else:
+                self._failures = 0
+                self._retry_at = 0.0
+
+    def _requeue(self, pending):
+        retry = [(model, dedup_on, values, attempts + 1) for model, dedup_on, values, attempts in pending]
+        retry = [record for record in retry if record[3] < self.MAX_ATTEMPTS]
+        # keep the most recent records when the failed batch does not fit in the buffer
+        retry = retry[-self.max_size :] if self.max_size > 0 else []
+        dropped = len(pending) - len(retry)
+        if dropped:
+            logger.error(f"Dropped {dropped} buffered records after failed flushes")
+
+        with self._lock:
+            self._pending = retry + self._pending
+        self._failures += 1
+        backoff = min(max(self.flush_interval, 1.0) * 2 ** (self._failures - 1), self.MAX_BACKOFF)
+        self._retry_at = time.monotonic() + backoff
+
+    def _app_context_write(self, pending):
+        from flask import current_app, has_app_context
+
+        if has_app_context():
+            self._write(current_app.extensions["sqlalchemy"].engine, pending)
+        else:
+            with self.app.app_context():
+                self._write(self.app.extensions["sqlalchemy"].engine, pending)
+
+    def _write(self, engine, pending):
+        batches = defaultdict(list)
+        for model, dedup_on, values, _ in pending:
+            batches[(model, dedup_on, tuple(sorted(values)))].append(values)
+
+        with engine.begin() as connection:
+            for (model, dedup_on, _), rows in batches.items():
+                if dedup_on:
+                    rows = self._deduplicate(connection, model, dedup_on, rows)
+                if not rows:
+                    continue
+                connection.execute(insert(model.__table__), rows)
+                for listener in self._listeners.get(model, []):
+                    listener(connection, rows)
+
+    def _deduplicate(self, connection, model, dedup_on, rows):
+        unique_rows = {}
+        for row in rows:
+            unique_rows.setdefault(tuple(row.get(column) for column in dedup_on), row)
+
+        table = model.__table__
+        columns = [table.c[column] for column in dedup_on]
+        conditions = [
+            and_(*[column.is_(None) if value is None else column == value for column, value in zip(columns, key)])
+            for key in unique_rows
+        ]
+        existing = {tuple(row) for row in connection.execute(select(*columns).where(or_(*conditions)))}
+
+        return [row for key, row in unique_rows.items() if key not in existing]
+
+    def _ensure_worker(self):
+        # Forking servers copy the buffer but not its thread, so each process starts its own worker
+        if self._worker_pid == os.getpid():
+            return
+        with self._lock:
+            if self._worker_pid == os.getpid():
+                return
+            self._worker_pid = os.getpid()
+            threading.Thread(target=self._run, name="write-behind-buffer", daemon=True).start()
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            if time.monotonic() < self._retry_at:
+                # backing off after a failed flush
+                continue
+            self.flush()
@@ -9,6 +9,14 @@ def uploads_folder_name():
     return os.getenv("UPLOADS_DIR", "uploads")
 
 
+def archive_cache_folder_name():
+    return os.getenv("ARCHIVE_CACHE_DIR", os.path.join("cache", "archives"))
+
+
+def archive_cache_max_bytes():
+    return int(os.getenv("ARCHIVE_CACHE_MAX_BYTES", 2 * 1024**3))
+
+
 def get_app_version():
     version_file_path = os.path.join(os.getenv("WORKING_DIR", ""), ".version")
     try:
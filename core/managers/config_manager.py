@@ -33,6 +33,17 @@ class Config:
     TIMEZONE = "Europe/Madrid"
     TEMPLATES_AUTO_RELOAD = True
     UPLOAD_FOLDER = "uploads"
+    RECORD_BUFFER_MAX_SIZE = int(os.getenv("RECORD_BUFFER_MAX_SIZE", 200))
+    RECORD_BUFFER_FLUSH_INTERVAL = float(os.getenv("RECORD_BUFFER_FLUSH_INTERVAL", 5))
+    SUGGEST_INDEX_WARMUP = os.getenv("SUGGEST_INDEX_WARMUP", "true").lower() == "true"
+    PIXCHECKER_MAX_ERRORS = int(os.getenv("PIXCHECKER_MAX_ERRORS", 100))
+    # "local" (the uploads folder) or "s3" (an S3-compatible bucket shared by every web node)
+    STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "local")
+    STORAGE_LOCAL_ROOT = os.getenv("STORAGE_LOCAL_ROOT")
+    STORAGE_S3_BUCKET = os.getenv("STORAGE_S3_BUCKET")
+    STORAGE_S3_PREFIX = os.getenv("STORAGE_S3_PREFIX", "")
+    STORAGE_S3_ENDPOINT_URL = os.getenv("STORAGE_S3_ENDPOINT_URL")
+    STORAGE_S3_REGION = os.getenv("STORAGE_S3_REGION")
 
 
 class DevelopmentConfig(Config):
@@ -49,6 +60,9 @@ class TestingConfig(Config):
         f"{os.getenv('MARIADB_TEST_DATABASE', 'default_db')}"
     )
     WTF_CSRF_ENABLED = False
+    # Write download and view records synchronously so tests can assert on them right away
+    RECORD_BUFFER_FLUSH_INTERVAL = 0
+    SUGGEST_INDEX_WARMUP = False
 
 
 class ProductionConfig(Config):
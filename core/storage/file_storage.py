@@ -0,0 +1,231 @@
+import io
+import os
+import shutil
+import uuid
+from abc import ABC, abstractmethod
+from typing import BinaryIO, Optional
+
+from core.configuration.configuration import uploads_folder_name
+
+
+def uploads_root() -> str:
+    return os.path.join(os.getenv("WORKING_DIR", ""), uploads_folder_name())
+
+
+class StorageBackend(ABC):
+    """
+    Where the uploaded files are kept. Files are addressed by keys relative to the uploads folder, such as
+    ``blobs/ab/cd/<sha256>``, and read through seekable binary file objects.
+    """
+
+    @abstractmethod
+    def open(self, key: str) -> BinaryIO: ...
+
+    @abstractmethod
+    def exists(self, key: str) -> bool: ...
+
+    @abstractmethod
+    def size(self, key: str) -> int: ...
+
+    @abstractmethod
+    def save(self, source_path: str, key: str, move: bool = False):
+        """Stores the file at ``source_path`` under ``key``; with ``move`` the source file is consumed."""
+
+    @abstractmethod
+    def delete(self, key: str): ...
+
+    def local_path(self, key: str) -> Optional[str]:
+        """Path of the file on this node's disk, or None when it is only reachable through ``open``."""
+        return None
+
+
+class LocalStorage(StorageBackend):
+    """Files under a folder of the local disk (the uploads folder by default)."""
+
+    def __init__(self, root: Optional[str] = None):
+        self._root = root
+
+    @property
+    def root(self) -> str:
+        # resolved on use, so WORKING_DIR can change after the backend is created
+        return self._root if self._root is not None else uploads_root()
+
+    def path(self, key: str) -> str:
+        return os.path.join(self.root, key)
+
+    def open(self, key: str) -> BinaryIO:
+        return open(self.path(key), "rb")
+
+    def exists(self, key: str) -> bool:
+        return os.path.isfile(self.path(key))
+
+    def size(self, key: str) -> int:
+        return os.path.getsize(self.path(key))
+
+    def save(self, source_path: str, key: str, move: bool = False):
+        path = self.path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # written under a temporary name and renamed, so a key never holds a partial file
+        temp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        if move:
+            shutil.move(source_path, temp_path)
+        else:
+            shutil.copyfile(source_path, temp_path)
+        os.replace(temp_path, path)
+
+    def delete(self, key: str):
+        try:
+            os.remove(self.path(key))
+        except FileNotFoundError:
+            pass
+
+    def local_path(self, key: str) -> Optional[str]:
+        return self.path(key)
+
+
+class S3ObjectReader(io.RawIOBase):
+    """Seekable reads of an S3 object, each one a ranged GET."""
+
+    def __init__(self, client, bucket: str, key: str, size: int):
+        self.client = client
+        self.bucket = bucket
+        self.key = key
+        self._size = size
+        self._position = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self._position
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        if whence == io.SEEK_CUR:
+            offset += self._position
+        elif whence == io.SEEK_END:
+            offset += self._size
+        self._position = max(offset, 0)
+        return self._position
+
+    def readinto(self, buffer) -> int:
+        if self._position >= self._size or not len(buffer):
+            return 0
+        end = min(self._position + len(buffer), self._size) - 1
+        response = self.client.get_object(Bucket=self.bucket, Key=self.key, Range=f"bytes={self._position}-{end}")
+        data = response["Body"].read()
+        buffer[: len(data)] = data
+        self._position += len(data)
+        return len(data)
+
+
+class S3Storage(StorageBackend):
+    """
+    Files in a bucket of an S3-compatible service, shared by every web node. The boto3 client is created on
+    first use unless a ``client`` is given.
+    """
+
+    READ_BUFFER_SIZE = 1024 * 1024
+
+    def __init__(self, bucket: str, prefix: str = "", client=None, **client_kwargs):
+        self.bucket = bucket
+        self.prefix = prefix.strip("/")
+        self._client = client
+        self._client_kwargs = {key: value for key, value in client_kwargs.items() if value}
+
+    @property
+    def client(self):
+        if self._client is None:
+            import boto3
+
+            self._client = boto3.client("s3", **self._client_kwargs)
+        return self._client
+
+    def object_key(self, key: str) -> str:
+        key = key.replace(os.sep, "/")
+        return f"{self.prefix}/{key}" if self.prefix else key
+
+    @staticmethod
+    def _is_not_found(exc: Exception) -> bool:
+        code = getattr(exc, "response", {}).get("Error", {}).get("Code")
+        return code in ("404", "NoSuchKey", "NotFound")
+
+    def _head(self, key: str) -> Optional[dict]:
+        try:
+            return self.client.head_object(Bucket=self.bucket, Key=self.object_key(key))
+        except Exception as exc:
+            if self._is_not_found(exc):
+                return None
+            raise
+
+    def open(self, key: str) -> BinaryIO:
+        head = self._head(key)
+        if head is None:
+            raise FileNotFoundError(key)
+        reader = S3ObjectReader(self.client, self.bucket, self.object_key(key), head["ContentLength"])
+        return io.BufferedReader(reader, buffer_size=self.READ_BUFFER_SIZE)
+
+    def exists(self, key: str) -> bool:
+        return self._head(key) is not None
+
+    def size(self, key: str) -> int:
+        head = self._head(key)
+        if head is None:
+            raise FileNotFoundError(key)
+        return head["ContentLength"]
+
+    def save(self, source_path: str, key: str, move: bool = False):
+        # upload_file streams the file, in multipart uploads when it is large
+        self.client.upload_file(source_path, self.bucket, self.object_key(key))
+        if move:
+            os.remove(source_path)
+
+    def delete(self, key: str):
+        self.client.delete_object(Bucket=self.bucket, Key=self.object_key(key))
+
+
+class FileStorage:
+    """
+    The storage backend of the app, chosen by the STORAGE_BACKEND setting ("local" or "s3"). Until
+    ``init_app`` runs it uses the local uploads folder.
+    """
+
+    def __init__(self, backend: Optional[StorageBackend] = None):
+        self.backend = backend or LocalStorage()
+
+    def init_app(self, app):
+        self.backend = self.create_backend(app.config)
+
+    @staticmethod
+    def create_backend(config) -> StorageBackend:
+        name = config.get("STORAGE_BACKEND", "local")
+        if name == "local":
+            return LocalStorage(config.get("STORAGE_LOCAL_ROOT"))
+        if name == "s3":
+            return S3Storage(
+                bucket=config["STORAGE_S3_BUCKET"],
+                prefix=config.get("STORAGE_S3_PREFIX", ""),
+                endpoint_url=config.get("STORAGE_S3_ENDPOINT_URL"),
+                region_name=config.get("STORAGE_S3_REGION"),
+            )
+        raise ValueError(f"Unknown storage backend: {name}")
+
+    def open(self, key: str) -> BinaryIO:
+        return self.backend.open(key)
+
+    def exists(self, key: str) -> bool:
+        return self.backend.exists(key)
+
+    def size(self, key: str) -> int:
+        return self.backend.size(key)
+
+    def save(self, source_path: str, key: str, move: bool = False):
+        self.backend.save(source_path, key, move=move)
+
+    def delete(self, key: str):
+        self.backend.delete(key)
+
+    def local_path(self, key: str) -> Optional[str]:
+        return self.backend.local_path(key)
@@ -0,0 +1,50 @@
+"""add ds_counter
+
+Revision ID: 005
+Revises: 004
+Create Date: 2026-10-17 10:12:31.418207
+
+"""
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = '005'
+down_revision = '004'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('ds_counter',
+    sa.Column('dataset_id', sa.Integer(), nullable=False),
+    sa.Column('download_count', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('unique_download_count', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('view_count', sa.Integer(), server_default='0', nullable=False),
+    sa.ForeignKeyConstraint(['dataset_id'], ['data_set.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('dataset_id')
+    )
+
+    # Backfill from the existing records
+    op.execute(
+        """
+        INSERT INTO ds_counter (dataset_id, download_count, unique_download_count, view_count)
+        SELECT ds.id,
+               COALESCE(d.download_count, 0),
+               COALESCE(d.unique_download_count, 0),
+               COALESCE(v.view_count, 0)
+        FROM data_set ds
+        LEFT JOIN (
+            SELECT dataset_id, COUNT(*) AS download_count, COUNT(DISTINCT download_cookie) AS unique_download_count
+            FROM ds_download_record GROUP BY dataset_id
+        ) d ON d.dataset_id = ds.id
+        LEFT JOIN (
+            SELECT dataset_id, COUNT(*) AS view_count FROM ds_view_record GROUP BY dataset_id
+        ) v ON v.dataset_id = ds.id
+        WHERE d.dataset_id IS NOT NULL OR v.dataset_id IS NOT NULL
+        """
+    )
+
+
+def downgrade():
+    op.drop_table('ds_counter')
@@ -0,0 +1,108 @@
+"""add dataset_neighbors
+
+Revision ID: 006
+Revises: 005
+Create Date: 2026-10-17 11:02:47.931540
+
+"""
+import heapq
+from collections import defaultdict
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = '006'
+down_revision = '005'
+branch_labels = None
+depends_on = None
+
+# Same ranking as app.modules.dataset.services.DSNeighborService at the time of this migration
+NEIGHBORS_PER_DATASET = 10
+WEIGHTS = {'author': 10, 'tag': 3, 'type': 6}
+
+
+def author_feature(name, orcid):
+    if orcid and orcid.strip():
+        return ('author', f"orcid:{orcid.strip()}")
+    return ('author', f"name:{' '.join((name or '').lower().split())}")
+
+
+def compute_neighbors(connection):
+    features = defaultdict(set)
+    ranking = {}
+    for dataset_id, created_at, publication_type, tags, download_count in connection.execute(sa.text(
+            """
+            SELECT ds.id, ds.created_at, md.publication_type, md.tags, COALESCE(c.download_count, 0)
+            FROM data_set ds
+            JOIN ds_meta_data md ON md.id = ds.ds_meta_data_id
+            LEFT JOIN ds_counter c ON c.dataset_id = ds.id
+            WHERE md.dataset_doi IS NOT NULL
+            """)):
+        ranking[dataset_id] = (download_count, created_at)
+        if publication_type is not None:
+            features[dataset_id].add(('type', publication_type))
+        features[dataset_id].update(('tag', tag.strip().lower()) for tag in (tags or "").split(",") if tag.strip())
+    for dataset_id, name, orcid in connection.execute(sa.text(
+            """
+            SELECT ds.id, a.name, a.orcid
+            FROM data_set ds
+            JOIN ds_meta_data md ON md.id = ds.ds_meta_data_id
+            JOIN author a ON a.ds_meta_data_id = md.id
+            WHERE md.dataset_doi IS NOT NULL
+            """)):
+        features[dataset_id].add(author_feature(name, orcid))
+
+    postings = defaultdict(set)
+    for dataset_id, dataset_features in features.items():
+        for feature in dataset_features:
+            postings[feature].add(dataset_id)
+
+    neighbors = {}
+    for dataset_id in ranking:
+        scores = defaultdict(int)
+        for feature in features[dataset_id]:
+            for candidate_id in postings[feature]:
+                scores[candidate_id] += WEIGHTS[feature[0]]
+        scores.pop(dataset_id, None)
+        top = heapq.nlargest(NEIGHBORS_PER_DATASET, scores, key=lambda i: (scores[i],) + ranking[i])
+        if len(top) < NEIGHBORS_PER_DATASET:
+            # completed with the most downloaded datasets, as DSNeighborService does
+            others = (i for i in ranking if i != dataset_id and i not in scores)
+            top += heapq.nlargest(NEIGHBORS_PER_DATASET - len(top), others, key=ranking.__getitem__)
+        neighbors[dataset_id] = [(i, scores.get(i, 0)) for i in top]
+    return neighbors
+
+
+def upgrade():
+    op.create_table('dataset_neighbors',
+    sa.Column('dataset_id', sa.Integer(), nullable=False),
+    sa.Column('neighbor_id', sa.Integer(), nullable=False),
+    sa.Column('score', sa.Integer(), nullable=False),
+    sa.Column('rank', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['dataset_id'], ['data_set.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['neighbor_id'], ['data_set.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('dataset_id', 'neighbor_id')
+    )
+    with op.batch_alter_table('dataset_neighbors', schema=None) as batch_op:
+        batch_op.create_index('ix_dataset_neighbors_dataset_rank', ['dataset_id', 'rank'], unique=False)
+
+    # Backfill the neighbors of the published datasets, which are only written again when a dataset is
+    # created or published ('rosemary rebuild:neighbors' recomputes them all)
+    dataset_neighbors = sa.table('dataset_neighbors', sa.column('dataset_id', sa.Integer),
+                                 sa.column('neighbor_id', sa.Integer), sa.column('score', sa.Integer),
+                                 sa.column('rank', sa.Integer))
+    rows = [
+        {'dataset_id': dataset_id, 'neighbor_id': neighbor_id, 'score': score, 'rank': rank}
+        for dataset_id, ranked in compute_neighbors(op.get_bind()).items()
+        for rank, (neighbor_id, score) in enumerate(ranked)
+    ]
+    if rows:
+        op.bulk_insert(dataset_neighbors, rows)
+
+
+def downgrade():
+    with op.batch_alter_table('dataset_neighbors', schema=None) as batch_op:
+        batch_op.drop_index('ix_dataset_neighbors_dataset_rank')
+
+    op.drop_table('dataset_neighbors')
@@ -0,0 +1,48 @@
+"""add data_set.lineage_root_id
+
+Revision ID: 007
+Revises: 006
+Create Date: 2026-10-17 11:48:05.216734
+
+"""
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = '007'
+down_revision = '006'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('data_set', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('lineage_root_id', sa.Integer(), nullable=True))
+        batch_op.create_index(batch_op.f('ix_data_set_lineage_root_id'), ['lineage_root_id'], unique=False)
+
+    # Backfill: follow previous_version_id up to the first version of each lineage
+    connection = op.get_bind()
+    data_set = sa.table('data_set', sa.column('id', sa.Integer), sa.column('previous_version_id', sa.Integer),
+                        sa.column('lineage_root_id', sa.Integer))
+    parents = dict(connection.execute(sa.select(data_set.c.id, data_set.c.previous_version_id)).fetchall())
+
+    def find_root(dataset_id):
+        seen = set()
+        while parents.get(dataset_id) is not None and dataset_id not in seen:
+            seen.add(dataset_id)
+            dataset_id = parents[dataset_id]
+        return dataset_id
+
+    rows = [{'dataset_id': dataset_id, 'root_id': find_root(dataset_id)} for dataset_id in parents]
+    if rows:
+        connection.execute(
+            data_set.update().where(data_set.c.id == sa.bindparam('dataset_id'))
+            .values(lineage_root_id=sa.bindparam('root_id')),
+            rows,
+        )
+
+
+def downgrade():
+    with op.batch_alter_table('data_set', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_data_set_lineage_root_id'))
+        batch_op.drop_column('lineage_root_id')
@@ -0,0 +1,47 @@
+"""add ds_download_bucket
+
+Revision ID: 008
+Revises: 007
+Create Date: 2026-10-17 12:31:19.604418
+
+"""
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = '008'
+down_revision = '007'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('ds_download_bucket',
+    sa.Column('dataset_id', sa.Integer(), nullable=False),
+    sa.Column('bucket_start', sa.DateTime(), nullable=False),
+    sa.Column('download_count', sa.Integer(), server_default='0', nullable=False),
+    sa.ForeignKeyConstraint(['dataset_id'], ['data_set.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('dataset_id', 'bucket_start')
+    )
+    with op.batch_alter_table('ds_download_bucket', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_ds_download_bucket_bucket_start'), ['bucket_start'], unique=False)
+
+    # Backfill: roll the existing records up into hourly buckets
+    op.execute(
+        """
+        INSERT INTO ds_download_bucket (dataset_id, bucket_start, download_count)
+        SELECT dataset_id,
+               TIMESTAMP(DATE(download_date), MAKETIME(HOUR(download_date), 0, 0)) AS bucket_start,
+               COUNT(*)
+        FROM ds_download_record
+        WHERE dataset_id IS NOT NULL
+        GROUP BY dataset_id, bucket_start
+        """
+    )
+
+
+def downgrade():
+    with op.batch_alter_table('ds_download_bucket', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_ds_download_bucket_bucket_start'))
+
+    op.drop_table('ds_download_bucket')
@@ -0,0 +1,75 @@
+"""add dataset_search_doc
+
+Revision ID: 009
+Revises: 008
+Create Date: 2026-10-17 13:20:44.118302
+
+"""
+import re
+from collections import defaultdict
+from datetime import datetime
+
+import sqlalchemy as sa
+import unidecode
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = '009'
+down_revision = '008'
+branch_labels = None
+depends_on = None
+
+
+def tokenize(text):
+    # Same normalization as app.modules.explore.repositories.tokenize at the time of this migration
+    return re.findall(r"[a-z0-9_]+", unidecode.unidecode(text or "").lower())
+
+
+def upgrade():
+    op.create_table('dataset_search_doc',
+    sa.Column('dataset_id', sa.Integer(), nullable=False),
+    sa.Column('content', sa.Text(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['dataset_id'], ['data_set.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('dataset_id')
+    )
+    with op.batch_alter_table('dataset_search_doc', schema=None) as batch_op:
+        batch_op.create_index('ix_dataset_search_doc_content', ['content'], unique=False, mysql_prefix='FULLTEXT')
+
+    # Backfill the documents of the existing datasets
+    connection = op.get_bind()
+    texts = defaultdict(list)
+    queries = [
+        """
+        SELECT ds.id, md.title, md.description, md.tags
+        FROM data_set ds JOIN ds_meta_data md ON md.id = ds.ds_meta_data_id
+        """,
+        """
+        SELECT ds.id, a.name, a.affiliation, a.orcid
+        FROM data_set ds JOIN author a ON a.ds_meta_data_id = ds.ds_meta_data_id
+        """,
+        """
+        SELECT fm.data_set_id, fmd.filename, fmd.title, fmd.description, fmd.publication_doi, fmd.tags
+        FROM file_model fm JOIN fm_meta_data fmd ON fmd.id = fm.fm_meta_data_id
+        """,
+    ]
+    for query in queries:
+        for dataset_id, *fields in connection.execute(sa.text(query)):
+            texts[dataset_id].extend(field for field in fields if field)
+
+    search_doc = sa.table('dataset_search_doc', sa.column('dataset_id', sa.Integer), sa.column('content', sa.Text),
+                          sa.column('updated_at', sa.DateTime))
+    now = datetime.utcnow()
+    rows = [
+        {'dataset_id': dataset_id, 'content': " ".join(tokenize(" ".join(fields))), 'updated_at': now}
+        for dataset_id, fields in texts.items()
+    ]
+    if rows:
+        op.bulk_insert(search_doc, rows)
+
+
+def downgrade():
+    with op.batch_alter_table('dataset_search_doc', schema=None) as batch_op:
+        batch_op.drop_index('ix_dataset_search_doc_content')
+
+    op.drop_table('dataset_search_doc')
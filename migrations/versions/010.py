@@ -0,0 +1,24 @@
+"""add data_set (created_at, id) index
+
+Revision ID: 010
+Revises: 009
+Create Date: 2026-10-17 14:05:52.660193
+
+"""
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = '010'
+down_revision = '009'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('data_set', schema=None) as batch_op:
+        batch_op.create_index('ix_data_set_created_at_id', ['created_at', 'id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('data_set', schema=None) as batch_op:
+        batch_op.drop_index('ix_data_set_created_at_id')
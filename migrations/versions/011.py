@@ -0,0 +1,97 @@
+"""add tag and metadata tag association tables
+
+Revision ID: 011
+Revises: 010
+Create Date: 2026-10-17 15:02:17.384920
+
+"""
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = '011'
+down_revision = '010'
+branch_labels = None
+depends_on = None
+
+
+def parse_tags(tags):
+    # Same normalization as app.modules.dataset.models.parse_tags at the time of this migration
+    names = []
+    for tag in (tags or "").split(","):
+        name = " ".join(tag.lower().split())[:120]
+        if name and name not in names:
+            names.append(name)
+    return names
+
+
+def upgrade():
+    op.create_table('tag',
+    sa.Column('id', sa.Integer(), nullable=False),
+    # binary, as the default accent-insensitive collation makes 'café' and 'cafe' the same key
+    sa.Column('name', sa.String(length=120, collation='utf8mb4_bin'), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('tag', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_tag_name'), ['name'], unique=True)
+
+    op.create_table('ds_meta_data_tag',
+    sa.Column('ds_meta_data_id', sa.Integer(), nullable=False),
+    sa.Column('tag_id', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['ds_meta_data_id'], ['ds_meta_data.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['tag_id'], ['tag.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('ds_meta_data_id', 'tag_id')
+    )
+    with op.batch_alter_table('ds_meta_data_tag', schema=None) as batch_op:
+        batch_op.create_index('ix_ds_meta_data_tag_tag_id', ['tag_id', 'ds_meta_data_id'], unique=False)
+
+    op.create_table('fm_meta_data_tag',
+    sa.Column('fm_meta_data_id', sa.Integer(), nullable=False),
+    sa.Column('tag_id', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['fm_meta_data_id'], ['fm_meta_data.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['tag_id'], ['tag.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('fm_meta_data_id', 'tag_id')
+    )
+    with op.batch_alter_table('fm_meta_data_tag', schema=None) as batch_op:
+        batch_op.create_index('ix_fm_meta_data_tag_tag_id', ['tag_id', 'fm_meta_data_id'], unique=False)
+
+    # Backfill the tags of the existing metadata from their comma-separated strings
+    connection = op.get_bind()
+    ds_tags = {row_id: parse_tags(tags) for row_id, tags in connection.execute(sa.text(
+        "SELECT id, tags FROM ds_meta_data WHERE tags IS NOT NULL"))}
+    fm_tags = {row_id: parse_tags(tags) for row_id, tags in connection.execute(sa.text(
+        "SELECT id, tags FROM fm_meta_data WHERE tags IS NOT NULL"))}
+
+    names = sorted({name for tags in (*ds_tags.values(), *fm_tags.values()) for name in tags})
+    if not names:
+        return
+    tag = sa.table('tag', sa.column('id', sa.Integer), sa.column('name', sa.String))
+    op.bulk_insert(tag, [{'name': name} for name in names])
+    tag_ids = {name: tag_id for tag_id, name in connection.execute(sa.text("SELECT id, name FROM tag"))}
+
+    ds_meta_data_tag = sa.table('ds_meta_data_tag', sa.column('ds_meta_data_id', sa.Integer),
+                                sa.column('tag_id', sa.Integer))
+    rows = [{'ds_meta_data_id': row_id, 'tag_id': tag_ids[name]} for row_id, tags in ds_tags.items() for name in tags]
+    if rows:
+        op.bulk_insert(ds_meta_data_tag, rows)
+
+    fm_meta_data_tag = sa.table('fm_meta_data_tag', sa.column('fm_meta_data_id', sa.Integer),
+                                sa.column('tag_id', sa.Integer))
+    rows = [{'fm_meta_data_id': row_id, 'tag_id': tag_ids[name]} for row_id, tags in fm_tags.items() for name in tags]
+    if rows:
+        op.bulk_insert(fm_meta_data_tag, rows)
+
+
+def downgrade():
+    with op.batch_alter_table('fm_meta_data_tag', schema=None) as batch_op:
+        batch_op.drop_index('ix_fm_meta_data_tag_tag_id')
+
+    op.drop_table('fm_meta_data_tag')
+    with op.batch_alter_table('ds_meta_data_tag', schema=None) as batch_op:
+        batch_op.drop_index('ix_ds_meta_data_tag_tag_id')
+
+    op.drop_table('ds_meta_data_tag')
+    with op.batch_alter_table('tag', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_tag_name'))
+
+    op.drop_table('tag')
@@ -0,0 +1,69 @@
+"""denormalize explore columns into dataset_search_doc
+
+Revision ID: 012
+Revises: 011
+Create Date: 2026-10-17 16:11:40.527391
+
+"""
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = '012'
+down_revision = '011'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('dataset_search_doc', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('tags', sa.Text(), nullable=True))
+        batch_op.add_column(sa.Column('publication_type', sa.Enum('NONE', 'ANNOTATION_COLLECTION', 'BOOK', 'BOOK_SECTION', 'CONFERENCE_PAPER', 'DATA_MANAGEMENT_PLAN', 'JOURNAL_ARTICLE', 'PATENT', 'PREPRINT', 'PROJECT_DELIVERABLE', 'PROJECT_MILESTONE', 'PROPOSAL', 'REPORT', 'SOFTWARE_DOCUMENTATION', 'TAXONOMIC_TREATMENT', 'TECHNICAL_NOTE', 'THESIS', 'WORKING_PAPER', 'OTHER', name='publicationtype'), nullable=True))
+        batch_op.add_column(sa.Column('published', sa.Boolean(), nullable=True))
+        batch_op.add_column(sa.Column('created_at', sa.DateTime(), nullable=True))
+        batch_op.add_column(sa.Column('download_count', sa.Integer(), nullable=True))
+
+    # Backfill the new columns of the existing documents
+    op.execute(
+        """
+        UPDATE dataset_search_doc d
+        JOIN data_set ds ON ds.id = d.dataset_id
+        JOIN ds_meta_data md ON md.id = ds.ds_meta_data_id
+        LEFT JOIN ds_counter c ON c.dataset_id = ds.id
+        SET d.publication_type = md.publication_type,
+            d.published = md.dataset_doi IS NOT NULL,
+            d.created_at = ds.created_at,
+            d.download_count = COALESCE(c.download_count, 0),
+            d.tags = ''
+        """
+    )
+    op.execute(
+        """
+        UPDATE dataset_search_doc d
+        JOIN (
+            SELECT ds.id, GROUP_CONCAT(t.name ORDER BY t.name SEPARATOR ',') AS names
+            FROM data_set ds
+            JOIN ds_meta_data_tag mt ON mt.ds_meta_data_id = ds.ds_meta_data_id
+            JOIN tag t ON t.id = mt.tag_id
+            GROUP BY ds.id
+        ) dt ON dt.id = d.dataset_id
+        SET d.tags = dt.names
+        """
+    )
+
+    with op.batch_alter_table('dataset_search_doc', schema=None) as batch_op:
+        batch_op.alter_column('tags', existing_type=sa.Text(), nullable=False)
+        batch_op.alter_column('published', existing_type=sa.Boolean(), nullable=False)
+        batch_op.alter_column('download_count', existing_type=sa.Integer(), nullable=False)
+        batch_op.create_index('ix_dataset_search_doc_published_created_at', ['published', 'created_at', 'dataset_id'],
+                              unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('dataset_search_doc', schema=None) as batch_op:
+        batch_op.drop_index('ix_dataset_search_doc_published_created_at')
+        batch_op.drop_column('download_count')
+        batch_op.drop_column('created_at')
+        batch_op.drop_column('published')
+        batch_op.drop_column('publication_type')
+        batch_op.drop_column('tags')
@@ -0,0 +1,71 @@
+"""add person and author.person_id
+
+Revision ID: 013
+Revises: 012
+Create Date: 2026-10-17 16:48:03.905512
+
+"""
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = '013'
+down_revision = '012'
+branch_labels = None
+depends_on = None
+
+
+def person_key(name, orcid):
+    # Same identity as app.modules.dataset.models.person_key at the time of this migration
+    if orcid and orcid.strip():
+        return f"orcid:{orcid.strip()}"
+    return f"name:{' '.join((name or '').lower().split())}"
+
+
+def upgrade():
+    op.create_table('person',
+    sa.Column('id', sa.Integer(), nullable=False),
+    # binary, as the default accent-insensitive collation makes 'josé' and 'jose' the same key
+    sa.Column('key', sa.String(length=130, collation='utf8mb4_bin'), nullable=False),
+    sa.Column('name', sa.String(length=120), nullable=False),
+    sa.Column('orcid', sa.String(length=120), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('person', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_person_key'), ['key'], unique=True)
+
+    with op.batch_alter_table('author', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('person_id', sa.Integer(), nullable=True))
+        batch_op.create_foreign_key('fk_author_person_id', 'person', ['person_id'], ['id'])
+        batch_op.create_index('ix_author_person_id_ds_meta_data_id', ['person_id', 'ds_meta_data_id'], unique=False)
+
+    # Backfill one person per ORCID or normalized name of the existing authors
+    connection = op.get_bind()
+    authors = connection.execute(sa.text("SELECT id, name, orcid FROM author ORDER BY id")).fetchall()
+    people = {}
+    for _, name, orcid in authors:
+        people.setdefault(person_key(name, orcid), {'name': name, 'orcid': (orcid or '').strip() or None})
+    if not people:
+        return
+
+    person = sa.table('person', sa.column('id', sa.Integer), sa.column('key', sa.String),
+                      sa.column('name', sa.String), sa.column('orcid', sa.String))
+    op.bulk_insert(person, [{'key': key, **values} for key, values in people.items()])
+    person_ids = dict(connection.execute(sa.text("SELECT `key`, id FROM person")).fetchall())
+
+    connection.execute(
+        sa.text("UPDATE author SET person_id = :person_id WHERE id = :id"),
+        [{'id': author_id, 'person_id': person_ids[person_key(name, orcid)]} for author_id, name, orcid in authors],
+    )
+
+
+def downgrade():
+    with op.batch_alter_table('author', schema=None) as batch_op:
+        batch_op.drop_index('ix_author_person_id_ds_meta_data_id')
+        batch_op.drop_constraint('fk_author_person_id', type_='foreignkey')
+        batch_op.drop_column('person_id')
+
+    with op.batch_alter_table('person', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_person_key'))
+
+    op.drop_table('person')
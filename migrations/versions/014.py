@@ -0,0 +1,35 @@
+"""add file.storage_path
+
+Revision ID: 014
+Revises: 013
+Create Date: 2026-10-17 17:32:10.218734
+
+"""
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = '014'
+down_revision = '013'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('file', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('storage_path', sa.String(length=255), nullable=True))
+
+    # Backfill the path of the existing files, relative to the uploads folder
+    op.execute(
+        """
+        UPDATE file f
+        JOIN file_model fm ON fm.id = f.file_model_id
+        JOIN data_set ds ON ds.id = fm.data_set_id
+        SET f.storage_path = CONCAT('user_', ds.user_id, '/dataset_', ds.id, '/', f.name)
+        """
+    )
+
+
+def downgrade():
+    with op.batch_alter_table('file', schema=None) as batch_op:
+        batch_op.drop_column('storage_path')
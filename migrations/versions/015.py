@@ -0,0 +1,134 @@
+"""add blob and file.blob_id, dedup existing uploads
+
+Revision ID: 015
+Revises: 014
+Create Date: 2026-10-17 18:21:44.603118
+
+"""
+import hashlib
+import os
+import shutil
+from datetime import datetime
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = '015'
+down_revision = '014'
+branch_labels = None
+depends_on = None
+
+
+def uploads_root():
+    # Same location as app.modules.hubfile.models.uploads_root at the time of this migration
+    return os.path.join(os.getenv("WORKING_DIR", ""), os.getenv("UPLOADS_DIR", "uploads"))
+
+
+def blob_storage_path(sha256):
+    return os.path.join("blobs", sha256[:2], sha256[2:4], sha256)
+
+
+def hash_file(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as fh:
+        for block in iter(lambda: fh.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def upgrade():
+    op.create_table('blob',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('sha256', sa.String(length=64), nullable=False),
+    sa.Column('size', sa.BigInteger(), nullable=False),
+    sa.Column('ref_count', sa.Integer(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('blob', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_blob_sha256'), ['sha256'], unique=True)
+
+    with op.batch_alter_table('file', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('blob_id', sa.Integer(), nullable=True))
+        batch_op.create_foreign_key('fk_file_blob_id', 'blob', ['blob_id'], ['id'])
+        batch_op.create_index(batch_op.f('ix_file_blob_id'), ['blob_id'], unique=False)
+
+    # Move the content of the existing files into the blob store, keeping one copy of each content.
+    # Files missing on disk keep their storage_path and no blob.
+    connection = op.get_bind()
+    root = uploads_root()
+    files = connection.execute(sa.text("SELECT id, storage_path FROM file WHERE storage_path IS NOT NULL")).fetchall()
+    file_blobs, blobs = {}, {}
+    for file_id, storage_path in files:
+        path = os.path.join(root, storage_path)
+        if not os.path.isfile(path):
+            continue
+        sha256 = hash_file(path)
+        blob_path = os.path.join(root, blob_storage_path(sha256))
+        if not os.path.exists(blob_path):
+            os.makedirs(os.path.dirname(blob_path), exist_ok=True)
+            shutil.copyfile(path, blob_path)
+        blobs.setdefault(sha256, {'size': os.path.getsize(blob_path), 'ref_count': 0})['ref_count'] += 1
+        file_blobs[file_id] = (sha256, path)
+    if not blobs:
+        return
+
+    now = datetime.utcnow()
+    blob = sa.table('blob', sa.column('sha256', sa.String), sa.column('size', sa.BigInteger),
+                    sa.column('ref_count', sa.Integer), sa.column('created_at', sa.DateTime))
+    op.bulk_insert(blob, [{'sha256': sha256, 'created_at': now, **values} for sha256, values in blobs.items()])
+    blob_ids = dict(connection.execute(sa.text("SELECT sha256, id FROM blob")).fetchall())
+
+    connection.execute(
+        sa.text("UPDATE file SET blob_id = :blob_id, storage_path = :storage_path WHERE id = :id"),
+        [{'id': file_id, 'blob_id': blob_ids[sha256], 'storage_path': blob_storage_path(sha256)}
+         for file_id, (sha256, _) in file_blobs.items()],
+    )
+
+    # The per-dataset copies are only removed once every row points at its blob; cart-built datasets
+    # may share a path with the dataset they were cloned from
+    for path in {path for _, path in file_blobs.values()}:
+        if os.path.exists(path):
+            os.remove(path)
+
+
+def downgrade():
+    # Copy the content of every file back to its dataset folder
+    connection = op.get_bind()
+    root = uploads_root()
+    files = connection.execute(sa.text(
+        """
+        SELECT f.id, f.name, ds.user_id, ds.id, f.storage_path
+        FROM file f
+        JOIN file_model fm ON fm.id = f.file_model_id
+        JOIN data_set ds ON ds.id = fm.data_set_id
+        WHERE f.blob_id IS NOT NULL
+        """
+    )).fetchall()
+    rows = []
+    for file_id, name, user_id, dataset_id, storage_path in files:
+        dataset_path = os.path.join(f"user_{user_id}", f"dataset_{dataset_id}", name)
+        blob_path = os.path.join(root, storage_path)
+        if os.path.isfile(blob_path):
+            os.makedirs(os.path.join(root, os.path.dirname(dataset_path)), exist_ok=True)
+            shutil.copyfile(blob_path, os.path.join(root, dataset_path))
+        rows.append({'id': file_id, 'storage_path': dataset_path})
+    if rows:
+        connection.execute(sa.text("UPDATE file SET storage_path = :storage_path WHERE id = :id"), rows)
+
+    blob_paths = [blob_storage_path(sha256) for sha256, in connection.execute(sa.text("SELECT sha256 FROM blob"))]
+
+    with op.batch_alter_table('file', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_file_blob_id'))
+        batch_op.drop_constraint('fk_file_blob_id', type_='foreignkey')
+        batch_op.drop_column('blob_id')
+
+    with op.batch_alter_table('blob', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_blob_sha256'))
+
+    op.drop_table('blob')
+
+    for blob_path in blob_paths:
+        if os.path.exists(os.path.join(root, blob_path)):
+            os.remove(os.path.join(root, blob_path))
@@ -0,0 +1,33 @@
+"""compare tag.name byte by byte
+
+Revision ID: 016
+Revises: 015
+Create Date: 2026-10-17 19:42:10.218734
+
+"""
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = '016'
+down_revision = '015'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Databases that ran 011 before it created the column binary; under the default accent-insensitive
+    # collation no two tags can differ only by accents yet, so the change cannot break the unique index
+    with op.batch_alter_table('tag', schema=None) as batch_op:
+        batch_op.alter_column('name',
+               existing_type=sa.String(length=120),
+               type_=sa.String(length=120, collation='utf8mb4_bin'),
+               existing_nullable=False)
+
+
+def downgrade():
+    with op.batch_alter_table('tag', schema=None) as batch_op:
+        batch_op.alter_column('name',
+               existing_type=sa.String(length=120, collation='utf8mb4_bin'),
+               type_=sa.String(length=120),
+               existing_nullable=False)
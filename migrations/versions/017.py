@@ -0,0 +1,33 @@
+"""compare person.key byte by byte
+
+Revision ID: 017
+Revises: 016
+Create Date: 2026-10-17 19:58:31.640257
+
+"""
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = '017'
+down_revision = '016'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Databases that ran 013 before it created the column binary; under the default accent-insensitive
+    # collation no two keys can differ only by accents or case yet, so the unique index still holds
+    with op.batch_alter_table('person', schema=None) as batch_op:
+        batch_op.alter_column('key',
+               existing_type=sa.String(length=130),
+               type_=sa.String(length=130, collation='utf8mb4_bin'),
+               existing_nullable=False)
+
+
+def downgrade():
+    with op.batch_alter_table('person', schema=None) as batch_op:
+        batch_op.alter_column('key',
+               existing_type=sa.String(length=130, collation='utf8mb4_bin'),
+               type_=sa.String(length=130),
+               existing_nullable=False)
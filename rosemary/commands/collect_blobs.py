@@ -0,0 +1,17 @@
+import click
+from flask.cli import with_appcontext
+
+
+@click.command(
+    "blobs:gc",
+    help="Deletes the stored file contents no dataset file points at any more.",
+)
+@with_appcontext
+def collect_blobs():
+    from app.modules.hubfile.services import BlobService
+
+    try:
+        collected = BlobService().collect_garbage()
+        click.echo(click.style(f"{collected} unreferenced blobs deleted.", fg="green"))
+    except Exception as e:
+        click.echo(click.style(f"Error collecting the unreferenced blobs: {e}", fg="red"))
@@ -0,0 +1,28 @@
+import os
+
+import click
+
+from core.configuration.configuration import uploads_folder_name
+
+
+@click.command(
+    "uploads:expire",
+    help="Removes the resumable uploads of every user that were abandoned for more than a day.",
+)
+def expire_uploads():
+    from app.modules.dataset.services import ChunkedUploadService
+
+    temp_dir = os.path.join(os.getenv("WORKING_DIR", ""), uploads_folder_name(), "temp")
+    if not os.path.isdir(temp_dir):
+        click.echo(click.style("No temp uploads folder.", fg="yellow"))
+        return
+
+    try:
+        expired = sum(
+            ChunkedUploadService(os.path.join(temp_dir, name)).expire()
+            for name in os.listdir(temp_dir)
+            if os.path.isdir(os.path.join(temp_dir, name))
+        )
+        click.echo(click.style(f"{expired} abandoned uploads removed.", fg="green"))
+    except Exception as e:
+        click.echo(click.style(f"Error removing the abandoned uploads: {e}", fg="red"))
@@ -0,0 +1,17 @@
+import click
+from flask.cli import with_appcontext
+
+
+@click.command(
+    "rebuild:counters",
+    help="Recomputes the download and view counters and the hourly download buckets from the stored records.",
+)
+@with_appcontext
+def rebuild_counters():
+    from app.modules.dataset.services import DSCounterService
+
+    try:
+        rebuilt = DSCounterService().rebuild()
+        click.echo(click.style(f"Counters rebuilt for {rebuilt} datasets.", fg="green"))
+    except Exception as e:
+        click.echo(click.style(f"Error rebuilding the counters: {e}", fg="red"))
@@ -0,0 +1,17 @@
+import click
+from flask.cli import with_appcontext
+
+
+@click.command(
+    "rebuild:neighbors",
+    help="Recomputes the related datasets stored for every published dataset.",
+)
+@with_appcontext
+def rebuild_neighbors():
+    from app.modules.dataset.services import DSNeighborService
+
+    try:
+        rebuilt = DSNeighborService().rebuild()
+        click.echo(click.style(f"Neighbors rebuilt for {rebuilt} datasets.", fg="green"))
+    except Exception as e:
+        click.echo(click.style(f"Error rebuilding the neighbors: {e}", fg="red"))
@@ -0,0 +1,17 @@
+import click
+from flask.cli import with_appcontext
+
+
+@click.command(
+    "rebuild:search",
+    help="Rebuilds the explore search documents of every dataset.",
+)
+@with_appcontext
+def rebuild_search():
+    from app.modules.explore.services import DatasetSearchService
+
+    try:
+        rebuilt = DatasetSearchService().rebuild()
+        click.echo(click.style(f"Search documents rebuilt for {rebuilt} datasets.", fg="green"))
+    except Exception as e:
+        click.echo(click.style(f"Error rebuilding the search documents: {e}", fg="red"))